@@ -3,16 +3,21 @@ import re
 from glob import glob
 
 import gradio as gr
+from translation_agent.log import configure_logging
 from process import (
     diff_texts,
     extract_docx,
     extract_pdf,
     extract_text,
-    model_load,
     translator,
-    translator_sec,
 )
-from patch import get_ollama_models
+from patch import (
+    ADDITIONAL_ENDPOINT_STAGES,
+    STAGES,
+    TranslationSession,
+    get_ollama_models,
+    route_stages,
+)
 
 
 def huanik(
@@ -25,6 +30,7 @@ def huanik(
     base2: str,
     model2: str,
     api_key2: str,
+    stages2: list,
     source_lang: str,
     target_lang: str,
     source_text: str,
@@ -32,42 +38,46 @@ def huanik(
     max_tokens: int,
     temperature: int,
     rpm: int,
+    tpm: int,
+    progress=gr.Progress(),
 ):
     if not source_text or source_lang == target_lang:
         raise gr.Error(
             "Please check that the content or options are entered correctly."
         )
 
+    # Each request gets its own sessions, so concurrent users do not share
+    # endpoint, model or client
     try:
-        model_load(endpoint, base, model, api_key, temperature, rpm)
+        session = TranslationSession(
+            endpoint, base, model, api_key, temperature, rpm, tpm=tpm
+        )
+        additional_session = None
+        if choice:
+            additional_session = TranslationSession(
+                endpoint2, base2, model2, api_key2, temperature, rpm, tpm=tpm
+            )
+        routes = route_stages(session, additional_session, stages2)
     except Exception as e:
         raise gr.Error(f"An unexpected error occurred: {e}") from e
 
     source_text = re.sub(r"(?m)^\s*$\n?", "", source_text)
 
-    if choice:
-        init_translation, reflect_translation, final_translation = (
-            translator_sec(
-                endpoint2=endpoint2,
-                base2=base2,
-                model2=model2,
-                api_key2=api_key2,
-                source_lang=source_lang,
-                target_lang=target_lang,
-                source_text=source_text,
-                country=country,
-                max_tokens=max_tokens,
-            )
-        )
+    outputs = translator(
+        routes,
+        source_lang=source_lang,
+        target_lang=target_lang,
+        source_text=source_text,
+        country=country,
+        max_tokens=max_tokens,
+        progress=progress,
+    )
 
-    else:
-        init_translation, reflect_translation, final_translation = translator(
-            source_lang=source_lang,
-            target_lang=target_lang,
-            source_text=source_text,
-            country=country,
-            max_tokens=max_tokens,
-        )
+    # Show every stage as soon as it is available, the final translation
+    # token by token; the diff is only computed once it is complete
+    init_translation = reflect_translation = final_translation = ""
+    for init_translation, reflect_translation, final_translation in outputs:
+        yield init_translation, reflect_translation, final_translation, gr.update()
 
     final_diff = gr.HighlightedText(
         diff_texts(init_translation, final_translation),
@@ -78,7 +88,7 @@ def huanik(
         color_map={"removed": "red", "added": "green"},
     )
 
-    return init_translation, reflect_translation, final_translation, final_diff
+    yield init_translation, reflect_translation, final_translation, final_diff
 
 
 def update_model(endpoint):
@@ -314,6 +324,11 @@ with gr.Blocks(theme="soft", css=CSS, fill_height=True) as demo:
                     type="password",
                 )
                 base2 = gr.Textbox(label="BASE URL", visible=False)
+                stages2 = gr.CheckboxGroup(
+                    label="Stages on additional endpoint",
+                    choices=list(STAGES),
+                    value=ADDITIONAL_ENDPOINT_STAGES,
+                )
             with gr.Row():
                 source_lang = gr.Textbox(
                     label="Source Lang",
@@ -351,6 +366,13 @@ with gr.Blocks(theme="soft", css=CSS, fill_height=True) as demo:
                     value=60,
                     step=1,
                 )
+                tpm = gr.Slider(
+                    label="Tokens Per Minute (0 = unlimited)",
+                    minimum=0,
+                    maximum=1000000,
+                    value=0,
+                    step=1000,
+                )
 
         with gr.Column(scale=4):
             source_text = gr.Textbox(
@@ -411,6 +433,7 @@ with gr.Blocks(theme="soft", css=CSS, fill_height=True) as demo:
             base2,
             model2,
             api_key2,
+            stages2,
             source_lang,
             target_lang,
             source_text,
@@ -418,6 +441,7 @@ with gr.Blocks(theme="soft", css=CSS, fill_height=True) as demo:
             max_tokens,
             temperature,
             rpm,
+            tpm,
         ],
         outputs=[output_init, output_reflect, output_final, output_diff],
     )
@@ -431,4 +455,8 @@ with gr.Blocks(theme="soft", css=CSS, fill_height=True) as demo:
     close.click(fn=None, cancels=start_ta)
 
 if __name__ == "__main__":
-    demo.queue(api_open=False).launch(show_api=False, share=False)
+    configure_logging()
+    demo.queue(
+        api_open=False,
+        default_concurrency_limit=int(os.getenv("APP_CONCURRENCY", "8")),
+    ).launch(show_api=False, share=False)
@@ -4,203 +4,524 @@ import requests
 import json
 from functools import wraps
 from threading import Lock
-from typing import Optional, Union
+from typing import Dict, Iterable, Iterator, Optional
 
 import gradio as gr
 import openai
 import translation_agent.utils as utils
+from translation_agent.config import (
+    OLLAMA_API,
+    OLLAMA_CONNECT_TIMEOUT,
+    OLLAMA_KEEP_ALIVE,
+    OLLAMA_READ_TIMEOUT,
+)
+from translation_agent.ollama_client import (
+    chat_messages,
+    make_session,
+    request_options,
+    response_text,
+)
 
 
 RPM = 60
-MODEL = ""
+# Tokens per minute, None for no limit
+TPM = None
+# Budgets of an endpoint, shared by every session using it. They are set by
+# whoever runs the app; a session's own budgets can only be lower.
+ENDPOINT_RPM = int(os.getenv("APP_ENDPOINT_RPM", "1000"))
+ENDPOINT_TPM = int(os.getenv("APP_ENDPOINT_TPM", "0")) or None
 TEMPERATURE = 0.3
 # Hide js_mode in UI now, update in plan.
 JS_MODE = False
-ENDPOINT = ""
-OLLAMA_BASE_URL = ""
-OLLAMA_MODEL = ""
+OLLAMA_BASE_URL = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
 
+STAGES = ("initial", "reflect", "improve")
+# Stages run on the additional endpoint when one is enabled
+ADDITIONAL_ENDPOINT_STAGES = [
+    stage.strip()
+    for stage in os.getenv(
+        "APP_ADDITIONAL_ENDPOINT_STAGES", "reflect,improve"
+    ).split(",")
+    if stage.strip()
+]
 
-# Add your LLMs here
-def model_load(
-    endpoint: str,
-    base_url: str,
-    model: str,
-    api_key: Optional[str] = None,
-    temperature: float = TEMPERATURE,
-    rpm: int = RPM,
-    js_mode: bool = JS_MODE,
-):
-    global client, RPM, MODEL, TEMPERATURE, JS_MODE, ENDPOINT
-    ENDPOINT = endpoint
-    RPM = rpm
-    MODEL = model
-    TEMPERATURE = temperature
-    JS_MODE = js_mode
 
+# Add your LLMs here
+def make_client(
+    endpoint: str, base_url: str, api_key: Optional[str] = None
+) -> Optional[openai.OpenAI]:
+    """Create the OpenAI-compatible client of an endpoint, None for Ollama."""
     match endpoint:
         case "OpenAI":
-            client = openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+            return openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
         case "Groq":
-            client = openai.OpenAI(
+            return openai.OpenAI(
                 api_key=api_key if api_key else os.getenv("GROQ_API_KEY"),
                 base_url="https://api.groq.com/openai/v1",
             )
         case "TogetherAI":
-            client = openai.OpenAI(
+            return openai.OpenAI(
                 api_key=api_key if api_key else os.getenv("TOGETHER_API_KEY"),
                 base_url="https://api.together.xyz/v1",
             )
         case "CUSTOM":
-            client = openai.OpenAI(api_key=api_key, base_url=base_url)
+            return openai.OpenAI(api_key=api_key, base_url=base_url)
         case "Ollama":
             # Use direct Ollama integration instead of OpenAI compatibility
-            global OLLAMA_BASE_URL, OLLAMA_MODEL
-            OLLAMA_BASE_URL = "http://localhost:11434"
-            OLLAMA_MODEL = model
-            client = None  # We'll use direct Ollama calls
+            return None
         case _:
-            client = openai.OpenAI(
+            return openai.OpenAI(
                 api_key=api_key if api_key else os.getenv("OPENAI_API_KEY")
             )
 
 
-def rate_limit(get_max_per_minute):
-    def decorator(func):
-        lock = Lock()
-        last_called = [0.0]
+def _check_budget(per_minute: float):
+    if not per_minute > 0:
+        raise ValueError(
+            f"A budget must be more than 0 per minute, got {per_minute!r}"
+        )
+
+
+class TokenBucket:
+    """
+    Budget refilled continuously at a fixed rate per minute.
+
+    Reservations are taken even when the bucket is short; the bucket then
+    goes into debt and the caller is told how long to wait, so later callers
+    queue up behind it instead of racing for the same refill.
+    """
+
+    def __init__(self, per_minute: float):
+        _check_budget(per_minute)
+        self.rate = per_minute / 60.0
+        self.capacity = per_minute
+        self.level = per_minute
+        self.updated = time.monotonic()
+
+    def refill(self, now: float):
+        """Add what has accrued since the last update, up to the capacity."""
+        self.level = min(
+            self.capacity, self.level + (now - self.updated) * self.rate
+        )
+        self.updated = now
+
+    def reserve(self, amount: float, now: float) -> float:
+        """Take amount from the bucket and return the seconds to wait for it."""
+        self.refill(now)
+        self.level -= amount
+        return max(0.0, -self.level / self.rate)
+
+    def resize(self, per_minute: float, now: float):
+        """
+        Change the rate, keeping the current level (or debt) rather than
+        refilling, so a new budget cannot be used to burst.
+        """
+        _check_budget(per_minute)
+        self.refill(now)
+        self.rate = per_minute / 60.0
+        self.capacity = per_minute
+        self.level = min(self.level, self.capacity)
+
+
+class RateLimiter:
+    """Requests-per-minute and tokens-per-minute budgets."""
+
+    def __init__(self, rpm: int = RPM, tpm: Optional[int] = TPM):
+        self._lock = Lock()
+        self.rpm = self.tpm = None
+        self.configure(rpm, tpm)
+
+    def configure(self, rpm: int, tpm: Optional[int] = None):
+        """
+        Set the budgets; a tpm of None or 0 leaves tokens unlimited.
+
+        Changed budgets keep what is left of the current ones, so switching
+        them back and forth does not refill the buckets.
+        """
+        _check_budget(rpm)
+        if tpm is not None and tpm < 0:
+            raise ValueError(f"tpm must be 0 or more, got {tpm!r}")
+        tpm = tpm or None
+        with self._lock:
+            if (rpm, tpm) == (self.rpm, self.tpm):
+                return
+            now = time.monotonic()
+            if self.rpm is None:
+                self.requests = TokenBucket(rpm)
+            else:
+                self.requests.resize(rpm, now)
+            if tpm is None:
+                self.tokens = None
+            elif self.tpm is None:
+                self.tokens = TokenBucket(tpm)
+            else:
+                self.tokens.resize(tpm, now)
+            self.rpm, self.tpm = rpm, tpm
+
+    def reserve(self, tokens: int = 0) -> float:
+        """Reserve a request using about this many tokens; return the seconds to wait for it."""
+        with self._lock:
+            now = time.monotonic()
+            wait = self.requests.reserve(1, now)
+            if self.tokens is not None:
+                wait = max(wait, self.tokens.reserve(tokens, now))
+        return wait
+
+    def acquire(self, tokens: int = 0):
+        """Wait until a request using about this many tokens may start."""
+        acquire_all([self], tokens)
+
+    def consume(self, tokens: int):
+        """Charge tokens known only after the call, e.g. the completion."""
+        if self.tokens is None:
+            return
+        with self._lock:
+            self.tokens.reserve(tokens, time.monotonic())
+
 
-        @wraps(func)
-        def wrapper(*args, **kwargs):
-            with lock:
-                max_per_minute = get_max_per_minute()
-                min_interval = 60.0 / max_per_minute
-                elapsed = time.time() - last_called[0]
-                left_to_wait = min_interval - elapsed
+def acquire_all(limiters: Iterable[RateLimiter], tokens: int = 0):
+    """Wait until a request using about this many tokens may start under every limiter."""
+    # Only the reservations are made under the locks; waiting happens
+    # outside them, so calls that were admitted can run concurrently
+    wait = max(limiter.reserve(tokens) for limiter in limiters)
+    if wait > 0:
+        time.sleep(wait)
 
-                if left_to_wait > 0:
-                    time.sleep(left_to_wait)
 
-                ret = func(*args, **kwargs)
-                last_called[0] = time.time()
-                return ret
+# One limiter per endpoint, base URL and key, like the backends, so the
+# primary and the reflection endpoints have independent budgets
+rate_limiters = {}
+rate_limiters_lock = Lock()
 
-        return wrapper
 
-    return decorator
+def get_rate_limiter(
+    endpoint: str, base_url: str = "", api_key: Optional[str] = None
+) -> RateLimiter:
+    """Get the limiter shared by every call to an endpoint, base URL and key."""
+    key = (endpoint, base_url or "", api_key or "")
+    with rate_limiters_lock:
+        if key not in rate_limiters:
+            rate_limiters[key] = RateLimiter(ENDPOINT_RPM, ENDPOINT_TPM)
+        return rate_limiters[key]
 
 
-@rate_limit(lambda: RPM)
-def get_completion(
-    prompt: str,
-    system_message: str = "You are a helpful assistant.",
-    model: str = "gpt-4-turbo",
-    temperature: float = 0.3,
-    json_mode: bool = False,
-) -> Union[str, dict]:
+class Backend:
+    """
+    Client of one endpoint, built once and shared by every session using it,
+    so its HTTP connection pool is reused from request to request.
     """
-        Generate a completion using the OpenAI API.
 
-    Args:
-        prompt (str): The user's prompt or query.
-        system_message (str, optional): The system message to set the context for the assistant.
-            Defaults to "You are a helpful assistant.".
-        model (str, optional): The name of the OpenAI model to use for generating the completion.
-            Defaults to "gpt-4-turbo".
-        temperature (float, optional): The sampling temperature for controlling the randomness of the generated text.
-            Defaults to 0.3.
-        json_mode (bool, optional): Whether to return the response in JSON format.
-            Defaults to False.
+    def __init__(
+        self, endpoint: str, base_url: str = "", api_key: Optional[str] = None
+    ):
+        self.endpoint = endpoint
+        self.client = make_client(endpoint, base_url, api_key)
+        if endpoint == "Ollama":
+            self.base_url = base_url or OLLAMA_BASE_URL
+            # Keep-alive connections shared by every call to the server
+            self.http = make_session()
+        else:
+            self.base_url = base_url
+            self.http = None
+        self.limiter = get_rate_limiter(endpoint, base_url, api_key)
 
-    Returns:
-        Union[str, dict]: The generated completion.
-            If json_mode is True, returns the complete API response as a dictionary.
-            If json_mode is False, returns the generated text as a string.
+
+backends = {}
+backends_lock = Lock()
+
+
+def get_backend(
+    endpoint: str, base_url: str = "", api_key: Optional[str] = None
+) -> Backend:
+    """Get the backend of an endpoint, base URL and key, building it on first use."""
+    key = (endpoint, base_url or "", api_key or "")
+    with backends_lock:
+        if key not in backends:
+            backends[key] = Backend(endpoint, base_url, api_key)
+        return backends[key]
+
+
+def rate_limit(func):
+    """Wait for the session's and the endpoint's budgets before each call."""
+
+    @wraps(func)
+    def wrapper(
+        self, prompt: str, system_message: str = "You are a helpful assistant."
+    ):
+        acquire_all(
+            self.limiters,
+            utils.num_tokens_in_string(system_message)
+            + utils.num_tokens_in_string(prompt),
+        )
+        ret = func(self, prompt, system_message)
+        if isinstance(ret, str):
+            _consume(self.limiters, utils.num_tokens_in_string(ret))
+            return ret
+        return _consume_stream(self.limiters, ret)
+
+    return wrapper
+
+
+def _consume(limiters: Iterable[RateLimiter], tokens: int):
+    for limiter in limiters:
+        limiter.consume(tokens)
+
+
+def _consume_stream(
+    limiters: Iterable[RateLimiter], pieces: Iterator[str]
+) -> Iterator[str]:
+    completion = []
+    for piece in pieces:
+        completion.append(piece)
+        yield piece
+    _consume(limiters, utils.num_tokens_in_string("".join(completion)))
+
+
+class TranslationSession:
     """
+    Endpoint, model and rate limiter used by one translation request.
+
+    Every completion of a request goes through its session, which is passed
+    explicitly through the pipeline, so concurrent requests with different
+    endpoints or models do not interfere with each other. Each call waits
+    for the session's own budgets, rpm and tpm, and for those of the
+    endpoint, which every session using it shares (see ENDPOINT_RPM).
+    """
+
+    def __init__(
+        self,
+        endpoint: str,
+        base_url: str,
+        model: str,
+        api_key: Optional[str] = None,
+        temperature: float = TEMPERATURE,
+        rpm: int = RPM,
+        js_mode: bool = JS_MODE,
+        tpm: Optional[int] = TPM,
+    ):
+        self.endpoint = endpoint
+        self.model = model
+        self.temperature = temperature
+        self.js_mode = js_mode
+        self.backend = get_backend(endpoint, base_url, api_key)
+        self.client = self.backend.client
+        self.limiter = RateLimiter(rpm, tpm)
+        self.limiters = (self.limiter, self.backend.limiter)
+
+    @rate_limit
+    def complete(
+        self,
+        prompt: str,
+        system_message: str = "You are a helpful assistant.",
+    ) -> str:
+        """
+            Generate a completion with the session's endpoint and model.
+
+        Args:
+            prompt (str): The user's prompt or query.
+            system_message (str, optional): The system message to set the context for the assistant.
+                Defaults to "You are a helpful assistant.".
 
-    model = MODEL
-    temperature = TEMPERATURE
-    json_mode = JS_MODE
+        Returns:
+            str: The generated completion.
+        """
 
-    # Handle Ollama endpoint differently
-    if ENDPOINT == "Ollama":
-        return _ollama_completion(prompt, system_message, model, temperature, json_mode)
-    
-    if json_mode:
+        # Handle Ollama endpoint differently
+        if self.endpoint == "Ollama":
+            return self._ollama_completion(prompt, system_message)
+
+        kwargs = {}
+        if self.js_mode:
+            kwargs["response_format"] = {"type": "json_object"}
         try:
-            response = client.chat.completions.create(
-                model=model,
-                temperature=temperature,
+            response = self.client.chat.completions.create(
+                model=self.model,
+                temperature=self.temperature,
                 top_p=1,
-                response_format={"type": "json_object"},
                 messages=[
                     {"role": "system", "content": system_message},
                     {"role": "user", "content": prompt},
                 ],
+                **kwargs,
             )
             return response.choices[0].message.content
         except Exception as e:
             raise gr.Error(f"An unexpected error occurred: {e}") from e
-    else:
+
+    @rate_limit
+    def complete_stream(
+        self,
+        prompt: str,
+        system_message: str = "You are a helpful assistant.",
+    ) -> Iterator[str]:
+        """
+            Start a streamed completion and return an iterator over its text.
+
+        The request is sent before this method returns, so the rate limit
+        applies to when the request is made; the text arrives while the
+        returned iterator is consumed.
+
+        Args:
+            prompt (str): The user's prompt or query.
+            system_message (str, optional): The system message to set the context for the assistant.
+                Defaults to "You are a helpful assistant.".
+
+        Returns:
+            Iterator[str]: Pieces of the generated completion.
+        """
+
+        if self.endpoint == "Ollama":
+            return self._ollama_completion_stream(prompt, system_message)
+
         try:
-            response = client.chat.completions.create(
-                model=model,
-                temperature=temperature,
+            response = self.client.chat.completions.create(
+                model=self.model,
+                temperature=self.temperature,
                 top_p=1,
+                stream=True,
                 messages=[
                     {"role": "system", "content": system_message},
                     {"role": "user", "content": prompt},
                 ],
             )
-            return response.choices[0].message.content
         except Exception as e:
             raise gr.Error(f"An unexpected error occurred: {e}") from e
 
+        return (
+            chunk.choices[0].delta.content
+            for chunk in response
+            if chunk.choices and chunk.choices[0].delta.content
+        )
 
-def _ollama_completion(prompt: str, system_message: str, model: str, temperature: float, json_mode: bool) -> str:
-    """Handle Ollama API calls directly."""
-    full_prompt = f"System: {system_message}\n\nUser: {prompt}\n\nAssistant:"
-    
-    payload = {
-        "model": model,
-        "prompt": full_prompt,
-        "stream": False,
-        "options": {
-            "temperature": temperature,
-            "top_p": 1.0
+    def _ollama_payload(
+        self, prompt: str, system_message: str, stream: bool
+    ) -> dict:
+        payload = {
+            "model": self.model,
+            "stream": stream,
+            "options": request_options(self.model, self.temperature),
         }
-    }
-    
-    if json_mode:
-        payload["format"] = "json"
-    
-    try:
-        response = requests.post(
-            f"{OLLAMA_BASE_URL}/api/generate",
-            json=payload,
-            timeout=120
+        if OLLAMA_KEEP_ALIVE is not None:
+            payload["keep_alive"] = OLLAMA_KEEP_ALIVE
+        if OLLAMA_API == "chat":
+            payload["messages"] = chat_messages(system_message, prompt)
+        else:
+            payload["prompt"] = prompt
+            payload["system"] = system_message
+
+        if self.js_mode and not stream:
+            payload["format"] = "json"
+        return payload
+
+    def _ollama_url(self) -> str:
+        return f"{self.backend.base_url}/api/{OLLAMA_API}"
+
+    def _ollama_completion(self, prompt: str, system_message: str) -> str:
+        """Handle Ollama API calls directly."""
+        try:
+            response = self.backend.http.post(
+                self._ollama_url(),
+                json=self._ollama_payload(
+                    prompt, system_message, stream=False
+                ),
+                timeout=(OLLAMA_CONNECT_TIMEOUT, OLLAMA_READ_TIMEOUT),
+            )
+            response.raise_for_status()
+
+            return response_text(response.json())
+
+        except requests.exceptions.RequestException as e:
+            raise gr.Error(f"Ollama API error: {e}") from e
+        except json.JSONDecodeError as e:
+            raise gr.Error(f"Invalid Ollama response: {e}") from e
+
+    def _ollama_completion_stream(
+        self, prompt: str, system_message: str
+    ) -> Iterator[str]:
+        """Start a streamed Ollama generation and return an iterator over its text."""
+        try:
+            response = self.backend.http.post(
+                self._ollama_url(),
+                json=self._ollama_payload(prompt, system_message, stream=True),
+                timeout=(OLLAMA_CONNECT_TIMEOUT, OLLAMA_READ_TIMEOUT),
+                stream=True,
+            )
+            response.raise_for_status()
+        except requests.exceptions.RequestException as e:
+            raise gr.Error(f"Ollama API error: {e}") from e
+
+        def pieces():
+            with response:
+                try:
+                    for line in response.iter_lines():
+                        if not line:
+                            continue
+                        result = json.loads(line)
+                        if "error" in result:
+                            raise gr.Error(
+                                f"Ollama API error: {result['error']}"
+                            )
+                        piece = response_text(result)
+                        if piece:
+                            yield piece
+                        if result.get("done"):
+                            break
+                except requests.exceptions.RequestException as e:
+                    raise gr.Error(f"Ollama API error: {e}") from e
+                except json.JSONDecodeError as e:
+                    raise gr.Error(f"Invalid Ollama response: {e}") from e
+
+        return pieces()
+
+
+def route_stages(
+    session: TranslationSession,
+    additional_session: Optional[TranslationSession] = None,
+    additional_stages: Iterable[str] = ADDITIONAL_ENDPOINT_STAGES,
+) -> Dict[str, TranslationSession]:
+    """
+    Map every pipeline stage to the session that runs it.
+
+    Args:
+        session (TranslationSession): Session of the primary endpoint.
+        additional_session (TranslationSession, optional): Session of the
+            additional endpoint, if one is enabled.
+        additional_stages (Iterable[str]): Stages sent to the additional
+            endpoint. Defaults to APP_ADDITIONAL_ENDPOINT_STAGES.
+
+    Returns:
+        Dict[str, TranslationSession]: Session of each of STAGES.
+    """
+    additional_stages = set(additional_stages)
+    unknown = additional_stages - set(STAGES)
+    if unknown:
+        raise ValueError(
+            f"Unknown stages {sorted(unknown)}, expected {STAGES}"
         )
-        response.raise_for_status()
-        
-        result = response.json()
-        return result.get("response", "")
-        
-    except requests.exceptions.RequestException as e:
-        raise gr.Error(f"Ollama API error: {e}") from e
-    except json.JSONDecodeError as e:
-        raise gr.Error(f"Invalid Ollama response: {e}") from e
+
+    return {
+        stage: (
+            additional_session
+            if additional_session is not None and stage in additional_stages
+            else session
+        )
+        for stage in STAGES
+    }
 
 
 def get_ollama_models():
     """Get list of available Ollama models."""
     try:
-        response = requests.get(f"{OLLAMA_BASE_URL}/api/tags", timeout=30)
+        ollama = get_backend("Ollama")
+        response = ollama.http.get(
+            f"{ollama.base_url}/api/tags", timeout=(OLLAMA_CONNECT_TIMEOUT, 30)
+        )
         response.raise_for_status()
-        
+
         result = response.json()
         models = result.get("models", [])
         return [model.get("name", "") for model in models if model.get("name")]
-        
+
     except requests.exceptions.RequestException:
         # Return default models if can't connect
         return ["llama3.1:8b", "llama3:8b", "mistral:7b", "qwen2:7b"]
@@ -213,30 +534,36 @@ def ensure_ollama_model(model_name: str) -> bool:
         available_models = get_ollama_models()
         if model_name in available_models:
             return True
-        
+
         # Try to pull the model
         payload = {"name": model_name}
-        response = requests.post(
-            f"{OLLAMA_BASE_URL}/api/pull",
+        ollama = get_backend("Ollama")
+        response = ollama.http.post(
+            f"{ollama.base_url}/api/pull",
             json=payload,
-            timeout=300  # 5 minutes timeout
+            timeout=(OLLAMA_CONNECT_TIMEOUT, 300),  # 5 minutes timeout
         )
         response.raise_for_status()
         return True
-        
+
     except requests.exceptions.RequestException:
         return False
 
 
-utils.get_completion = get_completion
-
-one_chunk_initial_translation = utils.one_chunk_initial_translation
-one_chunk_reflect_on_translation = utils.one_chunk_reflect_on_translation
-one_chunk_improve_translation = utils.one_chunk_improve_translation
-one_chunk_translate_text = utils.one_chunk_translate_text
+one_chunk_initial_translation_prompt = (
+    utils.one_chunk_initial_translation_prompt
+)
+one_chunk_reflection_prompt = utils.one_chunk_reflection_prompt
+one_chunk_improvement_prompt = utils.one_chunk_improvement_prompt
 num_tokens_in_string = utils.num_tokens_in_string
-multichunk_initial_translation = utils.multichunk_initial_translation
-multichunk_reflect_on_translation = utils.multichunk_reflect_on_translation
-multichunk_improve_translation = utils.multichunk_improve_translation
-multichunk_translation = utils.multichunk_translation
+multichunk_initial_translation_prompt = (
+    utils.multichunk_initial_translation_prompt
+)
+multichunk_reflection_prompt = utils.multichunk_reflection_prompt
+multichunk_improvement_prompt = utils.multichunk_improvement_prompt
 calculate_chunk_size = utils.calculate_chunk_size
+split_source_text = utils.split_source_text
+tokenize = utils.tokenize
+get_context_policy = utils.get_context_policy
+run_chunks = utils.run_chunks
+get_executor = utils.get_executor
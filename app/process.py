@@ -1,25 +1,25 @@
+import logging
 from difflib import Differ
 
 import docx
-import gradio as gr
 import pymupdf
-from icecream import ic
-from langchain_text_splitters import RecursiveCharacterTextSplitter
 from patch import (
-    calculate_chunk_size,
-    model_load,
-    multichunk_improve_translation,
-    multichunk_initial_translation,
-    multichunk_reflect_on_translation,
-    num_tokens_in_string,
-    one_chunk_improve_translation,
-    one_chunk_initial_translation,
-    one_chunk_reflect_on_translation,
+    get_context_policy,
+    get_executor,
+    multichunk_improvement_prompt,
+    multichunk_initial_translation_prompt,
+    multichunk_reflection_prompt,
+    one_chunk_improvement_prompt,
+    one_chunk_initial_translation_prompt,
+    one_chunk_reflection_prompt,
+    split_source_text,
 )
+from patch import tokenize as encode_text
 from simplemma import simple_tokenizer
 
 
-progress = gr.Progress()
+# Under the package logger, so log.configure_logging covers the app too
+logger = logging.getLogger("translation_agent.app")
 
 
 def extract_text(path):
@@ -86,178 +86,165 @@ def diff_texts(text1, text2):
     return highlighted_text
 
 
-# modified from src.translaation-agent.utils.tranlsate
-def translator(
-    source_lang: str,
-    target_lang: str,
-    source_text: str,
-    country: str,
-    max_tokens: int = 1000,
-):
-    """Translate the source_text from source_lang to target_lang."""
-    num_tokens_in_text = num_tokens_in_string(source_text)
+def no_progress(*args, **kwargs):
+    pass
 
-    ic(num_tokens_in_text)
 
-    if num_tokens_in_text < max_tokens:
-        ic("Translating text as single chunk")
+def stream_improvement(session, init_translation, reflection, prompts):
+    """
+    Yield the outputs so far while the improvement prompts are streamed in order.
 
-        progress((1, 3), desc="First translation...")
-        init_translation = one_chunk_initial_translation(
-            source_lang, target_lang, source_text
-        )
+    The prompts run concurrently on a chunk executor; the completion of the
+    first unfinished prompt is shown as it arrives, the later ones as soon as
+    the prompts before them are done.
+    """
+    final_translation = ""
+    yield init_translation, reflection, final_translation
 
-        progress((2, 3), desc="Reflection...")
-        reflection = one_chunk_reflect_on_translation(
-            source_lang, target_lang, source_text, init_translation, country
-        )
+    def improve(messages):
+        system_message, prompt = messages
+        return session.complete_stream(prompt, system_message)
 
-        progress((3, 3), desc="Second translation...")
-        final_translation = one_chunk_improve_translation(
-            source_lang, target_lang, source_text, init_translation, reflection
-        )
-
-        return init_translation, reflection, final_translation
-
-    else:
-        ic("Translating text as multiple chunks")
-
-        token_size = calculate_chunk_size(
-            token_count=num_tokens_in_text, token_limit=max_tokens
-        )
+    with get_executor() as executor:
+        for piece in executor.imap_stream(improve, prompts):
+            final_translation += piece
+            yield init_translation, reflection, final_translation
 
-        ic(token_size)
 
-        text_splitter = RecursiveCharacterTextSplitter.from_tiktoken_encoder(
-            model_name="gpt-4",
-            chunk_size=token_size,
-            chunk_overlap=0,
-        )
+def stream_chunks(
+    routes,
+    source_lang,
+    target_lang,
+    source_text_chunks,
+    country,
+    context_policy,
+    progress=no_progress,
+):
+    """
+    Yield the outputs so far while every chunk goes through the three stages on its own.
 
-        source_text_chunks = text_splitter.split_text(source_text)
+    The chunks run concurrently on a chunk executor, and each one moves on
+    to its reflection and improvement without waiting for the other chunks.
+    The outputs grow in document order: those of the first unfinished chunk
+    are shown as they arrive, its improvement token by token, and those of
+    later chunks as soon as the chunks before them are done.
+    """
 
-        progress((1, 3), desc="First translation...")
-        translation_1_chunks = multichunk_initial_translation(
-            source_lang, target_lang, source_text_chunks
+    def run_chunk(i):
+        system_message, prompt = multichunk_initial_translation_prompt(
+            source_lang, target_lang, source_text_chunks, i, context_policy
         )
+        translation_1 = routes["initial"].complete(prompt, system_message)
+        yield "initial", translation_1
 
-        init_translation = "".join(translation_1_chunks)
-
-        progress((2, 3), desc="Reflection...")
-        reflection_chunks = multichunk_reflect_on_translation(
+        system_message, prompt = multichunk_reflection_prompt(
             source_lang,
             target_lang,
             source_text_chunks,
-            translation_1_chunks,
+            i,
+            translation_1,
             country,
+            context_policy,
         )
+        reflection = routes["reflect"].complete(prompt, system_message)
+        yield "reflect", reflection
 
-        reflection = "".join(reflection_chunks)
-
-        progress((3, 3), desc="Second translation...")
-        translation_2_chunks = multichunk_improve_translation(
+        system_message, prompt = multichunk_improvement_prompt(
             source_lang,
             target_lang,
             source_text_chunks,
-            translation_1_chunks,
-            reflection_chunks,
-        )
-
-        final_translation = "".join(translation_2_chunks)
+            i,
+            translation_1,
+            reflection,
+            context_policy,
+        )
+        for piece in routes["improve"].complete_stream(prompt, system_message):
+            yield "improve", piece
+
+    outputs = {"initial": "", "reflect": "", "improve": ""}
+    shown = 0
+    with get_executor() as executor:
+        pieces = executor.imap_stream(
+            run_chunk, range(len(source_text_chunks))
+        )
+        for stage, text in pieces:
+            if stage == "initial":
+                shown += 1
+                progress(
+                    (shown, len(source_text_chunks)),
+                    desc="Translating chunk by chunk...",
+                )
+            outputs[stage] += text
+            yield outputs["initial"], outputs["reflect"], outputs["improve"]
 
-        return init_translation, reflection, final_translation
 
-
-def translator_sec(
-    endpoint2: str,
-    base2: str,
-    model2: str,
-    api_key2: str,
+# modified from src.translaation-agent.utils.tranlsate
+def translator(
+    routes,
     source_lang: str,
     target_lang: str,
     source_text: str,
     country: str,
     max_tokens: int = 1000,
+    progress=no_progress,
 ):
-    """Translate the source_text from source_lang to target_lang."""
-    num_tokens_in_text = num_tokens_in_string(source_text)
+    """
+    Translate the source_text from source_lang to target_lang.
+
+    routes maps each stage ("initial", "reflect", "improve") to the session
+    that runs it, see patch.route_stages. Yields (initial translation,
+    reflection, final translation so far) as the stages finish, the final
+    translation token by token. A long text is split into chunks that move
+    through the stages on their own, see stream_chunks.
+    """
+    tokenized = encode_text(source_text)
+    num_tokens_in_text = len(tokenized)
 
-    ic(num_tokens_in_text)
+    logger.debug("Text has %d tokens", num_tokens_in_text)
 
     if num_tokens_in_text < max_tokens:
-        ic("Translating text as single chunk")
+        logger.debug("Translating text as single chunk")
 
         progress((1, 3), desc="First translation...")
-        init_translation = one_chunk_initial_translation(
+        system_message, prompt = one_chunk_initial_translation_prompt(
             source_lang, target_lang, source_text
         )
-
-        try:
-            model_load(endpoint2, base2, model2, api_key2)
-        except Exception as e:
-            raise gr.Error(f"An unexpected error occurred: {e}") from e
+        init_translation = routes["initial"].complete(prompt, system_message)
+        yield init_translation, "", ""
 
         progress((2, 3), desc="Reflection...")
-        reflection = one_chunk_reflect_on_translation(
+        system_message, prompt = one_chunk_reflection_prompt(
             source_lang, target_lang, source_text, init_translation, country
         )
+        reflection = routes["reflect"].complete(prompt, system_message)
 
         progress((3, 3), desc="Second translation...")
-        final_translation = one_chunk_improve_translation(
-            source_lang, target_lang, source_text, init_translation, reflection
+        yield from stream_improvement(
+            routes["improve"],
+            init_translation,
+            reflection,
+            [
+                one_chunk_improvement_prompt(
+                    source_lang,
+                    target_lang,
+                    source_text,
+                    init_translation,
+                    reflection,
+                )
+            ],
         )
 
-        return init_translation, reflection, final_translation
-
     else:
-        ic("Translating text as multiple chunks")
-
-        token_size = calculate_chunk_size(
-            token_count=num_tokens_in_text, token_limit=max_tokens
-        )
-
-        ic(token_size)
-
-        text_splitter = RecursiveCharacterTextSplitter.from_tiktoken_encoder(
-            model_name="gpt-4",
-            chunk_size=token_size,
-            chunk_overlap=0,
-        )
-
-        source_text_chunks = text_splitter.split_text(source_text)
+        logger.debug("Translating text as multiple chunks")
 
-        progress((1, 3), desc="First translation...")
-        translation_1_chunks = multichunk_initial_translation(
-            source_lang, target_lang, source_text_chunks
-        )
-
-        init_translation = "".join(translation_1_chunks)
-
-        try:
-            model_load(endpoint2, base2, model2, api_key2)
-        except Exception as e:
-            raise gr.Error(f"An unexpected error occurred: {e}") from e
+        source_text_chunks = split_source_text(tokenized, max_tokens)
 
-        progress((2, 3), desc="Reflection...")
-        reflection_chunks = multichunk_reflect_on_translation(
+        yield from stream_chunks(
+            routes,
             source_lang,
             target_lang,
             source_text_chunks,
-            translation_1_chunks,
             country,
+            get_context_policy(),
+            progress,
         )
-
-        reflection = "".join(reflection_chunks)
-
-        progress((3, 3), desc="Second translation...")
-        translation_2_chunks = multichunk_improve_translation(
-            source_lang,
-            target_lang,
-            source_text_chunks,
-            translation_1_chunks,
-            reflection_chunks,
-        )
-
-        final_translation = "".join(translation_2_chunks)
-
-        return init_translation, reflection, final_translation
@@ -0,0 +1,274 @@
+"""
+Deterministic stand-in for an Ollama server.
+
+Serves /api/generate and /api/chat (plain and streamed), /api/tags and
+/api/pull. A generation "translates" by echoing the text it was asked to
+translate, and takes as long as a real server would at the configured speed:
+
+    latency + uncached prompt tokens / prefill rate + output tokens / token rate
+
+At most ``parallel`` generations run at once, like OLLAMA_NUM_PARALLEL;
+the rest queue. Like Ollama's KV cache, each of the ``parallel`` slots
+remembers the last prompt it evaluated, and the part of a new prompt that
+starts the same way is not evaluated again. Tokens are counted as words and punctuation marks, which
+is close enough to compare one run with another.
+"""
+
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+
+
+TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+
+# Where the translation prompts show the text being translated, most
+# specific first
+SOURCE_PATTERNS = [
+    re.compile(r"<TRANSLATE_THIS>\n(.*?)\n</TRANSLATE_THIS>", re.DOTALL),
+    re.compile(r"<SOURCE_TEXT>\n(.*?)\n</SOURCE_TEXT>", re.DOTALL),
+    # One-chunk initial translation: "<source lang>: <text>\n\n<target lang>:"
+    re.compile(r"translation\.\n[^\n:]+: (.*?)\n\n[^\n:]+:\s*$", re.DOTALL),
+]
+
+
+def shared_prefix(a: List[str], b: List[str]) -> int:
+    """Count the tokens two prompts start with in common."""
+    n = 0
+    for x, y in zip(a, b):
+        if x != y:
+            break
+        n += 1
+    return n
+
+
+def fake_completion(prompt: str) -> str:
+    """Return the text a prompt asks to translate, or the whole prompt."""
+    for pattern in SOURCE_PATTERNS:
+        found = pattern.findall(prompt)
+        if found:
+            return found[-1]
+    return prompt
+
+
+class FakeOllama:
+    """A fake Ollama server running on a background thread."""
+
+    def __init__(
+        self,
+        models: Optional[List[str]] = None,
+        latency: float = 0.05,
+        prefill_rate: float = 2000.0,
+        token_rate: float = 50.0,
+        parallel: int = 4,
+        host: str = "127.0.0.1",
+        port: int = 0,
+    ):
+        """
+        Configure the server.
+
+        Args:
+            models (List[str], optional): Model names listed by /api/tags.
+            latency (float): Seconds added to every generation.
+            prefill_rate (float): Prompt tokens processed per second.
+            token_rate (float): Output tokens generated per second, per generation.
+            parallel (int): Generations served at once.
+            host (str): Interface to listen on.
+            port (int): Port to listen on. 0 picks a free port.
+        """
+        self.models = list(models or [])
+        self.latency = latency
+        self.prefill_rate = prefill_rate
+        self.token_rate = token_rate
+        self._slots = threading.BoundedSemaphore(parallel)
+        # Last prompt evaluated by each slot, most recently used first
+        self._kv_cache: List[List[str]] = []
+        self.parallel = parallel
+        self._lock = threading.Lock()
+        self.reset()
+
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format: str, *args: Any) -> None:
+                pass
+
+            def do_GET(self) -> None:  # noqa: N802
+                if self.path == "/api/tags":
+                    self._send_json(
+                        {"models": [{"name": name} for name in server.models]}
+                    )
+                else:
+                    self._send_json({"error": "not found"}, status=404)
+
+            def do_POST(self) -> None:  # noqa: N802
+                length = int(self.headers.get("Content-Length", 0))
+                body = json.loads(self.rfile.read(length) or b"{}")
+                if self.path in ("/api/generate", "/api/chat"):
+                    server._generate(self, body)
+                elif self.path == "/api/pull":
+                    server.models.append(body.get("name", ""))
+                    self._send_json({"status": "success"})
+                else:
+                    self._send_json({"error": "not found"}, status=404)
+
+            def _send_json(
+                self, data: Dict[str, Any], status: int = 200
+            ) -> None:
+                payload = json.dumps(data).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+        self._httpd = ThreadingHTTPServer((host, port), Handler)
+        self._httpd.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def reset(self) -> None:
+        """Zero the request and token counters."""
+        with self._lock:
+            self.requests = 0
+            self.prompt_tokens = 0
+            self.cached_prompt_tokens = 0
+            self.completion_tokens = 0
+            self._kv_cache = []
+
+    def stats(self) -> Dict[str, int]:
+        """Get the counters since the last reset."""
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "prompt_tokens": self.prompt_tokens,
+                "cached_prompt_tokens": self.cached_prompt_tokens,
+                "completion_tokens": self.completion_tokens,
+            }
+
+    def _generate(
+        self, handler: BaseHTTPRequestHandler, body: Dict[str, Any]
+    ) -> None:
+        if "prompt" not in body and "messages" not in body:
+            # A load or unload request, see OllamaClient.load_model
+            unload = body.get("keep_alive") == 0
+            handler._send_json(
+                {
+                    "model": body.get("model"),
+                    "response": "",
+                    "done": True,
+                    "done_reason": "unload" if unload else "load",
+                }
+            )
+            return
+        chat = "messages" in body
+        if chat:
+            messages = body["messages"]
+            prompt = "".join(m.get("content", "") for m in messages)
+            response = fake_completion(messages[-1].get("content", ""))
+        else:
+            prompt = (body.get("system") or "") + body.get("prompt", "")
+            response = fake_completion(body.get("prompt", ""))
+        pieces = TOKEN_PATTERN.findall(response)
+        prompt_tokens = TOKEN_PATTERN.findall(prompt)
+        with self._lock:
+            cached = self._evaluate_prompt(prompt_tokens)
+            self.requests += 1
+            self.prompt_tokens += len(prompt_tokens)
+            self.cached_prompt_tokens += cached
+            self.completion_tokens += len(pieces)
+        evaluated = len(prompt_tokens) - cached
+
+        def text(value: str) -> Dict[str, Any]:
+            if chat:
+                return {"message": {"role": "assistant", "content": value}}
+            return {"response": value}
+
+        with self._slots:
+            time.sleep(self.latency + evaluated / self.prefill_rate)
+            if not body.get("stream", True):
+                time.sleep(len(pieces) / self.token_rate)
+                handler._send_json(
+                    {
+                        "model": body.get("model"),
+                        **text(response),
+                        "done": True,
+                        "prompt_eval_count": evaluated,
+                        "eval_count": len(pieces),
+                    }
+                )
+                return
+
+            handler.send_response(200)
+            handler.send_header("Content-Type", "application/x-ndjson")
+            handler.send_header("Transfer-Encoding", "chunked")
+            handler.end_headers()
+            # Stream the response back word by word, keeping the spacing
+            rest = response
+            for piece in pieces:
+                at = rest.index(piece) + len(piece)
+                self._send_chunk(handler, {**text(rest[:at]), "done": False})
+                rest = rest[at:]
+                time.sleep(1 / self.token_rate)
+            self._send_chunk(
+                handler,
+                {
+                    **text(rest),
+                    "done": True,
+                    "prompt_eval_count": evaluated,
+                    "eval_count": len(pieces),
+                },
+            )
+            handler.wfile.write(b"0\r\n\r\n")
+
+    def _evaluate_prompt(self, tokens: List[str]) -> int:
+        """
+        Give a prompt the slot whose last prompt shares the longest prefix
+        with it, and return the length of that prefix.
+        """
+        best, cached = None, 0
+        for slot, seen in enumerate(self._kv_cache):
+            n = shared_prefix(tokens, seen)
+            if n > cached:
+                best, cached = slot, n
+        if best is not None:
+            del self._kv_cache[best]
+        elif len(self._kv_cache) >= self.parallel:
+            # Reuse the least recently used slot
+            self._kv_cache.pop()
+        self._kv_cache.insert(0, tokens)
+        return cached
+
+    @staticmethod
+    def _send_chunk(
+        handler: BaseHTTPRequestHandler, data: Dict[str, Any]
+    ) -> None:
+        line = json.dumps(data).encode("utf-8") + b"\n"
+        handler.wfile.write(b"%x\r\n%s\r\n" % (len(line), line))
+
+    def start(self) -> "FakeOllama":
+        """Serve requests on a daemon thread."""
+        self._thread = threading.Thread(
+            target=self._httpd.serve_forever, daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """Stop serving and close the socket."""
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self) -> "FakeOllama":
+        return self.start()
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.stop()
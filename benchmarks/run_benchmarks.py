@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+"""
+Throughput benchmark for the translation pipeline.
+
+Starts a FakeOllama server, points the library and the app at it and
+translates the examples/sample-texts corpus with each target:
+
+    translate     translation_agent.translate, one file at a time
+    multichunk    utils.multichunk_translation on the chunks of each file
+    app           the Gradio app's translator generator (needs the app
+                  dependencies; skipped when they are not installed)
+
+For every target it reports wall time, requests, prompt and completion
+tokens, and completion tokens per second, as seen by the fake server.
+Nothing needs a GPU, so two revisions can be compared on a laptop:
+
+    python benchmarks/run_benchmarks.py --json before.json
+    git checkout my-branch
+    python benchmarks/run_benchmarks.py --json after.json
+"""
+
+import argparse
+import glob
+import json
+import os
+import statistics
+import sys
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CORPUS = os.path.join(ROOT, "examples", "sample-texts", "*.txt")
+TARGETS = ["translate", "multichunk", "app"]
+SOURCE_LANG, TARGET_LANG, COUNTRY = "English", "Spanish", "Mexico"
+
+sys.path.insert(0, os.path.join(ROOT, "src"))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_ollama import FakeOllama  # noqa: E402
+
+
+def load_corpus(pattern: str) -> Dict[str, str]:
+    corpus = {}
+    for path in sorted(glob.glob(pattern)):
+        with open(path, encoding="utf-8") as f:
+            corpus[os.path.basename(path)] = f.read()
+    return corpus
+
+
+def translate_target(max_tokens: int) -> Callable[[str], Any]:
+    import translation_agent as ta
+
+    def run(text: str) -> str:
+        return ta.translate(
+            SOURCE_LANG, TARGET_LANG, text, COUNTRY, max_tokens=max_tokens
+        )
+
+    return run
+
+
+def multichunk_target(max_tokens: int) -> Callable[[str], Any]:
+    from translation_agent import utils
+
+    def run(text: str) -> List[str]:
+        chunks = utils.split_source_text(utils.tokenize(text), max_tokens)
+        return utils.multichunk_translation(
+            SOURCE_LANG, TARGET_LANG, chunks, COUNTRY
+        )
+
+    return run
+
+
+def app_target(max_tokens: int) -> Optional[Callable[[str], Any]]:
+    sys.path.insert(0, os.path.join(ROOT, "app"))
+    try:
+        from patch import TranslationSession, route_stages
+        from process import translator
+    except ImportError as e:
+        print(f"Skipping app: {e}", file=sys.stderr)
+        return None
+
+    from translation_agent.config import DEFAULT_OLLAMA_MODEL
+
+    # The rate limiter would otherwise measure itself, not the pipeline
+    session = TranslationSession(
+        "Ollama", "", DEFAULT_OLLAMA_MODEL, rpm=1_000_000
+    )
+    routes = route_stages(session)
+
+    def run(text: str) -> str:
+        final = ""
+        for _, _, partial in translator(
+            routes, SOURCE_LANG, TARGET_LANG, text, COUNTRY, max_tokens
+        ):
+            final = partial
+        return final
+
+    return run
+
+
+TARGET_FACTORIES = {
+    "translate": translate_target,
+    "multichunk": multichunk_target,
+    "app": app_target,
+}
+
+
+def run_target(
+    server: FakeOllama,
+    run: Callable[[str], Any],
+    corpus: Dict[str, str],
+    repeat: int,
+) -> Dict[str, Any]:
+    walls = []
+    for _ in range(repeat):
+        server.reset()
+        start = time.perf_counter()
+        for text in corpus.values():
+            run(text)
+        walls.append(time.perf_counter() - start)
+    wall = statistics.median(walls)
+    result: Dict[str, Any] = {"wall_s": round(wall, 3), **server.stats()}
+    result["completion_tokens_per_s"] = round(
+        result["completion_tokens"] / wall if wall else 0.0, 1
+    )
+    return result
+
+
+def print_table(results: Dict[str, Dict[str, Any]]) -> None:
+    columns = [
+        "wall_s",
+        "requests",
+        "prompt_tokens",
+        "cached_prompt_tokens",
+        "completion_tokens",
+        "completion_tokens_per_s",
+    ]
+    widths = [len(c) + 2 for c in columns]
+    print(
+        f"{'target':<12}"
+        + "".join(f"{c:>{w}}" for c, w in zip(columns, widths))
+    )
+    for target, result in results.items():
+        print(
+            f"{target:<12}"
+            + "".join(f"{result[c]:>{w}}" for c, w in zip(columns, widths))
+        )
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "--targets",
+        default=",".join(TARGETS),
+        help=f"Comma-separated targets to run (default: {','.join(TARGETS)})",
+    )
+    parser.add_argument(
+        "--corpus", default=CORPUS, help="Glob of the texts to translate"
+    )
+    parser.add_argument(
+        "--max-tokens", type=int, default=1000, help="Maximum tokens per chunk"
+    )
+    parser.add_argument(
+        "--repeat",
+        type=int,
+        default=1,
+        help="Runs per target; the median is reported",
+    )
+    parser.add_argument(
+        "--latency",
+        type=float,
+        default=0.05,
+        help="Seconds added to every request",
+    )
+    parser.add_argument(
+        "--prefill-rate",
+        type=float,
+        default=2000.0,
+        help="Prompt tokens per second",
+    )
+    parser.add_argument(
+        "--token-rate",
+        type=float,
+        default=200.0,
+        help="Output tokens per second per request",
+    )
+    parser.add_argument(
+        "--parallel",
+        type=int,
+        default=4,
+        help="Requests the server handles at once",
+    )
+    parser.add_argument(
+        "--port",
+        type=int,
+        default=0,
+        help="Server port (default: any free port)",
+    )
+    parser.add_argument("--json", help="Also write the results to this file")
+    args = parser.parse_args(argv)
+
+    targets = [t.strip() for t in args.targets.split(",") if t.strip()]
+    unknown = set(targets) - set(TARGET_FACTORIES)
+    if unknown:
+        parser.error(f"unknown targets: {', '.join(sorted(unknown))}")
+
+    corpus = load_corpus(args.corpus)
+    if not corpus:
+        parser.error(f"no files match {args.corpus}")
+
+    server = FakeOllama(
+        latency=args.latency,
+        prefill_rate=args.prefill_rate,
+        token_rate=args.token_rate,
+        parallel=args.parallel,
+        port=args.port,
+    ).start()
+
+    # Configuration is read when the package is imported, so the fake
+    # server and a disabled cache have to be in place first
+    os.environ["OLLAMA_BASE_URL"] = server.base_url
+    os.environ["TRANSLATION_CACHE_PATH"] = ""
+    from translation_agent.config import DEFAULT_OLLAMA_MODEL
+
+    server.models.append(DEFAULT_OLLAMA_MODEL)
+
+    results = {}
+    try:
+        for target in targets:
+            run = TARGET_FACTORIES[target](args.max_tokens)
+            if run is not None:
+                results[target] = run_target(server, run, corpus, args.repeat)
+    finally:
+        server.stop()
+
+    print_table(results)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(
+                {"settings": vars(args), "results": results}, f, indent=2
+            )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
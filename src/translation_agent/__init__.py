@@ -1,3 +1,13 @@
-from .utils import translate
-from .ollama_client import get_available_models, ensure_model_available
+from .utils import translate, translate_stream, ChunkTranslationError
+from .async_utils import atranslate
+from .ollama_client import (
+    get_available_models,
+    ensure_model_available,
+    warm_up_model,
+    unload_model,
+)
 from .config import get_recommended_models, get_model_config
+from .tracing import tracer, trace_stage
+from .log import configure_logging
+from .memory import TranslationMemory
+from .batch import translate_batch
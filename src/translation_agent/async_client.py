@@ -0,0 +1,320 @@
+"""
+Asyncio Ollama client for translation agent.
+Mirrors OllamaClient for use inside an event loop.
+"""
+
+import asyncio
+import logging
+import os
+import weakref
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpx
+
+from .cache import CompletionCache, completion_cache
+from .config import (
+    MAX_CONCURRENT_REQUESTS,
+    OLLAMA_CONNECT_TIMEOUT,
+    OLLAMA_KEEP_ALIVE,
+    OLLAMA_POOL_SIZE,
+    OLLAMA_READ_TIMEOUT,
+)
+from .ollama_client import (
+    OllamaError,
+    _messages_key,
+    request_options,
+    response_text,
+)
+from .retry import RetryPolicy
+from .tracing import active_span
+
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncOllamaClient:
+    """Asyncio client for interacting with Ollama API."""
+
+    def __init__(
+        self,
+        base_url: Optional[str] = None,
+        cache: Optional[CompletionCache] = None,
+        pool_size: int = OLLAMA_POOL_SIZE,
+        max_concurrency: int = MAX_CONCURRENT_REQUESTS,
+        connect_timeout: float = OLLAMA_CONNECT_TIMEOUT,
+        read_timeout: float = OLLAMA_READ_TIMEOUT,
+        keep_alive: Optional[Any] = OLLAMA_KEEP_ALIVE,
+        retry_policy: Optional[RetryPolicy] = None,
+    ):
+        """
+        Initialize the async Ollama client.
+
+        Args:
+            base_url (str): Base URL for Ollama API. Defaults to http://localhost:11434
+            cache (CompletionCache, optional): Cache consulted by generate before calling the API
+            pool_size (int): Number of keep-alive connections to the server
+            max_concurrency (int): Maximum number of generations in flight at once
+            connect_timeout (float): Seconds to wait for a connection
+            read_timeout (float): Seconds to wait for a generation response
+            keep_alive (optional): How long the server keeps a model loaded
+                after each request, e.g. "30m" or -1. None leaves the
+                server's default.
+            retry_policy (RetryPolicy, optional): When failed generations
+                are sent again. Defaults to the OLLAMA_RETRY_* settings.
+        """
+        self.base_url = base_url or os.getenv(
+            "OLLAMA_BASE_URL", "http://localhost:11434"
+        )
+        self.cache = cache
+        self.pool_size = pool_size
+        self.max_concurrency = max_concurrency
+        self.timeout = httpx.Timeout(read_timeout, connect=connect_timeout)
+        self.keep_alive = keep_alive
+        self.retry_policy = retry_policy or RetryPolicy()
+        self._http: Optional[httpx.AsyncClient] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    def _client(self) -> httpx.AsyncClient:
+        # Created on first use so they bind to the loop that uses them
+        if self._http is None:
+            self._http = httpx.AsyncClient(
+                base_url=self.base_url,
+                timeout=self.timeout,
+                limits=httpx.Limits(
+                    max_connections=self.pool_size,
+                    max_keepalive_connections=self.pool_size,
+                ),
+            )
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._http
+
+    async def aclose(self) -> None:
+        """Close the pooled connections."""
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+
+    async def __aenter__(self) -> "AsyncOllamaClient":
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        await self.aclose()
+
+    async def list_models(self) -> List[Dict[str, Any]]:
+        """
+        Get list of available models from Ollama.
+
+        Returns:
+            List[Dict]: List of available models with their metadata
+        """
+        try:
+            response = await self._client().get("/api/tags", timeout=30)
+            response.raise_for_status()
+
+            result = response.json()
+            return result.get("models", [])
+
+        except httpx.HTTPError as e:
+            logger.warning("Error fetching Ollama models: %s", e)
+            return []
+
+    async def get_model_names(self) -> List[str]:
+        """
+        Get list of model names.
+
+        Returns:
+            List[str]: List of model names
+        """
+        models = await self.list_models()
+        return [model.get("name", "") for model in models if model.get("name")]
+
+    async def is_model_available(self, model_name: str) -> bool:
+        """
+        Check if a model is available locally.
+
+        Args:
+            model_name (str): Name of the model to check
+
+        Returns:
+            bool: True if model is available, False otherwise
+        """
+        return model_name in await self.get_model_names()
+
+    async def generate(
+        self,
+        model: str,
+        prompt: str,
+        system: Optional[str] = None,
+        temperature: float = 0.3,
+        format: Optional[str] = None,
+        use_cache: bool = True,
+    ) -> str:
+        """
+        Generate text using Ollama API.
+
+        Args:
+            model (str): Model name to use
+            prompt (str): Input prompt
+            system (str, optional): System message
+            temperature (float): Temperature for sampling
+            format (str, optional): Response format (e.g., "json")
+            use_cache (bool): Whether to consult and fill the client's cache
+
+        Returns:
+            str: Generated text
+        """
+        cache_key = None
+        if use_cache and self.cache is not None and self.cache.enabled:
+            cache_key = self.cache.make_key(
+                model, system, prompt, temperature, format
+            )
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                return cached
+
+        payload = {
+            "model": model,
+            "prompt": prompt,
+            "stream": False,
+            "options": request_options(model, temperature),
+        }
+        if self.keep_alive is not None:
+            payload["keep_alive"] = self.keep_alive
+
+        if system:
+            payload["system"] = system
+        if format:
+            payload["format"] = format
+
+        return await self._post("/api/generate", payload, cache_key)
+
+    async def chat(
+        self,
+        model: str,
+        messages: List[Dict[str, str]],
+        temperature: float = 0.3,
+        format: Optional[str] = None,
+        use_cache: bool = True,
+    ) -> str:
+        """
+        Generate the assistant's reply using Ollama's /api/chat endpoint.
+
+        Args:
+            model (str): Model name to use
+            messages (List[Dict[str, str]]): Conversation as "role" and
+                "content" pairs, see ollama_client.chat_messages
+            temperature (float): Temperature for sampling
+            format (str, optional): Response format (e.g., "json")
+            use_cache (bool): Whether to consult and fill the client's cache
+
+        Returns:
+            str: Content of the assistant's reply
+        """
+        cache_key = None
+        if use_cache and self.cache is not None and self.cache.enabled:
+            cache_key = self.cache.make_key(
+                model, None, _messages_key(messages), temperature, format
+            )
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                return cached
+
+        payload = {
+            "model": model,
+            "messages": messages,
+            "stream": False,
+            "options": request_options(model, temperature),
+        }
+        if self.keep_alive is not None:
+            payload["keep_alive"] = self.keep_alive
+
+        if format:
+            payload["format"] = format
+
+        return await self._post("/api/chat", payload, cache_key)
+
+    async def _post(
+        self, path: str, payload: Dict[str, Any], cache_key: Optional[str]
+    ) -> str:
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                result = await self._post_once(path, payload)
+                break
+            except OllamaError as e:
+                delay = self.retry_policy.next_delay(attempt, e)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+
+        text = response_text(result)
+        span = active_span()
+        if span is not None:
+            span.record_response(result)
+        if cache_key is not None:
+            self.cache.set(cache_key, text)
+        return text
+
+    async def _post_once(
+        self, path: str, payload: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        client = self._client()
+        try:
+            async with self._semaphore:
+                response = await client.post(path, json=payload)
+            response.raise_for_status()
+            return response.json()
+
+        except httpx.HTTPError as e:
+            logger.debug("Error generating text with Ollama: %s", e)
+            raise OllamaError(
+                f"Failed to generate text: {e}", is_transient(e)
+            ) from e
+        except ValueError as e:
+            logger.debug("Error parsing Ollama response: %s", e)
+            raise OllamaError(f"Invalid JSON response: {e}") from e
+
+
+def is_transient(error: httpx.HTTPError) -> bool:
+    """Return whether a failed request is worth sending again."""
+    if isinstance(error, httpx.TransportError):
+        return True
+    if isinstance(error, httpx.HTTPStatusError):
+        status = error.response.status_code
+        return status == 429 or status >= 500
+    return False
+
+
+# One shared client per event loop, since pooled connections are bound to
+# the loop that opened them. Each is kept with the task that closes it.
+_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Tuple[AsyncOllamaClient, asyncio.Task]]" = weakref.WeakKeyDictionary()
+
+
+async def _close_on_shutdown(client: AsyncOllamaClient) -> None:
+    # Waits until the loop shuts down: asyncio.run cancels the tasks left
+    # over when the main coroutine returns, and waits for them to finish
+    try:
+        await asyncio.get_running_loop().create_future()
+    finally:
+        await client.aclose()
+
+
+def get_async_client() -> AsyncOllamaClient:
+    """
+    Get the shared async client for the running event loop.
+
+    The client's connections are closed when the loop is shut down by
+    asyncio.run, or any runner that cancels the remaining tasks before
+    closing the loop. Otherwise, await its aclose before closing the loop.
+
+    Returns:
+        AsyncOllamaClient: The client
+    """
+    loop = asyncio.get_running_loop()
+    entry = _async_clients.get(loop)
+    if entry is None:
+        client = AsyncOllamaClient(cache=completion_cache)
+        entry = (client, loop.create_task(_close_on_shutdown(client)))
+        _async_clients[loop] = entry
+    return entry[0]
@@ -0,0 +1,618 @@
+"""
+Asyncio versions of the translation pipeline.
+
+The prompts are the ones built in utils; only the completion calls differ.
+All calls made from one event loop share the loop's AsyncOllamaClient, whose
+semaphore and connection pool bound the load on the server however many
+documents are translated at once.
+"""
+
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    TypeVar,
+)
+
+from .async_client import AsyncOllamaClient, get_async_client
+from .cache import completion_cache
+from .config import DEFAULT_OLLAMA_MODEL, OLLAMA_API
+from .context_policy import ContextPolicy, get_context_policy
+from .memory import FuzzyMatch, TranslationMemory
+from .ollama_client import (
+    chat_messages,
+    ensure_model_available,
+    model_registry,
+    warm_up_model,
+)
+from .review_policy import ReviewPolicy, get_review_policy
+from .tracing import trace_stage, tracer
+from .utils import (
+    MAX_TOKENS_PER_CHUNK,
+    ChunkSteps,
+    ChunkTranslation,
+    ChunkTranslationError,
+    _matching_chunks,
+    completion_cache_key,
+    multichunk_improvement_prompt,
+    multichunk_initial_translation_prompt,
+    multichunk_reflection_prompt,
+    multichunk_steps,
+    one_chunk_edit_prompt,
+    one_chunk_improvement_prompt,
+    one_chunk_initial_translation_prompt,
+    one_chunk_reflection_prompt,
+    one_chunk_steps,
+    plan_translation,
+)
+
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# The completion cache is a SQLite file behind one lock, so a single thread
+# does its I/O: lookups never block the event loop, and never wait for a
+# thread of the default pool that translations use for prompts and memory
+_cache_executor = ThreadPoolExecutor(
+    max_workers=1, thread_name_prefix="completion-cache"
+)
+
+
+async def _cache_io(fn: Callable[..., T], *args: Any) -> T:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_cache_executor, fn, *args)
+
+
+async def aget_completion(
+    prompt: str,
+    system_message: str = "You are a helpful assistant.",
+    model: Optional[str] = None,
+    temperature: float = 0.3,
+    json_mode: bool = False,
+    use_cache: bool = True,
+    client: Optional[AsyncOllamaClient] = None,
+) -> str:
+    """
+    Generate a completion using the Ollama API without blocking the event loop.
+
+    Args:
+        prompt (str): The user's prompt or query.
+        system_message (str, optional): The system message to set the context for the assistant.
+        model (str, optional): The name of the Ollama model. Defaults to DEFAULT_OLLAMA_MODEL.
+        temperature (float, optional): The sampling temperature. Defaults to 0.3.
+        json_mode (bool, optional): Whether to ask for a JSON response. Defaults to False.
+        use_cache (bool, optional): Whether to use the persistent completion cache. Defaults to True.
+        client (AsyncOllamaClient, optional): Client to use. Defaults to the event loop's shared client.
+
+    Returns:
+        str: The generated completion.
+    """
+    if model is None:
+        model = DEFAULT_OLLAMA_MODEL
+    if client is None:
+        client = get_async_client()
+
+    response_format = "json" if json_mode else None
+
+    with tracer.span("aget_completion", model) as span:
+        cache_key = None
+        if use_cache and completion_cache.enabled:
+            cache_key = completion_cache_key(
+                prompt, system_message, model, temperature, json_mode
+            )
+            cached = await _cache_io(completion_cache.get, cache_key)
+            if cached is not None:
+                span.cached = True
+                return cached
+
+        # The registry answers from its cached model list almost always;
+        # only a refresh touches the network, in a worker thread
+        if not model_registry.is_cached(model) and not (
+            await asyncio.to_thread(ensure_model_available, model)
+        ):
+            raise Exception(
+                f"Model {model} is not available and could not be pulled"
+            )
+
+        try:
+            if OLLAMA_API == "chat":
+                completion = await client.chat(
+                    model=model,
+                    messages=chat_messages(system_message, prompt),
+                    temperature=temperature,
+                    format=response_format,
+                    use_cache=False,
+                )
+            else:
+                completion = await client.generate(
+                    model=model,
+                    prompt=prompt,
+                    system=system_message,
+                    temperature=temperature,
+                    format=response_format,
+                    use_cache=False,
+                )
+
+        except Exception as e:
+            model_registry.invalidate()
+            logger.debug("Error calling Ollama API: %s", e)
+            raise Exception(
+                f"Failed to get completion from Ollama: {e}"
+            ) from e
+
+        if cache_key is not None:
+            await _cache_io(completion_cache.set, cache_key, completion)
+        return completion
+
+
+async def aone_chunk_initial_translation(
+    source_lang: str,
+    target_lang: str,
+    source_text: str,
+    examples: Sequence[FuzzyMatch] = (),
+) -> str:
+    """Async version of utils.one_chunk_initial_translation."""
+    system_message, prompt = one_chunk_initial_translation_prompt(
+        source_lang, target_lang, source_text, examples
+    )
+    with trace_stage("initial"):
+        return await aget_completion(prompt, system_message=system_message)
+
+
+async def aone_chunk_edit_translation(
+    source_lang: str, target_lang: str, source_text: str, match: FuzzyMatch
+) -> str:
+    """Async version of utils.one_chunk_edit_translation."""
+    system_message, prompt = one_chunk_edit_prompt(
+        source_lang, target_lang, source_text, match
+    )
+    with trace_stage("edit"):
+        return await aget_completion(prompt, system_message=system_message)
+
+
+async def aone_chunk_reflect_on_translation(
+    source_lang: str,
+    target_lang: str,
+    source_text: str,
+    translation_1: str,
+    country: str = "",
+    note: str = "",
+) -> str:
+    """Async version of utils.one_chunk_reflect_on_translation."""
+    system_message, prompt = one_chunk_reflection_prompt(
+        source_lang, target_lang, source_text, translation_1, country
+    )
+    with trace_stage("reflect"):
+        return await aget_completion(
+            prompt + note, system_message=system_message
+        )
+
+
+async def aone_chunk_improve_translation(
+    source_lang: str,
+    target_lang: str,
+    source_text: str,
+    translation_1: str,
+    reflection: str,
+) -> str:
+    """Async version of utils.one_chunk_improve_translation."""
+    system_message, prompt = one_chunk_improvement_prompt(
+        source_lang, target_lang, source_text, translation_1, reflection
+    )
+    with trace_stage("improve"):
+        return await aget_completion(prompt, system_message=system_message)
+
+
+async def arun_steps(
+    steps: ChunkSteps, stages: Mapping[str, Callable[..., Awaitable[str]]]
+) -> ChunkTranslation:
+    """Async version of utils.run_steps, awaiting each stage call."""
+    try:
+        stage, args = next(steps)
+        while True:
+            stage, args = steps.send(await stages[stage](*args))
+    except StopIteration as done:
+        return done.value
+
+
+async def aone_chunk_translate_text(
+    source_lang: str,
+    target_lang: str,
+    source_text: str,
+    country: str = "",
+    review_policy: Optional[ReviewPolicy] = None,
+) -> str:
+    """Async version of utils.one_chunk_translate_text."""
+    chunk = await aone_chunk_translation(
+        source_lang,
+        target_lang,
+        source_text,
+        country,
+        review_policy=review_policy,
+    )
+    return chunk.translation_2
+
+
+async def aone_chunk_translation(
+    source_lang: str,
+    target_lang: str,
+    source_text: str,
+    country: str = "",
+    memory: Optional[TranslationMemory] = None,
+    scope: str = "",
+    review_policy: Optional[ReviewPolicy] = None,
+) -> ChunkTranslation:
+    """Async version of utils.one_chunk_translation."""
+    if review_policy is None:
+        review_policy = get_review_policy()
+
+    matches = []
+    if memory is not None:
+        matches = await asyncio.to_thread(memory.similar, scope, source_text)
+
+    return await arun_steps(
+        one_chunk_steps(
+            source_lang,
+            target_lang,
+            source_text,
+            country,
+            matches,
+            review_policy,
+        ),
+        {
+            "edit": aone_chunk_edit_translation,
+            "initial": aone_chunk_initial_translation,
+            "reflect": aone_chunk_reflect_on_translation,
+            "improve": aone_chunk_improve_translation,
+        },
+    )
+
+
+# Context policies may call the model themselves (rolling summaries), so
+# multichunk prompts are built in a worker thread.
+
+
+async def amultichunk_initial_translation_chunk(
+    source_lang: str,
+    target_lang: str,
+    source_text_chunks: List[str],
+    i: int,
+    context_policy: Optional[ContextPolicy] = None,
+) -> str:
+    """Async version of utils.multichunk_initial_translation_chunk."""
+    system_message, prompt = await asyncio.to_thread(
+        multichunk_initial_translation_prompt,
+        source_lang,
+        target_lang,
+        source_text_chunks,
+        i,
+        context_policy,
+    )
+    with trace_stage("initial", i):
+        return await aget_completion(prompt, system_message=system_message)
+
+
+async def amultichunk_reflect_on_translation_chunk(
+    source_lang: str,
+    target_lang: str,
+    source_text_chunks: List[str],
+    i: int,
+    translation_1_chunk: str,
+    country: str = "",
+    context_policy: Optional[ContextPolicy] = None,
+    note: str = "",
+) -> str:
+    """Async version of utils.multichunk_reflect_on_translation_chunk."""
+    system_message, prompt = await asyncio.to_thread(
+        multichunk_reflection_prompt,
+        source_lang,
+        target_lang,
+        source_text_chunks,
+        i,
+        translation_1_chunk,
+        country,
+        context_policy,
+    )
+    with trace_stage("reflect", i):
+        return await aget_completion(
+            prompt + note, system_message=system_message
+        )
+
+
+async def amultichunk_improve_translation_chunk(
+    source_lang: str,
+    target_lang: str,
+    source_text_chunks: List[str],
+    i: int,
+    translation_1_chunk: str,
+    reflection_chunk: str,
+    context_policy: Optional[ContextPolicy] = None,
+) -> str:
+    """Async version of utils.multichunk_improve_translation_chunk."""
+    system_message, prompt = await asyncio.to_thread(
+        multichunk_improvement_prompt,
+        source_lang,
+        target_lang,
+        source_text_chunks,
+        i,
+        translation_1_chunk,
+        reflection_chunk,
+        context_policy,
+    )
+    with trace_stage("improve", i):
+        return await aget_completion(prompt, system_message=system_message)
+
+
+async def amultichunk_initial_translation(
+    source_lang: str,
+    target_lang: str,
+    source_text_chunks: List[str],
+    context_policy: Optional[ContextPolicy] = None,
+) -> List[str]:
+    """Async version of utils.multichunk_initial_translation."""
+    if context_policy is None:
+        context_policy = get_context_policy()
+
+    return list(
+        await asyncio.gather(
+            *(
+                amultichunk_initial_translation_chunk(
+                    source_lang,
+                    target_lang,
+                    source_text_chunks,
+                    i,
+                    context_policy,
+                )
+                for i in range(len(source_text_chunks))
+            )
+        )
+    )
+
+
+async def amultichunk_reflect_on_translation(
+    source_lang: str,
+    target_lang: str,
+    source_text_chunks: List[str],
+    translation_1_chunks: List[str],
+    country: str = "",
+    context_policy: Optional[ContextPolicy] = None,
+) -> List[str]:
+    """Async version of utils.multichunk_reflect_on_translation."""
+    if context_policy is None:
+        context_policy = get_context_policy()
+
+    return list(
+        await asyncio.gather(
+            *(
+                amultichunk_reflect_on_translation_chunk(
+                    source_lang,
+                    target_lang,
+                    source_text_chunks,
+                    i,
+                    translation_1_chunks[i],
+                    country,
+                    context_policy,
+                )
+                for i in range(len(source_text_chunks))
+            )
+        )
+    )
+
+
+async def amultichunk_improve_translation(
+    source_lang: str,
+    target_lang: str,
+    source_text_chunks: List[str],
+    translation_1_chunks: List[str],
+    reflection_chunks: List[str],
+    context_policy: Optional[ContextPolicy] = None,
+) -> List[str]:
+    """Async version of utils.multichunk_improve_translation."""
+    if context_policy is None:
+        context_policy = get_context_policy()
+
+    return list(
+        await asyncio.gather(
+            *(
+                amultichunk_improve_translation_chunk(
+                    source_lang,
+                    target_lang,
+                    source_text_chunks,
+                    i,
+                    translation_1_chunks[i],
+                    reflection_chunks[i],
+                    context_policy,
+                )
+                for i in range(len(source_text_chunks))
+            )
+        )
+    )
+
+
+async def amultichunk_translate_chunk(
+    source_lang: str,
+    target_lang: str,
+    source_text_chunks: List[str],
+    i: int,
+    country: str = "",
+    context_policy: Optional[ContextPolicy] = None,
+    review_policy: Optional[ReviewPolicy] = None,
+) -> ChunkTranslation:
+    """Async version of utils.multichunk_translate_chunk."""
+    if context_policy is None:
+        context_policy = get_context_policy()
+    if review_policy is None:
+        review_policy = get_review_policy()
+
+    return await arun_steps(
+        multichunk_steps(
+            source_lang,
+            target_lang,
+            source_text_chunks,
+            i,
+            country,
+            context_policy,
+            review_policy,
+        ),
+        {
+            "initial": amultichunk_initial_translation_chunk,
+            "reflect": amultichunk_reflect_on_translation_chunk,
+            "improve": amultichunk_improve_translation_chunk,
+        },
+    )
+
+
+async def amultichunk_translation_chunks(
+    source_lang: str,
+    target_lang: str,
+    source_text_chunks: List[str],
+    country: str = "",
+    context_policy: Optional[ContextPolicy] = None,
+    completed: Optional[Mapping[int, ChunkTranslation]] = None,
+    review_policy: Optional[ReviewPolicy] = None,
+) -> List[ChunkTranslation]:
+    """
+    Translate every chunk and return the outputs of all three stages.
+
+    Every chunk runs through the three stages as its own task; the shared
+    client limits how many requests are in flight. A failed chunk does not
+    cancel the others, see utils.ChunkTranslationError.
+    """
+    if context_policy is None:
+        context_policy = get_context_policy()
+    if review_policy is None:
+        review_policy = get_review_policy()
+    completed = _matching_chunks(completed, source_text_chunks)
+
+    pending = [i for i in range(len(source_text_chunks)) if i not in completed]
+    results = await asyncio.gather(
+        *(
+            amultichunk_translate_chunk(
+                source_lang,
+                target_lang,
+                source_text_chunks,
+                i,
+                country,
+                context_policy,
+                review_policy,
+            )
+            for i in pending
+        ),
+        return_exceptions=True,
+    )
+    errors = {}
+    for i, result in zip(pending, results):
+        if isinstance(result, Exception):
+            errors[i] = result
+        else:
+            completed[i] = result
+    if errors:
+        raise ChunkTranslationError(completed, errors)
+    return [completed[i] for i in range(len(source_text_chunks))]
+
+
+async def amultichunk_translation(
+    source_lang: str,
+    target_lang: str,
+    source_text_chunks: List[str],
+    country: str = "",
+    context_policy: Optional[ContextPolicy] = None,
+    completed: Optional[Mapping[int, ChunkTranslation]] = None,
+    review_policy: Optional[ReviewPolicy] = None,
+) -> List[str]:
+    """
+    Async version of utils.multichunk_translation.
+
+    See amultichunk_translation_chunks, whose final translations this returns.
+    """
+    chunks = await amultichunk_translation_chunks(
+        source_lang,
+        target_lang,
+        source_text_chunks,
+        country,
+        context_policy,
+        completed,
+        review_policy,
+    )
+    return [chunk.translation_2 for chunk in chunks]
+
+
+async def atranslate(
+    source_lang,
+    target_lang,
+    source_text,
+    country,
+    max_tokens=MAX_TOKENS_PER_CHUNK,
+    context_policy: Optional[ContextPolicy] = None,
+    completed: Optional[Mapping[int, ChunkTranslation]] = None,
+    memory: Optional[TranslationMemory] = None,
+    review_policy: Optional[ReviewPolicy] = None,
+):
+    """
+    Async version of utils.translate.
+
+    The chunks are planned, and the translation memory used, as in
+    translate(); the memory's lookups and writes, like the completion
+    cache's, run in worker threads so they do not block the event loop.
+    """
+
+    await asyncio.to_thread(warm_up_model, DEFAULT_OLLAMA_MODEL)
+
+    plan = await asyncio.to_thread(
+        plan_translation,
+        source_lang,
+        target_lang,
+        source_text,
+        country,
+        max_tokens,
+        context_policy,
+        memory,
+        review_policy,
+    )
+
+    if plan.single:
+        if plan.reused:
+            return plan.reused[0].translation_2
+
+        chunk = await aone_chunk_translation(
+            source_lang,
+            target_lang,
+            source_text,
+            country,
+            plan.memory,
+            plan.scope,
+            plan.review_policy,
+        )
+        await asyncio.to_thread(plan.remember, {0: chunk})
+        plan.log()
+        return chunk.translation_2
+
+    try:
+        chunks = await amultichunk_translation_chunks(
+            source_lang,
+            target_lang,
+            plan.source_text_chunks,
+            country,
+            context_policy=plan.context_policy,
+            completed={**plan.reused, **(completed or {})},
+            review_policy=plan.review_policy,
+        )
+    except ChunkTranslationError as e:
+        # The chunks that did succeed are not translated again next time
+        await asyncio.to_thread(plan.remember, e.completed)
+        raise
+    finally:
+        plan.log()
+    await asyncio.to_thread(
+        plan.remember, {chunk.index: chunk for chunk in chunks}
+    )
+
+    return "".join(chunk.translation_2 for chunk in chunks)
@@ -0,0 +1,1087 @@
+"""
+Batched translation of many short, independent texts.
+
+Every text normally costs three completions, each repeating the same
+instructions and paying a full round trip. For many short texts, such as
+the entries of a dataset, translate_batch packs several of them into one
+prompt instead, up to a token budget, and packs the reflection and
+improvement stages the same way.
+
+A SegmentFormat decides how the texts are shown and the outputs read back:
+between numbered tags (<SEGMENT_1></SEGMENT_1>), or as a JSON object from
+text number to text, answered in Ollama's JSON mode and checked against a
+schema. Outputs that are missing or malformed are asked for again in a
+smaller batch of their own, and the ones still missing go through that
+stage one by one; the rest of the batch is kept either way.
+"""
+
+import json
+import logging
+import re
+from contextlib import ExitStack
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
+
+from . import utils
+from .cache import completion_cache
+from .config import (
+    BATCH_MAX_SEGMENTS,
+    BATCH_MAX_TOKENS,
+    BATCH_OUTPUT,
+    BATCH_RETRIES,
+    DEFAULT_OLLAMA_MODEL,
+)
+from .context_policy import get_context_policy
+from .executor import ChunkExecutor, get_executor
+from .memory import TranslationMemory, translation_memory
+from .review_policy import NO_SUGGESTIONS, ReviewPolicy, get_review_policy
+from .tokens import tokenize
+from .tracing import trace_stage
+
+
+logger = logging.getLogger(__name__)
+
+_SEGMENT = re.compile(
+    r"<\s*SEGMENT[_ ]?(\d+)\s*>(.*?)<\s*/\s*SEGMENT[_ ]?\1\s*>",
+    re.DOTALL | re.IGNORECASE,
+)
+# An output the model wrapped in one of the tags of the prompt
+_WRAPPED = re.compile(
+    r"<(TRANSLATION|EXPERT_SUGGESTIONS)>\s*(.*?)\s*</\1>", re.DOTALL
+)
+
+# JSON schemas of the output for one text
+TRANSLATION_SCHEMA = {"type": "string", "minLength": 1}
+SUGGESTIONS_SCHEMA = {
+    "type": "array",
+    "items": {"type": "string", "minLength": 1},
+}
+
+BATCH_TRANSLATION_PROMPT = """This is an {source_lang} to {target_lang} translation of {count} independent texts. \
+The texts are {layout}:
+
+{segments}
+
+Translate every text into {target_lang}. {answer}
+Do not provide any explanations or text apart from the translations."""
+
+BATCH_REFLECTION_PROMPT = """Your task is to carefully read {count} source texts and their translations from {source_lang} to {target_lang}, \
+and then give constructive criticism and helpful suggestions to improve each translation.{style}
+
+The source texts and their initial translations are {layout}:
+
+{segments}
+
+When writing suggestions, pay attention to whether there are ways to improve each translation's \n\
+(i) accuracy (by correcting errors of addition, mistranslation, omission, or untranslated text),\n\
+(ii) fluency (by applying {target_lang} grammar, spelling and punctuation rules, and ensuring there are no unnecessary repetitions),\n\
+(iii) style (by ensuring the translations reflect the style of the source text and take into account any cultural context),\n\
+(iv) terminology (by ensuring terminology use is consistent and reflects the source text domain; and by only ensuring you use equivalent idioms {target_lang}).\n\
+
+For each text, write a list of specific, helpful and constructive suggestions for improving its translation.
+Each suggestion should address one specific part of the translation.
+{answer}"""
+
+BATCH_IMPROVEMENT_PROMPT = """Your task is to carefully read, then edit, {count} translations from {source_lang} to {target_lang}, taking into
+account expert suggestions and constructive criticisms.
+
+The source texts, their initial translations and the expert suggestions for them are {layout}:
+
+{segments}
+
+Please take into account the expert suggestions when editing each translation. Edit the translations by ensuring:
+
+(i) accuracy (by correcting errors of addition, mistranslation, omission, or untranslated text),
+(ii) fluency (by applying {target_lang} grammar, spelling and punctuation rules and ensuring there are no unnecessary repetitions), \
+(iii) style (by ensuring the translations reflect the style of the source text)
+(iv) terminology (inappropriate for context, inconsistent use), or
+(v) other errors.
+
+{answer}"""
+
+
+def _and(items: Sequence[str]) -> str:
+    if len(items) == 1:
+        return items[0]
+    return ", ".join(items[:-1]) + " and " + items[-1]
+
+
+def conforms(value: Any, schema: Mapping[str, Any]) -> bool:
+    """
+    Check a value against the small subset of JSON schema the outputs use.
+
+    Args:
+        value (Any): A decoded JSON value.
+        schema (Mapping[str, Any]): A string schema, optionally with
+            minLength, or an array schema with items.
+
+    Returns:
+        bool: Whether the value conforms. Strings are measured stripped.
+    """
+    if schema["type"] == "string":
+        return isinstance(value, str) and len(value.strip()) >= schema.get(
+            "minLength", 0
+        )
+    if schema["type"] == "array":
+        return isinstance(value, list) and all(
+            conforms(item, schema["items"]) for item in value
+        )
+    return False
+
+
+def batch_schema(count: int, item_schema: Mapping[str, Any]) -> Dict[str, Any]:
+    """Return the JSON schema of an object with one item per text number."""
+    numbers = [str(n) for n in range(1, count + 1)]
+    return {
+        "type": "object",
+        "properties": {number: item_schema for number in numbers},
+        "required": numbers,
+    }
+
+
+def pack_texts(
+    texts: Sequence[str],
+    max_tokens: int = BATCH_MAX_TOKENS,
+    max_segments: int = BATCH_MAX_SEGMENTS,
+) -> Tuple[List[List[int]], List[int]]:
+    """
+    Pack texts, in order, into batches of at most max_tokens and max_segments.
+
+    Args:
+        texts (Sequence[str]): The texts to pack.
+        max_tokens (int): The maximum number of source tokens per batch.
+        max_segments (int): The maximum number of texts per batch.
+
+    Returns:
+        Tuple[List[List[int]], List[int]]: The indices of the texts in each
+            batch, and of the texts too long to share a prompt.
+    """
+    batches: List[List[int]] = []
+    too_long: List[int] = []
+    batch: List[int] = []
+    batch_tokens = 0
+    for i, text in enumerate(texts):
+        num_tokens = len(tokenize(text))
+        if num_tokens >= max_tokens:
+            too_long.append(i)
+            continue
+        if batch and (
+            batch_tokens + num_tokens > max_tokens
+            or len(batch) >= max_segments
+        ):
+            batches.append(batch)
+            batch, batch_tokens = [], 0
+        batch.append(i)
+        batch_tokens += num_tokens
+    if batch:
+        batches.append(batch)
+    return batches, too_long
+
+
+def format_segments(segments: Sequence[str]) -> str:
+    """Put each segment between numbered tags, starting at <SEGMENT_1>."""
+    return "\n\n".join(
+        f"<SEGMENT_{n}>\n{segment}\n</SEGMENT_{n}>"
+        for n, segment in enumerate(segments, 1)
+    )
+
+
+def parse_segments(response: str, count: int) -> Dict[int, str]:
+    """
+    Read the outputs of a batched completion back by their numbered tags.
+
+    Text outside the tags, numbers outside 1..count, repeated numbers and
+    empty outputs are ignored; the output for a segment whose tags are
+    missing or unclosed is left out.
+
+    Args:
+        response (str): The completion.
+        count (int): The number of segments in the prompt.
+
+    Returns:
+        Dict[int, str]: The output of each segment found, by its 0-based index.
+    """
+    outputs: Dict[int, str] = {}
+    for match in _SEGMENT.finditer(response):
+        k = int(match.group(1)) - 1
+        output = match.group(2).strip()
+        wrapped = _WRAPPED.fullmatch(output)
+        if wrapped:
+            output = wrapped.group(2)
+        if 0 <= k < count and output and k not in outputs:
+            outputs[k] = output
+    return outputs
+
+
+class SegmentFormat:
+    """Base class for how the texts of a batch are shown and read back."""
+
+    # Whether completions are requested in Ollama's JSON mode
+    json_mode = False
+
+    def layout(self, count: int, fields: Sequence[str]) -> str:
+        """Describe how the texts are shown, completing "The texts are ..."."""
+        raise NotImplementedError
+
+    def format(self, segments: Sequence[Mapping[str, str]]) -> str:
+        """Show the segments, each a mapping from field name to value."""
+        raise NotImplementedError
+
+    def answer(
+        self, count: int, noun: str, item_schema: Mapping[str, Any]
+    ) -> str:
+        """Ask for one output, described by noun, per text."""
+        raise NotImplementedError
+
+    def parse(
+        self, response: str, count: int, item_schema: Mapping[str, Any]
+    ) -> Dict[int, str]:
+        """Return the well-formed outputs found, by 0-based text index."""
+        raise NotImplementedError
+
+
+class TaggedSegments(SegmentFormat):
+    """Texts and outputs between numbered tags, <SEGMENT_1></SEGMENT_1>."""
+
+    def layout(self, count: int, fields: Sequence[str]) -> str:
+        layout = (
+            "delimited by numbered XML tags, from <SEGMENT_1></SEGMENT_1> "
+            f"to <SEGMENT_{count}></SEGMENT_{count}>"
+        )
+        if len(fields) > 1:
+            tags = [f"<{field.upper()}></{field.upper()}>" for field in fields]
+            layout += ", and inside them by " + _and(tags)
+        return layout
+
+    def format(self, segments: Sequence[Mapping[str, str]]) -> str:
+        return format_segments(
+            [
+                "\n".join(
+                    f"<{field.upper()}>\n{value}\n</{field.upper()}>"
+                    for field, value in segment.items()
+                )
+                if len(segment) > 1
+                else next(iter(segment.values()))
+                for segment in segments
+            ]
+        )
+
+    def answer(
+        self, count: int, noun: str, item_schema: Mapping[str, Any]
+    ) -> str:
+        return (
+            f"Output each {noun} between the same numbered tags as its "
+            "text, in the same order, and nothing else."
+        )
+
+    def parse(
+        self, response: str, count: int, item_schema: Mapping[str, Any]
+    ) -> Dict[int, str]:
+        return parse_segments(response, count)
+
+
+class JsonSegments(SegmentFormat):
+    """
+    Texts and outputs as JSON objects from text number to text.
+
+    Completions are requested in JSON mode. Each output is checked against
+    its item schema on its own, so one malformed output does not discard
+    the others. A list of suggestions is read back as numbered lines, and
+    an empty list as NO_SUGGESTIONS.
+    """
+
+    json_mode = True
+
+    def layout(self, count: int, fields: Sequence[str]) -> str:
+        layout = "given as a JSON object mapping the number of each text to "
+        if len(fields) > 1:
+            return layout + "its " + _and([f'"{field}"' for field in fields])
+        return layout + "the text"
+
+    def format(self, segments: Sequence[Mapping[str, str]]) -> str:
+        return json.dumps(
+            {
+                str(n): dict(segment)
+                if len(segment) > 1
+                else next(iter(segment.values()))
+                for n, segment in enumerate(segments, 1)
+            },
+            ensure_ascii=False,
+            indent=2,
+        )
+
+    def answer(
+        self, count: int, noun: str, item_schema: Mapping[str, Any]
+    ) -> str:
+        answer = (
+            f"Respond with a JSON object mapping the number of each text to "
+            f"its {noun}, following this JSON schema:\n"
+            + json.dumps(batch_schema(count, item_schema))
+        )
+        if item_schema["type"] == "array":
+            answer += "\nGive an empty list if there is nothing to improve."
+        return answer
+
+    def parse(
+        self, response: str, count: int, item_schema: Mapping[str, Any]
+    ) -> Dict[int, str]:
+        # Tolerates a code fence or a sentence around the object
+        start, end = response.find("{"), response.rfind("}")
+        try:
+            data = json.loads(response[start : end + 1])
+        except ValueError:
+            return {}
+        if not isinstance(data, dict):
+            return {}
+        # An object nested under a single key such as "translations"
+        if len(data) == 1 and "1" not in data:
+            nested = next(iter(data.values()))
+            if isinstance(nested, dict):
+                data = nested
+
+        outputs: Dict[int, str] = {}
+        for key, value in data.items():
+            k = int(key) - 1 if str(key).strip().isdigit() else -1
+            if 0 <= k < count and conforms(value, item_schema):
+                outputs[k] = self.text(value)
+        return outputs
+
+    @staticmethod
+    def text(value: Any) -> str:
+        """Turn a validated output into text."""
+        if isinstance(value, str):
+            return value.strip()
+        if not value:
+            return NO_SUGGESTIONS
+        return "\n".join(
+            f"{n}. {item.strip()}" for n, item in enumerate(value, 1)
+        )
+
+
+def get_segment_format(name: str = BATCH_OUTPUT) -> SegmentFormat:
+    """
+    Create a segment format by name.
+
+    Args:
+        name (str): "tags" or "json". Defaults to the
+            TRANSLATION_BATCH_OUTPUT setting.
+
+    Returns:
+        SegmentFormat: The format.
+    """
+    if name == "tags":
+        return TaggedSegments()
+    if name == "json":
+        return JsonSegments()
+    raise ValueError(f"Unknown batch output format {name!r}")
+
+
+def batch_initial_translation_prompt(
+    source_lang: str,
+    target_lang: str,
+    source_texts: Sequence[str],
+    segment_format: Optional[SegmentFormat] = None,
+) -> Tuple[str, str]:
+    """
+    Build the system message and prompt for translating several texts in one call.
+
+    Args:
+        source_lang (str): The source language of the texts.
+        target_lang (str): The target language for translation.
+        source_texts (Sequence[str]): The texts to be translated.
+        segment_format (SegmentFormat, optional): How the texts are shown.
+            Defaults to the format selected by TRANSLATION_BATCH_OUTPUT.
+
+    Returns:
+        Tuple[str, str]: The system message and the prompt.
+    """
+
+    system_message = f"You are an expert linguist, specializing in translation from {source_lang} to {target_lang}."
+
+    if segment_format is None:
+        segment_format = get_segment_format()
+
+    count = len(source_texts)
+    prompt = BATCH_TRANSLATION_PROMPT.format(
+        source_lang=source_lang,
+        target_lang=target_lang,
+        count=count,
+        layout=segment_format.layout(count, ["source_text"]),
+        segments=segment_format.format(
+            [{"source_text": source_text} for source_text in source_texts]
+        ),
+        answer=segment_format.answer(count, "translation", TRANSLATION_SCHEMA),
+    )
+
+    return system_message, prompt
+
+
+def batch_reflection_prompt(
+    source_lang: str,
+    target_lang: str,
+    source_texts: Sequence[str],
+    translations_1: Sequence[str],
+    country: str = "",
+    segment_format: Optional[SegmentFormat] = None,
+) -> Tuple[str, str]:
+    """
+    Build the system message and prompt for reflecting on several translations in one call.
+
+    Args:
+        source_lang (str): The source language of the texts.
+        target_lang (str): The target language of the translations.
+        source_texts (Sequence[str]): The original texts.
+        translations_1 (Sequence[str]): The initial translation of each text.
+        country (str): Country specified for the target language.
+        segment_format (SegmentFormat, optional): How the texts are shown.
+            Defaults to the format selected by TRANSLATION_BATCH_OUTPUT.
+
+    Returns:
+        Tuple[str, str]: The system message and the prompt.
+    """
+
+    system_message = f"You are an expert linguist specializing in translation from {source_lang} to {target_lang}. \
+You will be provided with source texts and their translations and your goal is to improve the translations."
+
+    if segment_format is None:
+        segment_format = get_segment_format()
+
+    style = ""
+    if country != "":
+        style = f" The final style and tone of the translations should match the style of {target_lang} colloquially spoken in {country}."
+
+    count = len(source_texts)
+    fields = ["source_text", "translation"]
+    prompt = BATCH_REFLECTION_PROMPT.format(
+        source_lang=source_lang,
+        target_lang=target_lang,
+        count=count,
+        style=style,
+        layout=segment_format.layout(count, fields),
+        segments=segment_format.format(
+            [
+                dict(zip(fields, segment))
+                for segment in zip(source_texts, translations_1)
+            ]
+        ),
+        answer=segment_format.answer(
+            count, "list of suggestions", SUGGESTIONS_SCHEMA
+        ),
+    )
+
+    return system_message, prompt
+
+
+def batch_improvement_prompt(
+    source_lang: str,
+    target_lang: str,
+    source_texts: Sequence[str],
+    translations_1: Sequence[str],
+    reflections: Sequence[str],
+    segment_format: Optional[SegmentFormat] = None,
+) -> Tuple[str, str]:
+    """
+    Build the system message and prompt for improving several translations in one call.
+
+    Args:
+        source_lang (str): The source language of the texts.
+        target_lang (str): The target language for the translations.
+        source_texts (Sequence[str]): The original texts.
+        translations_1 (Sequence[str]): The initial translation of each text.
+        reflections (Sequence[str]): The expert suggestions for each translation.
+        segment_format (SegmentFormat, optional): How the texts are shown.
+            Defaults to the format selected by TRANSLATION_BATCH_OUTPUT.
+
+    Returns:
+        Tuple[str, str]: The system message and the prompt.
+    """
+
+    system_message = f"You are an expert linguist, specializing in translation editing from {source_lang} to {target_lang}."
+
+    if segment_format is None:
+        segment_format = get_segment_format()
+
+    count = len(source_texts)
+    fields = ["source_text", "translation", "expert_suggestions"]
+    prompt = BATCH_IMPROVEMENT_PROMPT.format(
+        source_lang=source_lang,
+        target_lang=target_lang,
+        count=count,
+        layout=segment_format.layout(count, fields),
+        segments=segment_format.format(
+            [
+                dict(zip(fields, segment))
+                for segment in zip(source_texts, translations_1, reflections)
+            ]
+        ),
+        answer=segment_format.answer(
+            count, "new translation", TRANSLATION_SCHEMA
+        ),
+    )
+
+    return system_message, prompt
+
+
+def _complete_batch(
+    stage: str,
+    build_prompt: Callable[[List[int]], Tuple[str, str]],
+    count: int,
+    item_schema: Mapping[str, Any],
+    fallback: Callable[[int], str],
+    segment_format: SegmentFormat,
+    retries: int,
+) -> List[str]:
+    # One call for the whole batch, then the outputs it is missing are asked
+    # for again together, up to retries times, and finally one by one.
+    # A single text is always sent on its own. Only responses every output
+    # could be read from are cached, and retries never read the cache, so a
+    # bad response is not served again.
+    outputs: Dict[int, str] = {}
+    pending = list(range(count))
+    for attempt in range(retries + 1):
+        if len(pending) < 2:
+            break
+        system_message, prompt = build_prompt(pending)
+        cache_key = None
+        if completion_cache.enabled:
+            # Shared with get_completion, which makes the same call
+            cache_key = utils.completion_cache_key(
+                prompt, system_message, json_mode=segment_format.json_mode
+            )
+        response = None
+        if cache_key is not None and attempt == 0:
+            response = completion_cache.get(cache_key)
+        cached = response is not None
+        if not cached:
+            with trace_stage(stage):
+                response = utils.get_completion(
+                    prompt,
+                    system_message=system_message,
+                    json_mode=segment_format.json_mode,
+                    use_cache=False,
+                )
+
+        found = segment_format.parse(response, len(pending), item_schema)
+        for j, k in enumerate(pending):
+            if j in found:
+                outputs[k] = found[j]
+        missing = [k for k in pending if k not in outputs]
+        if missing:
+            logger.warning(
+                "Could not read %d of %d %s outputs of a batch",
+                len(missing),
+                len(pending),
+                stage,
+            )
+        elif cache_key is not None and not cached:
+            completion_cache.set(cache_key, response)
+        pending = missing
+
+    for k in pending:
+        outputs[k] = fallback(k)
+    return [outputs[k] for k in range(count)]
+
+
+def batch_initial_translation(
+    source_lang: str,
+    target_lang: str,
+    source_texts: Sequence[str],
+    segment_format: Optional[SegmentFormat] = None,
+    retries: int = BATCH_RETRIES,
+) -> List[str]:
+    """
+    Translate several texts in one call, and the ones it missed again.
+
+    Args:
+        source_lang (str): The source language of the texts.
+        target_lang (str): The target language for translation.
+        source_texts (Sequence[str]): The texts to be translated.
+        segment_format (SegmentFormat, optional): How the texts are shown and read back.
+            Defaults to the format selected by TRANSLATION_BATCH_OUTPUT.
+        retries (int): Batched calls for the missing outputs before they
+            are translated one by one.
+
+    Returns:
+        List[str]: The translation of each text.
+    """
+    if segment_format is None:
+        segment_format = get_segment_format()
+
+    return _complete_batch(
+        "initial",
+        lambda ks: batch_initial_translation_prompt(
+            source_lang,
+            target_lang,
+            [source_texts[k] for k in ks],
+            segment_format,
+        ),
+        len(source_texts),
+        TRANSLATION_SCHEMA,
+        lambda k: utils.one_chunk_initial_translation(
+            source_lang, target_lang, source_texts[k]
+        ),
+        segment_format,
+        retries,
+    )
+
+
+def batch_reflect_on_translation(
+    source_lang: str,
+    target_lang: str,
+    source_texts: Sequence[str],
+    translations_1: Sequence[str],
+    country: str = "",
+    note: str = "",
+    segment_format: Optional[SegmentFormat] = None,
+    retries: int = BATCH_RETRIES,
+) -> List[str]:
+    """
+    Reflect on several translations in one call, and the ones it missed again.
+
+    Args:
+        source_lang (str): The source language of the texts.
+        target_lang (str): The target language of the translations.
+        source_texts (Sequence[str]): The original texts.
+        translations_1 (Sequence[str]): The initial translation of each text.
+        country (str): Country specified for the target language.
+        note (str): Appended to the prompts, e.g. ReviewPolicy.reflection_note.
+            Not used for JSON batches, where an empty list of suggestions
+            is read back as NO_SUGGESTIONS.
+        segment_format (SegmentFormat, optional): How the texts are shown and read back.
+            Defaults to the format selected by TRANSLATION_BATCH_OUTPUT.
+        retries (int): Batched calls for the missing outputs before they
+            are reflected on one by one.
+
+    Returns:
+        List[str]: The suggestions for each translation.
+    """
+    if segment_format is None:
+        segment_format = get_segment_format()
+    batch_note = "" if segment_format.json_mode else note
+
+    def build_prompt(ks: List[int]) -> Tuple[str, str]:
+        system_message, prompt = batch_reflection_prompt(
+            source_lang,
+            target_lang,
+            [source_texts[k] for k in ks],
+            [translations_1[k] for k in ks],
+            country,
+            segment_format,
+        )
+        return system_message, prompt + batch_note
+
+    return _complete_batch(
+        "reflect",
+        build_prompt,
+        len(source_texts),
+        SUGGESTIONS_SCHEMA,
+        lambda k: utils.one_chunk_reflect_on_translation(
+            source_lang,
+            target_lang,
+            source_texts[k],
+            translations_1[k],
+            country,
+            note,
+        ),
+        segment_format,
+        retries,
+    )
+
+
+def batch_improve_translation(
+    source_lang: str,
+    target_lang: str,
+    source_texts: Sequence[str],
+    translations_1: Sequence[str],
+    reflections: Sequence[str],
+    segment_format: Optional[SegmentFormat] = None,
+    retries: int = BATCH_RETRIES,
+) -> List[str]:
+    """
+    Improve several translations in one call, and the ones it missed again.
+
+    Args:
+        source_lang (str): The source language of the texts.
+        target_lang (str): The target language for the translations.
+        source_texts (Sequence[str]): The original texts.
+        translations_1 (Sequence[str]): The initial translation of each text.
+        reflections (Sequence[str]): The expert suggestions for each translation.
+        segment_format (SegmentFormat, optional): How the texts are shown and read back.
+            Defaults to the format selected by TRANSLATION_BATCH_OUTPUT.
+        retries (int): Batched calls for the missing outputs before they
+            are improved one by one.
+
+    Returns:
+        List[str]: The improved translation of each text.
+    """
+    if segment_format is None:
+        segment_format = get_segment_format()
+
+    return _complete_batch(
+        "improve",
+        lambda ks: batch_improvement_prompt(
+            source_lang,
+            target_lang,
+            [source_texts[k] for k in ks],
+            [translations_1[k] for k in ks],
+            [reflections[k] for k in ks],
+            segment_format,
+        ),
+        len(source_texts),
+        TRANSLATION_SCHEMA,
+        lambda k: utils.one_chunk_improve_translation(
+            source_lang,
+            target_lang,
+            source_texts[k],
+            translations_1[k],
+            reflections[k],
+        ),
+        segment_format,
+        retries,
+    )
+
+
+def batch_translation(
+    source_lang: str,
+    target_lang: str,
+    source_texts: Sequence[str],
+    country: str = "",
+    review_policy: Optional[ReviewPolicy] = None,
+    segment_format: Optional[SegmentFormat] = None,
+) -> List[utils.ChunkTranslation]:
+    """
+    Run several texts through the three stages, one batched call per stage.
+
+    Only the texts the review policy keeps are sent to the reflection, and
+    only those it asks to improve to the improvement.
+
+    Args:
+        source_lang (str): The source language of the texts.
+        target_lang (str): The target language for translation.
+        source_texts (Sequence[str]): The texts to be translated.
+        country (str): Country specified for the target language.
+        review_policy (ReviewPolicy, optional): Decides whether to reflect and improve.
+            Defaults to the policy selected by TRANSLATION_REVIEW_POLICY.
+        segment_format (SegmentFormat, optional): How the texts are shown and read back.
+            Defaults to the format selected by TRANSLATION_BATCH_OUTPUT.
+
+    Returns:
+        List[ChunkTranslation]: The outputs of the three stages for each
+            text, indexed by its position in source_texts. Stages the review
+            policy skipped are empty, and translation_2 is then translation_1.
+    """
+    if review_policy is None:
+        review_policy = get_review_policy()
+    if segment_format is None:
+        segment_format = get_segment_format()
+
+    translations_1 = batch_initial_translation(
+        source_lang, target_lang, source_texts, segment_format
+    )
+    reflections = [""] * len(source_texts)
+    translations_2 = list(translations_1)
+
+    reviewed = [
+        k
+        for k, source_text in enumerate(source_texts)
+        if review_policy.review(source_text, translations_1[k])
+    ]
+    if reviewed:
+        found = batch_reflect_on_translation(
+            source_lang,
+            target_lang,
+            [source_texts[k] for k in reviewed],
+            [translations_1[k] for k in reviewed],
+            country,
+            review_policy.reflection_note,
+            segment_format,
+        )
+        for k, reflection in zip(reviewed, found):
+            reflections[k] = reflection
+
+    improved = [k for k in reviewed if review_policy.improve(reflections[k])]
+    if improved:
+        found = batch_improve_translation(
+            source_lang,
+            target_lang,
+            [source_texts[k] for k in improved],
+            [translations_1[k] for k in improved],
+            [reflections[k] for k in improved],
+            segment_format,
+        )
+        for k, translation_2 in zip(improved, found):
+            translations_2[k] = translation_2
+
+    return [
+        utils.ChunkTranslation(
+            k,
+            source_text,
+            translations_1[k],
+            reflections[k],
+            translations_2[k],
+        )
+        for k, source_text in enumerate(source_texts)
+    ]
+
+
+def translate_batch(
+    source_lang: str,
+    target_lang: str,
+    source_texts: Sequence[str],
+    country: str = "",
+    max_tokens: int = BATCH_MAX_TOKENS,
+    max_segments: int = BATCH_MAX_SEGMENTS,
+    executor: Optional[ChunkExecutor] = None,
+    memory: Optional[TranslationMemory] = None,
+    review_policy: Optional[ReviewPolicy] = None,
+    segment_format: Optional[SegmentFormat] = None,
+    completed: Optional[Mapping[int, utils.ChunkTranslation]] = None,
+) -> List[str]:
+    """
+    Translate many independent texts, packing short ones into shared prompts.
+
+    Texts are packed in order into batches of at most max_tokens source
+    tokens and max_segments texts, and each batch goes through the three
+    stages with one call per stage (see batch_translation). A text with
+    max_tokens tokens or more is split into chunks as translate() splits
+    it, and its chunks go through the stages on the same executor as the
+    batches.
+    Blank texts are returned as they are, and a text given more than once
+    is translated once.
+
+    With a translation memory (TRANSLATION_MEMORY_PATH, or the memory
+    argument), texts found in it are not translated again, and every batch
+    is stored as soon as it is finished.
+
+    A batch that fails does not stop the others: they are all finished,
+    then ChunkTranslationError is raised with every text that was
+    translated, by its index in source_texts. Pass its completed to a
+    second call with the same texts to translate only the rest. The error
+    of a long text is a ChunkTranslationError of its own, whose completed
+    holds the chunks of it that were translated.
+
+    Args:
+        source_lang (str): The source language of the texts.
+        target_lang (str): The target language for translation.
+        source_texts (Sequence[str]): The texts to be translated.
+        country (str): Country specified for the target language.
+        max_tokens (int): The maximum number of source tokens per batch.
+        max_segments (int): The maximum number of texts per batch.
+        executor (ChunkExecutor, optional): Executor running the batches.
+            Defaults to a thread pool limited to MAX_CONCURRENT_REQUESTS.
+        memory (TranslationMemory, optional): Memory to reuse and store
+            translations in. Defaults to the configured one.
+        review_policy (ReviewPolicy, optional): Decides whether to reflect and improve.
+            Defaults to the policy selected by TRANSLATION_REVIEW_POLICY.
+        segment_format (SegmentFormat, optional): How the texts are shown and read back.
+            Defaults to the format selected by TRANSLATION_BATCH_OUTPUT.
+        completed (Mapping[int, ChunkTranslation], optional): Texts translated
+            before, e.g. ChunkTranslationError.completed; they are not translated again.
+
+    Returns:
+        List[str]: The translation of each text, in order.
+
+    Raises:
+        ChunkTranslationError: If any batch or long text failed, once all
+            the others are done.
+    """
+
+    if memory is None:
+        memory = translation_memory
+    if review_policy is None:
+        review_policy = get_review_policy()
+    if segment_format is None:
+        segment_format = get_segment_format()
+    scope = memory.make_scope(
+        source_lang, target_lang, country, DEFAULT_OLLAMA_MODEL
+    )
+
+    utils.warm_up_model(DEFAULT_OLLAMA_MODEL)
+
+    # Where each distinct text first appears; results are kept under it
+    positions: Dict[str, int] = {}
+    for i, source_text in enumerate(source_texts):
+        positions.setdefault(source_text, i)
+
+    done: Dict[int, utils.ChunkTranslation] = {
+        i: chunk
+        for i, chunk in (completed or {}).items()
+        if i < len(source_texts) and chunk.source_text == source_texts[i]
+    }
+    translations: Dict[str, str] = {
+        chunk.source_text: chunk.translation_2 for chunk in done.values()
+    }
+    pending: List[str] = []
+    for source_text in positions:
+        if source_text in translations:
+            continue
+        if not source_text.strip():
+            translations[source_text] = source_text
+            continue
+        stored = memory.get(scope, source_text)
+        if stored is not None:
+            translations[source_text] = stored.translation_2
+            continue
+        pending.append(source_text)
+
+    batches, too_long = pack_texts(pending, max_tokens, max_segments)
+
+    # Long texts are split up front, as translate() splits them, so their
+    # chunks run on the executor together with the batches
+    plans: Dict[int, utils.TranslationPlan] = {
+        i: utils.plan_translation(
+            source_lang,
+            target_lang,
+            pending[i],
+            country,
+            max_tokens,
+            get_context_policy(),
+            memory,
+            review_policy,
+        )
+        for i in too_long
+    }
+    chunk_jobs = [
+        (i, k)
+        for i, plan in plans.items()
+        for k in range(len(plan.source_text_chunks))
+        if k not in plan.reused
+    ]
+    logger.info(
+        "Translating %d texts in %d batches and %d chunks of %d long texts, "
+        "%d blank or translated before",
+        len(pending),
+        len(batches),
+        len(chunk_jobs),
+        len(too_long),
+        len(translations),
+    )
+
+    def translate_one_batch(
+        batch: List[int],
+    ) -> Union[List[utils.ChunkTranslation], Exception]:
+        try:
+            if len(batch) == 1:
+                # Nothing to share a prompt with: the usual one-chunk prompts
+                chunks = [
+                    utils.one_chunk_translation(
+                        source_lang,
+                        target_lang,
+                        pending[batch[0]],
+                        country,
+                        memory,
+                        scope,
+                        review_policy,
+                    )
+                ]
+            else:
+                chunks = batch_translation(
+                    source_lang,
+                    target_lang,
+                    [pending[i] for i in batch],
+                    country,
+                    review_policy,
+                    segment_format,
+                )
+        except Exception as e:
+            # Returned, not raised, so the executor keeps running the others
+            logger.debug("Batch of %d texts failed: %s", len(batch), e)
+            return e
+        # Stored right away, whatever happens to the other batches
+        for chunk in chunks:
+            memory.put(
+                scope,
+                chunk.source_text,
+                chunk.translation_1,
+                chunk.reflection,
+                chunk.translation_2,
+            )
+        return chunks
+
+    def translate_one_chunk(
+        job: Tuple[int, int],
+    ) -> Union[utils.ChunkTranslation, Exception]:
+        i, k = job
+        plan = plans[i]
+        try:
+            chunk = utils.multichunk_translate_chunk(
+                source_lang,
+                target_lang,
+                plan.source_text_chunks,
+                k,
+                country,
+                plan.context_policy,
+                plan.review_policy,
+            )
+        except Exception as e:
+            logger.debug(
+                "Chunk %d of text %d failed: %s", k, positions[pending[i]], e
+            )
+            return e
+        plan.remember({k: chunk})
+        return chunk
+
+    jobs: List[Tuple[Callable[[Any], Any], Any]] = [
+        (translate_one_batch, batch) for batch in batches
+    ] + [(translate_one_chunk, job) for job in chunk_jobs]
+    chunks_of = {i: dict(plan.reused) for i, plan in plans.items()}
+    chunk_errors: Dict[int, Dict[int, Exception]] = {i: {} for i in plans}
+    errors: Dict[int, Exception] = {}
+    with ExitStack() as stack:
+        if executor is None:
+            executor = stack.enter_context(get_executor())
+
+        results = executor.imap(lambda job: job[0](job[1]), jobs)
+        for (fn, job), result in zip(jobs, results):
+            if fn is translate_one_chunk:
+                i, k = job
+                if isinstance(result, Exception):
+                    chunk_errors[i][k] = result
+                else:
+                    chunks_of[i][k] = result
+                continue
+            if isinstance(result, Exception):
+                for i in job:
+                    errors[positions[pending[i]]] = result
+                continue
+            for chunk in result:
+                i = positions[chunk.source_text]
+                done[i] = chunk._replace(index=i)
+                translations[chunk.source_text] = chunk.translation_2
+
+    for i, plan in plans.items():
+        source_text = pending[i]
+        position = positions[source_text]
+        if chunk_errors[i]:
+            # The finished chunks are in the memory, and in the error
+            errors[position] = utils.ChunkTranslationError(
+                chunks_of[i], chunk_errors[i]
+            )
+            continue
+        chunks = [chunks_of[i][k] for k in range(len(plan.source_text_chunks))]
+        done[position] = utils.ChunkTranslation(
+            position,
+            source_text,
+            "".join(chunk.translation_1 for chunk in chunks),
+            "\n\n".join(
+                chunk.reflection for chunk in chunks if chunk.reflection
+            ),
+            "".join(chunk.translation_2 for chunk in chunks),
+        )
+        translations[source_text] = done[position].translation_2
+
+    logger.info("Review policy %s", review_policy.stats)
+
+    if errors:
+        raise utils.ChunkTranslationError(done, errors)
+
+    return [translations[source_text] for source_text in source_texts]
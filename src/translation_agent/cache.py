@@ -0,0 +1,231 @@
+"""
+Persistent completion cache.
+
+Completions are stored in SQLite, keyed on a hash of everything that
+determines the model output: model, system message, prompt, temperature and
+response format. Re-translating a mostly unchanged document then only sends
+the changed chunks to the model.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from .config import CACHE_MAX_AGE, CACHE_MAX_ENTRIES, CACHE_PATH
+
+
+class CompletionCache:
+    """Disk-backed cache of model completions with size and age eviction."""
+
+    # Eviction runs after this many writes rather than on every write.
+    EVICT_EVERY = 100
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        max_entries: int = CACHE_MAX_ENTRIES,
+        max_age: Optional[float] = CACHE_MAX_AGE,
+        enabled: bool = True,
+    ):
+        """
+        Initialize the cache.
+
+        Args:
+            path (str, optional): SQLite database file. The cache is disabled
+                when no path is given.
+            max_entries (int): Maximum number of completions kept. The least
+                recently used ones are evicted first.
+            max_age (float, optional): Maximum age of an entry in seconds.
+                Entries never expire when None.
+            enabled (bool): Whether lookups and writes are performed.
+        """
+        self.path = path
+        self.max_entries = max_entries
+        self.max_age = max_age
+        self.enabled = enabled and bool(path)
+        self.hits = 0
+        self.misses = 0
+        self._writes = 0
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            directory = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS completions ("
+                "key TEXT PRIMARY KEY, response TEXT NOT NULL, "
+                "created REAL NOT NULL, accessed REAL NOT NULL)"
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS completions_accessed "
+                "ON completions (accessed)"
+            )
+            self._conn.commit()
+        return self._conn
+
+    @staticmethod
+    def make_key(
+        model: str,
+        system: Optional[str],
+        prompt: str,
+        temperature: float,
+        format: Optional[str] = None,
+    ) -> str:
+        """
+        Hash the inputs of a completion call into a cache key.
+
+        Args:
+            model (str): Model name.
+            system (str, optional): System message.
+            prompt (str): Prompt text.
+            temperature (float): Sampling temperature.
+            format (str, optional): Response format (e.g., "json").
+
+        Returns:
+            str: Hex digest identifying the completion.
+        """
+        payload = json.dumps(
+            [model, system, prompt, temperature, format],
+            ensure_ascii=False,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        Look up a completion.
+
+        Args:
+            key (str): Key returned by make_key.
+
+        Returns:
+            str or None: The cached completion, or None on a miss.
+        """
+        if not self.enabled:
+            return None
+
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            row = conn.execute(
+                "SELECT response, created FROM completions WHERE key = ?",
+                (key,),
+            ).fetchone()
+            if row is not None and self._expired(row[1], now):
+                conn.execute("DELETE FROM completions WHERE key = ?", (key,))
+                conn.commit()
+                row = None
+            if row is None:
+                self.misses += 1
+                return None
+            conn.execute(
+                "UPDATE completions SET accessed = ? WHERE key = ?",
+                (now, key),
+            )
+            conn.commit()
+            self.hits += 1
+            return row[0]
+
+    def set(self, key: str, response: str) -> None:
+        """
+        Store a completion.
+
+        Args:
+            key (str): Key returned by make_key.
+            response (str): The completion text.
+        """
+        if not self.enabled:
+            return
+
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            conn.execute(
+                "INSERT OR REPLACE INTO completions "
+                "(key, response, created, accessed) VALUES (?, ?, ?, ?)",
+                (key, response, now, now),
+            )
+            self._writes += 1
+            if self._writes % self.EVICT_EVERY == 0:
+                self._evict(conn, now)
+            conn.commit()
+
+    def _expired(self, created: float, now: float) -> bool:
+        return self.max_age is not None and now - created > self.max_age
+
+    def _evict(self, conn: sqlite3.Connection, now: float) -> None:
+        if self.max_age is not None:
+            conn.execute(
+                "DELETE FROM completions WHERE created < ?",
+                (now - self.max_age,),
+            )
+        conn.execute(
+            "DELETE FROM completions WHERE key IN ("
+            "SELECT key FROM completions ORDER BY accessed DESC "
+            "LIMIT -1 OFFSET ?)",
+            (self.max_entries,),
+        )
+
+    def evict(self) -> None:
+        """Remove expired entries and trim the cache to max_entries."""
+        if not self.enabled:
+            return
+        with self._lock:
+            conn = self._connection()
+            self._evict(conn, time.time())
+            conn.commit()
+
+    def clear(self) -> None:
+        """Remove every entry and reset the counters."""
+        self.hits = self.misses = 0
+        if not self.enabled:
+            return
+        with self._lock:
+            conn = self._connection()
+            conn.execute("DELETE FROM completions")
+            conn.commit()
+
+    def __len__(self) -> int:
+        if not self.enabled:
+            return 0
+        with self._lock:
+            row = (
+                self._connection()
+                .execute("SELECT COUNT(*) FROM completions")
+                .fetchone()
+            )
+        return row[0]
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get the cache counters.
+
+        Returns:
+            Dict[str, Any]: Hits, misses, hit rate and number of entries.
+        """
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": len(self),
+        }
+
+    def close(self) -> None:
+        """Close the database connection."""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+# Global cache instance, enabled by setting TRANSLATION_CACHE_PATH
+completion_cache = CompletionCache(CACHE_PATH)
@@ -0,0 +1,137 @@
+"""
+Token-aware text chunker.
+
+Long texts are translated in chunks of roughly equal token size. The text
+is encoded once; chunk boundaries are then chosen from the token offsets,
+preferring the end of a paragraph, then of a line, then of a sentence,
+then of a word, and only cutting between two tokens when no such boundary
+is close enough. Every boundary is searched for in a window no larger than
+the chunk itself, so chunking is linear in the length of the text.
+"""
+
+import re
+from typing import List, NamedTuple, Union
+
+from .tokens import TokenizedText, tokenize
+
+
+# Boundaries in order of preference. Each pattern matches the separator the
+# chunk may end with; the chunk is cut right after the match.
+BOUNDARIES = [
+    ("paragraph", re.compile(r"\n\s*\n")),
+    ("line", re.compile(r"\n")),
+    (
+        "sentence",
+        re.compile(
+            r"[.!?][\"')\]]*\s+"
+            # CJK full stops, then any closing quotes or brackets (escaped,
+            # as the fullwidth forms look like ASCII punctuation)
+            r"|[\u3002\uFF01\uFF1F][\u300D\u300F\u201D\uFF09]*"
+        ),
+    ),
+    ("word", re.compile(r"\s+")),
+]
+
+
+class Chunk(NamedTuple):
+    """A chunk of text and where it lies in the source text."""
+
+    text: str
+    start: int
+    end: int
+
+
+def calculate_chunk_size(token_count: int, token_limit: int) -> int:
+    """
+    Calculate the chunk size based on the token count and token limit.
+
+    Args:
+        token_count (int): The total number of tokens.
+        token_limit (int): The maximum number of tokens allowed per chunk.
+
+    Returns:
+        int: The calculated chunk size.
+
+    Description:
+        This function calculates the chunk size based on the given token count and token limit.
+        If the token count is less than or equal to the token limit, the function returns the token count as the chunk size.
+        Otherwise, it calculates the number of chunks needed to accommodate all the tokens within the token limit.
+        The chunk size is determined by dividing the token limit by the number of chunks.
+        If there are remaining tokens after dividing the token count by the token limit,
+        the chunk size is adjusted by adding the remaining tokens divided by the number of chunks.
+
+    Example:
+        >>> calculate_chunk_size(1000, 500)
+        500
+        >>> calculate_chunk_size(1530, 500)
+        389
+        >>> calculate_chunk_size(2242, 500)
+        496
+    """
+
+    if token_count <= token_limit:
+        return token_count
+
+    num_chunks = (token_count + token_limit - 1) // token_limit
+    chunk_size = token_count // num_chunks
+
+    remaining_tokens = token_count % token_limit
+    if remaining_tokens > 0:
+        chunk_size += remaining_tokens // num_chunks
+
+    return chunk_size
+
+
+def _last_boundary(text: str, start: int, end: int) -> int:
+    """Return the end of the preferred boundary in text[start:end], or -1."""
+    for _, pattern in BOUNDARIES:
+        cut = -1
+        for match in pattern.finditer(text, start, end):
+            cut = match.end()
+        if cut != -1:
+            return cut
+    return -1
+
+
+def chunk_text(
+    text: Union[str, TokenizedText], max_tokens: int
+) -> List[Chunk]:
+    """
+    Split a text into chunks of roughly equal token size.
+
+    The target size is calculate_chunk_size(token count, max_tokens). A
+    chunk is cut at the last paragraph, line, sentence or word boundary in
+    its second half, or between two tokens if there is none. Joining the
+    chunk texts gives back the text.
+
+    Args:
+        text (str or TokenizedText): The text to split. A TokenizedText is
+            used as is, so a text that was already encoded is not encoded again.
+        max_tokens (int): The maximum number of tokens per chunk.
+
+    Returns:
+        List[Chunk]: The chunks, with their character offsets in the text.
+    """
+    tokenized = text if isinstance(text, TokenizedText) else tokenize(text)
+    source = tokenized.text
+    token_size = calculate_chunk_size(
+        token_count=len(tokenized), token_limit=max_tokens
+    )
+
+    chunks = []
+    start = 0
+    while start < len(source):
+        # A cut after a space or punctuation may fall inside a token; that
+        # token counts towards this chunk
+        start_token = tokenized.token_at(start)
+        end_token = start_token + token_size
+        end = tokenized.char_offset(end_token)
+        if end_token < len(tokenized):
+            midpoint = tokenized.char_offset(start_token + token_size // 2)
+            cut = _last_boundary(source, midpoint, end)
+            if cut > start:
+                end = cut
+        chunks.append(Chunk(source[start:end], start, end))
+        start = end
+
+    return chunks
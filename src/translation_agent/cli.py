@@ -0,0 +1,515 @@
+"""
+Command line interface for translating batches of files.
+
+Every chunk of every file is one task on a bounded executor, so the
+parallelism is the same whether the job is one long file or many short
+ones. Finished chunks are checkpointed in a JobManifest; running the same
+command again after a crash resumes from the manifest. With a translation
+memory (TRANSLATION_MEMORY_PATH), chunks of edited files that were
+translated before are reused as well.
+
+Example:
+    translation-agent docs/ -s English -t Spanish -c Mexico -o docs-es/
+"""
+
+import argparse
+import glob
+import logging
+import os
+import sys
+import threading
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from .config import (
+    CONTEXT_POLICY,
+    DEFAULT_OLLAMA_MODEL,
+    MAX_CONCURRENT_REQUESTS,
+    REVIEW_POLICY,
+)
+from .context_policy import ContextPolicy, get_context_policy
+from .executor import get_executor
+from .log import configure_logging
+from .manifest import JobManifest, text_hash
+from .memory import TranslationMemory, translation_memory
+from .ollama_client import unload_model, warm_up_model
+from .review_policy import ReviewPolicy, get_review_policy
+from .tokens import tokenize
+from .tracing import tracer
+from .utils import (
+    MAX_TOKENS_PER_CHUNK,
+    multichunk_translate_chunk,
+    one_chunk_translation,
+    split_source_text,
+)
+
+
+MANIFEST_NAME = ".translation-agent-manifest.sqlite3"
+
+logger = logging.getLogger(__name__)
+
+
+class FileJob:
+    """A source file, its chunks and the translations finished so far."""
+
+    def __init__(
+        self,
+        source: str,
+        output: str,
+        chunks: List[str],
+        single_chunk: bool,
+        done: Dict[int, str],
+        context_policy: ContextPolicy,
+        scope: str = "",
+    ):
+        self.source = source
+        self.output = output
+        self.chunks = chunks
+        self.single_chunk = single_chunk
+        self.translations = dict(done)
+        self.context_policy = context_policy
+        # Translation memory scope of the job's settings
+        self.scope = scope
+        self._lock = threading.Lock()
+
+    @property
+    def pending(self) -> List[int]:
+        """Indices of the chunks still to translate."""
+        return [
+            i for i in range(len(self.chunks)) if i not in self.translations
+        ]
+
+    def finish_chunk(self, i: int, translation: str) -> bool:
+        """Store a chunk translation; return True if it was the last one."""
+        with self._lock:
+            self.translations[i] = translation
+            return len(self.translations) == len(self.chunks)
+
+    def translation(self) -> str:
+        """Join the chunk translations in document order."""
+        return "".join(self.translations[i] for i in range(len(self.chunks)))
+
+
+def collect_files(
+    sources: Sequence[str], pattern: str
+) -> List[Tuple[str, str]]:
+    """
+    Expand directories and globs into source files.
+
+    Args:
+        sources (Sequence[str]): Files, directories or glob patterns.
+        pattern (str): Glob matched against the files inside directories.
+
+    Returns:
+        List[Tuple[str, str]]: (source path, output path relative to the
+            output directory) for every file, without duplicates.
+    """
+    files: Dict[str, str] = {}
+    for source in sources:
+        if os.path.isdir(source):
+            matches = glob.glob(
+                os.path.join(source, "**", pattern), recursive=True
+            )
+            for path in sorted(matches):
+                if os.path.isfile(path):
+                    files.setdefault(path, os.path.relpath(path, source))
+        elif os.path.isfile(source):
+            files.setdefault(source, os.path.basename(source))
+        else:
+            for path in sorted(glob.glob(source, recursive=True)):
+                if os.path.isfile(path):
+                    files.setdefault(path, os.path.basename(path))
+
+    outputs: Dict[str, str] = {}
+    for path, relative in files.items():
+        if relative in outputs:
+            raise ValueError(
+                f"{path} and {outputs[relative]} would both be written "
+                f"to {relative}"
+            )
+        outputs[relative] = path
+    return list(files.items())
+
+
+def plan_file(
+    source: str,
+    output: str,
+    manifest: JobManifest,
+    settings: Dict[str, object],
+    max_tokens: int,
+    context_policy_name: str,
+    memory: Optional[TranslationMemory] = None,
+) -> Optional[FileJob]:
+    """
+    Split a file into chunks and look up the chunks already translated.
+
+    With an enabled memory, the file is split around the chunks stored in
+    it (see TranslationMemory.split) and those count as translated. The
+    chunks recorded in the manifest were stored in the memory too.
+
+    Returns:
+        FileJob or None: The job, or None if the file is already done.
+    """
+    key = os.path.abspath(source)
+    with open(source, encoding="utf-8") as f:
+        text = f.read()
+    source_hash = text_hash(text)
+
+    completed = manifest.completed_output(key, source_hash, settings)
+    if completed == output and os.path.exists(output):
+        return None
+
+    use_memory = memory is not None and memory.enabled
+    scope = ""
+    if use_memory:
+        scope = memory.make_scope(
+            settings["source_lang"],
+            settings["target_lang"],
+            settings["country"],
+            settings["model"],
+        )
+
+    tokenized = tokenize(text)
+    single_chunk = len(tokenized) < max_tokens
+    stored = {}
+    if single_chunk:
+        chunks = [text] if text.strip() else []
+        if chunks and use_memory:
+            match = memory.get(scope, text)
+            if match is not None:
+                stored[0] = match.translation_2
+    elif use_memory:
+        segments = memory.split(tokenized, scope, max_tokens)
+        chunks = [segment.text for segment in segments]
+        stored = {
+            i: segment.stored.translation_2
+            for i, segment in enumerate(segments)
+            if segment.stored is not None
+        }
+    else:
+        chunks = split_source_text(tokenized, max_tokens)
+
+    done = manifest.start_file(key, source_hash, settings, len(chunks))
+    if use_memory:
+        # The split depends on the memory, so the manifest's chunk indices
+        # may not match it; the chunks they hold are in the memory anyway
+        done = stored
+        logger.info(
+            "Reusing %d of %d chunks of %s from the translation memory",
+            len(stored),
+            len(chunks),
+            source,
+        )
+    return FileJob(
+        source,
+        output,
+        chunks,
+        single_chunk,
+        done,
+        get_context_policy(context_policy_name),
+        scope,
+    )
+
+
+def write_output(job: FileJob) -> None:
+    """Write a finished translation, replacing any earlier output at once."""
+    directory = os.path.dirname(os.path.abspath(job.output))
+    os.makedirs(directory, exist_ok=True)
+    partial = job.output + ".partial"
+    with open(partial, "w", encoding="utf-8") as f:
+        f.write(job.translation())
+    os.replace(partial, job.output)
+
+
+def run_batch(
+    jobs: List[FileJob],
+    manifest: JobManifest,
+    source_lang: str,
+    target_lang: str,
+    country: str,
+    max_in_flight: int,
+    memory: Optional[TranslationMemory] = None,
+    review_policy: Optional[ReviewPolicy] = None,
+) -> int:
+    """
+    Translate the pending chunks of every job.
+
+    A chunk that fails is reported and left out of the manifest, so the
+    next run retries it; the other chunks carry on. Finished chunks are
+    also stored in the memory, if one is given. The review policy, by
+    default the one selected by TRANSLATION_REVIEW_POLICY, decides which
+    chunks are reflected on and improved.
+
+    Returns:
+        int: The number of chunks that failed.
+    """
+    if review_policy is None:
+        review_policy = get_review_policy()
+    tasks = [(job, i) for job in jobs for i in job.pending]
+    total = len(tasks)
+    progress = {"done": 0, "failed": 0}
+    progress_lock = threading.Lock()
+
+    def finish(job: FileJob) -> None:
+        write_output(job)
+        manifest.complete_file(os.path.abspath(job.source), job.output)
+        logger.info("Wrote %s", job.output)
+
+    def run_task(task: Tuple[FileJob, int]) -> None:
+        job, i = task
+        try:
+            if job.single_chunk:
+                chunk = one_chunk_translation(
+                    source_lang,
+                    target_lang,
+                    job.chunks[i],
+                    country,
+                    memory,
+                    job.scope,
+                    review_policy,
+                )
+            else:
+                chunk = multichunk_translate_chunk(
+                    source_lang,
+                    target_lang,
+                    job.chunks,
+                    i,
+                    country,
+                    job.context_policy,
+                    review_policy,
+                )
+        except Exception as e:
+            with progress_lock:
+                progress["failed"] += 1
+            logger.warning(
+                "Failed %s chunk %d/%d: %s",
+                job.source,
+                i + 1,
+                len(job.chunks),
+                e,
+            )
+            return
+
+        translation = chunk.translation_2
+        if memory is not None:
+            memory.put(
+                job.scope,
+                chunk.source_text,
+                chunk.translation_1,
+                chunk.reflection,
+                translation,
+            )
+        manifest.record_chunk(
+            os.path.abspath(job.source),
+            i,
+            text_hash(job.chunks[i]),
+            translation,
+        )
+        with progress_lock:
+            progress["done"] += 1
+            done = progress["done"]
+        logger.info(
+            "[%d/%d] %s chunk %d/%d",
+            done,
+            total,
+            job.source,
+            i + 1,
+            len(job.chunks),
+        )
+        if job.finish_chunk(i, translation):
+            finish(job)
+
+    # Files with nothing left to translate (resumed after the last chunk,
+    # or empty) are written straight away
+    for job in jobs:
+        if not job.pending:
+            finish(job)
+
+    with get_executor("thread", max_in_flight) as executor:
+        executor.map(run_task, tasks)
+
+    if tasks:
+        logger.info("Review policy %s", review_policy.stats)
+    return progress["failed"]
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="translation-agent",
+        description=(
+            "Translate files with a local Ollama model. Finished chunks are "
+            "recorded in a manifest, so an interrupted run resumes where it "
+            "stopped when run again."
+        ),
+    )
+    parser.add_argument(
+        "sources",
+        nargs="+",
+        help="Files, directories or glob patterns to translate",
+    )
+    parser.add_argument(
+        "-s", "--source-lang", required=True, help="Language of the files"
+    )
+    parser.add_argument(
+        "-t", "--target-lang", required=True, help="Language to translate to"
+    )
+    parser.add_argument(
+        "-c", "--country", default="", help="Country of the target language"
+    )
+    parser.add_argument(
+        "-o",
+        "--output-dir",
+        required=True,
+        help="Directory the translations are written to",
+    )
+    parser.add_argument(
+        "-p",
+        "--pattern",
+        default="*.txt",
+        help="Files to pick up inside directories (default: *.txt)",
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=MAX_CONCURRENT_REQUESTS,
+        help="Chunks translated at once (default: TRANSLATION_MAX_CONCURRENCY)",
+    )
+    parser.add_argument(
+        "--max-tokens",
+        type=int,
+        default=MAX_TOKENS_PER_CHUNK,
+        help="Maximum tokens per chunk",
+    )
+    parser.add_argument(
+        "--context-policy",
+        default=CONTEXT_POLICY,
+        choices=["full", "neighbours", "tokens", "summary"],
+        help="Context shown around each chunk of long files",
+    )
+    parser.add_argument(
+        "--review-policy",
+        default=REVIEW_POLICY,
+        choices=["always", "adaptive"],
+        help=(
+            "Whether every chunk is reflected on and improved, or only "
+            "those that need it"
+        ),
+    )
+    parser.add_argument(
+        "--manifest",
+        help=f"Manifest file (default: OUTPUT_DIR/{MANIFEST_NAME})",
+    )
+    parser.add_argument(
+        "--keep-model-loaded",
+        action="store_true",
+        help="Leave the model loaded when the run ends, for OLLAMA_KEEP_ALIVE",
+    )
+    verbosity = parser.add_mutually_exclusive_group()
+    verbosity.add_argument(
+        "-v",
+        "--verbose",
+        action="store_true",
+        help="Also log debug messages, such as how texts are chunked",
+    )
+    verbosity.add_argument(
+        "-q",
+        "--quiet",
+        action="store_true",
+        help="Only log failures, not the progress of each chunk",
+    )
+    parser.add_argument(
+        "--trace",
+        help="Write a JSON trace of every completion call to this file",
+    )
+    return parser
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    """
+    Run the batch translation command.
+
+    Returns:
+        int: 0 on success, 1 if any chunk failed, 2 on a usage error.
+    """
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.verbose:
+        configure_logging(logging.DEBUG)
+    elif args.quiet:
+        configure_logging(logging.WARNING)
+    else:
+        configure_logging(logging.INFO)
+    if args.jobs < 1:
+        parser.error("--jobs must be at least 1")
+
+    try:
+        files = collect_files(args.sources, args.pattern)
+    except ValueError as e:
+        parser.error(str(e))
+    if not files:
+        parser.error("no files to translate")
+
+    settings = {
+        "source_lang": args.source_lang,
+        "target_lang": args.target_lang,
+        "country": args.country,
+        "max_tokens": args.max_tokens,
+        "context_policy": args.context_policy,
+        "review_policy": args.review_policy,
+        "model": DEFAULT_OLLAMA_MODEL,
+    }
+    manifest_path = args.manifest or os.path.join(
+        args.output_dir, MANIFEST_NAME
+    )
+
+    with JobManifest(manifest_path) as manifest:
+        jobs = []
+        for source, relative in files:
+            job = plan_file(
+                source,
+                os.path.join(args.output_dir, relative),
+                manifest,
+                settings,
+                args.max_tokens,
+                args.context_policy,
+                translation_memory,
+            )
+            if job is None:
+                logger.info("Skipping %s, already translated", source)
+            else:
+                jobs.append(job)
+
+        loaded = any(job.pending for job in jobs)
+        if loaded:
+            warm_up_model(DEFAULT_OLLAMA_MODEL)
+
+        try:
+            failed = run_batch(
+                jobs,
+                manifest,
+                args.source_lang,
+                args.target_lang,
+                args.country,
+                args.jobs,
+                translation_memory,
+                get_review_policy(args.review_policy),
+            )
+        finally:
+            if loaded and not args.keep_model_loaded:
+                unload_model(DEFAULT_OLLAMA_MODEL)
+
+    if args.trace:
+        tracer.export_json(args.trace)
+
+    if failed:
+        print(
+            f"{failed} chunk(s) failed; run the same command again to "
+            "retry them",
+            file=sys.stderr,
+        )
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
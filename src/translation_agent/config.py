@@ -1,20 +1,118 @@
 """
 Configuration for Ollama models and settings.
 """
+
 import os
-from typing import List, Dict, Any
+from typing import Any, Dict, List
+
 from dotenv import load_dotenv
 
+
 load_dotenv()
 
 # Ollama Configuration
 OLLAMA_BASE_URL = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
 DEFAULT_OLLAMA_MODEL = os.getenv("OLLAMA_MODEL", "llama3.1:8b")
+# Seconds a model availability check stays valid before /api/tags is asked again
+MODEL_CHECK_TTL = float(os.getenv("OLLAMA_MODEL_CHECK_TTL", "300"))
+# Ollama endpoint used for completions: "chat" (/api/chat, the system message
+# and prompt sent as separate roles) or "generate" (/api/generate)
+OLLAMA_API = os.getenv("OLLAMA_API", "chat")
+
+# How long Ollama keeps a model loaded after a request: a duration such as
+# "30m", a number of seconds, or -1 to keep it loaded. Empty leaves the
+# server's default (5 minutes), after which the next request reloads the model.
+_keep_alive = os.getenv("OLLAMA_KEEP_ALIVE", "30m")
+OLLAMA_KEEP_ALIVE = (
+    int(_keep_alive)
+    if _keep_alive.lstrip("-").isdigit()
+    else _keep_alive or None
+)
+
+# Maximum number of chunk requests sent to the model server at once.
+# Should not exceed what the server can actually run in parallel
+# (OLLAMA_NUM_PARALLEL on the Ollama side).
+MAX_CONCURRENT_REQUESTS = int(os.getenv("TRANSLATION_MAX_CONCURRENCY", "4"))
+
+# HTTP connection pool and timeouts (seconds) for the Ollama API. The pool
+# should hold at least as many connections as requests run concurrently.
+OLLAMA_POOL_SIZE = int(
+    os.getenv("OLLAMA_POOL_SIZE", str(MAX_CONCURRENT_REQUESTS))
+)
+OLLAMA_CONNECT_TIMEOUT = float(os.getenv("OLLAMA_CONNECT_TIMEOUT", "5"))
+OLLAMA_READ_TIMEOUT = float(os.getenv("OLLAMA_READ_TIMEOUT", "120"))
+
+# Retries of Ollama requests that failed with a timeout, a dropped
+# connection or a 429/5xx response: attempts per request (1 disables
+# retrying), and the bounds in seconds of the jittered exponential backoff.
+# Each attempt gets the connect and read timeouts above.
+OLLAMA_RETRY_ATTEMPTS = int(os.getenv("OLLAMA_RETRY_ATTEMPTS", "3"))
+OLLAMA_RETRY_BASE_DELAY = float(os.getenv("OLLAMA_RETRY_BASE_DELAY", "0.5"))
+OLLAMA_RETRY_MAX_DELAY = float(os.getenv("OLLAMA_RETRY_MAX_DELAY", "10"))
+
+# Second Ollama server for hedged completions: a completion still running
+# after OLLAMA_HEDGE_QUANTILE of recent completion latencies is sent there
+# as well, and the first answer wins. Empty disables hedging.
+OLLAMA_HEDGE_URL = os.getenv("OLLAMA_HEDGE_URL", "")
+OLLAMA_HEDGE_QUANTILE = float(os.getenv("OLLAMA_HEDGE_QUANTILE", "0.95"))
+
+# How much of the surrounding document each multichunk prompt carries:
+# "full" (the whole document), "neighbours" (CONTEXT_CHUNKS chunks on each
+# side), "tokens" (up to CONTEXT_TOKEN_BUDGET tokens of neighbouring chunks)
+# or "summary" (a running summary plus CONTEXT_CHUNKS neighbours).
+CONTEXT_POLICY = os.getenv("TRANSLATION_CONTEXT_POLICY", "full")
+CONTEXT_CHUNKS = int(os.getenv("TRANSLATION_CONTEXT_CHUNKS", "2"))
+CONTEXT_TOKEN_BUDGET = int(os.getenv("TRANSLATION_CONTEXT_TOKENS", "2000"))
+
+# Which chunks are reflected on and improved: "always" (the original
+# workflow) or "adaptive" (skips trivial chunks and unneeded improvements)
+REVIEW_POLICY = os.getenv("TRANSLATION_REVIEW_POLICY", "always")
+# Chunks with fewer words are not reviewed by the adaptive policy
+REVIEW_MIN_WORDS = int(os.getenv("TRANSLATION_REVIEW_MIN_WORDS", "4"))
+
+# Short texts translate_batch packs into one prompt: at most this many
+# source tokens and texts per prompt
+BATCH_MAX_TOKENS = int(os.getenv("TRANSLATION_BATCH_TOKENS", "1000"))
+BATCH_MAX_SEGMENTS = int(os.getenv("TRANSLATION_BATCH_SEGMENTS", "16"))
+# How batched texts are shown and read back: "tags" (numbered XML tags) or
+# "json" (JSON objects, requested in Ollama's JSON mode)
+BATCH_OUTPUT = os.getenv("TRANSLATION_BATCH_OUTPUT", "tags")
+# Batched calls asking again for the outputs a batch call missed, before
+# they are sent one by one
+BATCH_RETRIES = int(os.getenv("TRANSLATION_BATCH_RETRIES", "1"))
+
+# Persistent completion cache, disabled unless a database path is set
+CACHE_PATH = os.getenv("TRANSLATION_CACHE_PATH", "")
+CACHE_MAX_ENTRIES = int(os.getenv("TRANSLATION_CACHE_MAX_ENTRIES", "100000"))
+# Maximum age of cached completions in seconds, 0 keeps them forever
+CACHE_MAX_AGE = (
+    float(os.getenv("TRANSLATION_CACHE_MAX_AGE_DAYS", "30")) * 24 * 3600
+    or None
+)
+
+# Translation memory of finished chunks, disabled unless a database path is set
+MEMORY_PATH = os.getenv("TRANSLATION_MEMORY_PATH", "")
+# A stored text at least this similar to a new one is edited into its
+# translation in one call; above 1 this is never done
+MEMORY_EDIT_SIMILARITY = float(
+    os.getenv("TRANSLATION_MEMORY_EDIT_SIMILARITY", "0.9")
+)
+# Stored texts at least this similar are shown as examples to the model
+MEMORY_EXAMPLE_SIMILARITY = float(
+    os.getenv("TRANSLATION_MEMORY_EXAMPLE_SIMILARITY", "0.6")
+)
+
+# Completion spans kept in memory for export, see tracing.Tracer
+TRACE_MAX_SPANS = int(os.getenv("TRANSLATION_TRACE_MAX_SPANS", "10000"))
+
+# Level of the package's log messages when logging is configured with
+# log.configure_logging: WARNING logs nothing per chunk, DEBUG logs every chunk
+LOG_LEVEL = os.getenv("TRANSLATION_LOG_LEVEL", "WARNING")
 
 # Recommended models for translation tasks
 RECOMMENDED_MODELS = [
     "llama3.1:8b",
-    "llama3.1:70b", 
+    "llama3.1:70b",
     "llama3:8b",
     "llama3:70b",
     "codellama:7b",
@@ -24,59 +122,92 @@ RECOMMENDED_MODELS = [
     "qwen2:7b",
     "qwen2:72b",
     "gemma2:9b",
-    "gemma2:27b"
+    "gemma2:27b",
 ]
 
+# Model configuration keys passed to Ollama as request options. Keep num_ctx
+# the same for every request to a model: changing it makes Ollama reload it.
+OLLAMA_OPTION_KEYS = ("num_ctx", "num_predict")
+
 # Model configurations with specific settings
 MODEL_CONFIGS = {
     "llama3.1:8b": {
         "max_tokens": 1000,
         "temperature": 0.3,
-        "description": "Good balance of speed and quality for translation tasks"
+        "num_ctx": 8192,
+        "num_predict": 2048,
+        "description": "Good balance of speed and quality for translation tasks",
     },
     "llama3.1:70b": {
         "max_tokens": 1200,
         "temperature": 0.2,
-        "description": "High quality translations, slower processing"
+        "num_ctx": 8192,
+        "num_predict": 2048,
+        "description": "High quality translations, slower processing",
     },
     "llama3:8b": {
         "max_tokens": 1000,
         "temperature": 0.3,
-        "description": "Fast and reliable for most translation tasks"
+        "num_ctx": 8192,
+        "num_predict": 2048,
+        "description": "Fast and reliable for most translation tasks",
     },
     "mistral:7b": {
         "max_tokens": 800,
         "temperature": 0.4,
-        "description": "Good for creative translations"
+        "num_ctx": 8192,
+        "num_predict": 2048,
+        "description": "Good for creative translations",
     },
     "qwen2:7b": {
         "max_tokens": 1000,
         "temperature": 0.3,
-        "description": "Excellent for Asian language translations"
-    }
+        "num_ctx": 8192,
+        "num_predict": 2048,
+        "description": "Excellent for Asian language translations",
+    },
 }
 
+
 def get_model_config(model_name: str) -> Dict[str, Any]:
     """
     Get configuration for a specific model.
-    
+
     Args:
         model_name (str): Name of the model
-        
+
     Returns:
         Dict[str, Any]: Model configuration
     """
-    return MODEL_CONFIGS.get(model_name, {
-        "max_tokens": 1000,
-        "temperature": 0.3,
-        "description": "Default configuration"
-    })
+    return MODEL_CONFIGS.get(
+        model_name,
+        {
+            "max_tokens": 1000,
+            "temperature": 0.3,
+            "description": "Default configuration",
+        },
+    )
+
+
+def get_model_options(model_name: str) -> Dict[str, Any]:
+    """
+    Get the Ollama request options configured for a model.
+
+    Args:
+        model_name (str): Name of the model
+
+    Returns:
+        Dict[str, Any]: The model's OLLAMA_OPTION_KEYS settings, e.g. num_ctx
+    """
+    config = get_model_config(model_name)
+    return {key: config[key] for key in OLLAMA_OPTION_KEYS if key in config}
+
 
 def get_recommended_models() -> List[str]:
     """
     Get list of recommended models for translation.
-    
+
     Returns:
         List[str]: List of recommended model names
     """
-    return RECOMMENDED_MODELS.copy()
\ No newline at end of file
+    return RECOMMENDED_MODELS.copy()
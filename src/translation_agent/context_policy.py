@@ -0,0 +1,316 @@
+"""
+Context policies for multichunk prompts.
+
+Every multichunk prompt shows the model the chunk being translated inside a
+slice of the surrounding source text. A context policy decides how large
+that slice is. The original behaviour sends the whole document with every
+call, so prompt size grows with document length; the bounded policies keep
+it constant however long the document is.
+"""
+
+import threading
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from .config import CONTEXT_CHUNKS, CONTEXT_POLICY, CONTEXT_TOKEN_BUDGET
+
+
+class PromptTokens(NamedTuple):
+    """Prompt size of a single completion call."""
+
+    stage: str
+    index: int
+    tokens: int
+
+
+class PromptTokenLog:
+    """Thread-safe record of the prompt size of every multichunk call."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.entries: List[PromptTokens] = []
+
+    def record(self, stage: str, index: int, prompt: str) -> None:
+        """
+        Count the tokens in a prompt and record them.
+
+        Args:
+            stage (str): Pipeline stage, e.g. "initial", "reflect" or "improve".
+            index (int): Index of the chunk the prompt is for.
+            prompt (str): The prompt sent to the model.
+        """
+        from .utils import num_tokens_in_string
+
+        entry = PromptTokens(stage, index, num_tokens_in_string(prompt))
+        with self._lock:
+            self.entries.append(entry)
+
+    @property
+    def total(self) -> int:
+        """Total number of prompt tokens recorded."""
+        return sum(entry.tokens for entry in self.entries)
+
+    @property
+    def largest(self) -> int:
+        """Size of the largest prompt recorded."""
+        return max((entry.tokens for entry in self.entries), default=0)
+
+    def by_stage(self) -> Dict[str, int]:
+        """Total prompt tokens per stage."""
+        totals: Dict[str, int] = {}
+        for entry in self.entries:
+            totals[entry.stage] = totals.get(entry.stage, 0) + entry.tokens
+        return totals
+
+
+class ContextPolicy:
+    """Base class deciding which source text surrounds the chunk to translate."""
+
+    def __init__(self, usage: Optional[PromptTokenLog] = None):
+        """
+        Initialize the policy.
+
+        Args:
+            usage (PromptTokenLog, optional): If given, the size of every
+                prompt built with this policy is recorded in it.
+        """
+        self.usage = usage
+
+    def context(
+        self, source_text_chunks: List[str], i: int
+    ) -> Tuple[str, str]:
+        """
+        Return the text shown before and after chunk i.
+
+        Args:
+            source_text_chunks (List[str]): The source text divided into chunks.
+            i (int): Index of the chunk being translated.
+
+        Returns:
+            Tuple[str, str]: (text before chunk i, text after chunk i).
+        """
+        raise NotImplementedError
+
+    def tagged_text(self, source_text_chunks: List[str], i: int) -> str:
+        """Return the context with chunk i wrapped in TRANSLATE_THIS tags."""
+        before, after = self.context(source_text_chunks, i)
+        return (
+            before
+            + "<TRANSLATE_THIS>"
+            + source_text_chunks[i]
+            + "</TRANSLATE_THIS>"
+            + after
+        )
+
+    def context_text(self, source_text_chunks: List[str], i: int) -> str:
+        """
+        Return the context with chunk i in place and no tags.
+
+        Under the "full" policy this is the whole document for every chunk,
+        so the prompts of consecutive chunks start with the same text.
+        """
+        before, after = self.context(source_text_chunks, i)
+        return before + source_text_chunks[i] + after
+
+    def record(self, stage: str, index: int, prompt: str) -> None:
+        """Record the size of a prompt built with this policy, if enabled."""
+        if self.usage is not None:
+            self.usage.record(stage, index, prompt)
+
+
+class FullDocumentContext(ContextPolicy):
+    """Show the whole document around every chunk (the original behaviour)."""
+
+    def context(
+        self, source_text_chunks: List[str], i: int
+    ) -> Tuple[str, str]:
+        return (
+            "".join(source_text_chunks[0:i]),
+            "".join(source_text_chunks[i + 1 :]),
+        )
+
+
+class NeighbourChunksContext(ContextPolicy):
+    """Show up to n chunks on each side of the chunk being translated."""
+
+    def __init__(self, n: int = 2, usage: Optional[PromptTokenLog] = None):
+        super().__init__(usage)
+        if n < 0:
+            raise ValueError("n must not be negative")
+        self.n = n
+
+    def context(
+        self, source_text_chunks: List[str], i: int
+    ) -> Tuple[str, str]:
+        return (
+            "".join(source_text_chunks[max(0, i - self.n) : i]),
+            "".join(source_text_chunks[i + 1 : i + 1 + self.n]),
+        )
+
+
+class TokenBudgetContext(ContextPolicy):
+    """
+    Show as many whole neighbouring chunks as fit in a token budget.
+
+    Chunks are added alternately before and after the chunk being translated,
+    nearest first, until the next one would exceed the budget. The tokens of
+    each chunk are counted once per list of chunks, not once per prompt.
+    """
+
+    def __init__(
+        self,
+        max_tokens: int = CONTEXT_TOKEN_BUDGET,
+        usage: Optional[PromptTokenLog] = None,
+    ):
+        super().__init__(usage)
+        self.max_tokens = max_tokens
+        self._lock = threading.Lock()
+        self._chunks: Optional[List[str]] = None
+        self._sizes: List[int] = []
+
+    def chunk_sizes(self, source_text_chunks: List[str]) -> List[int]:
+        """Return the number of tokens in every chunk."""
+        from .utils import num_tokens_in_string
+
+        with self._lock:
+            if self._chunks is not source_text_chunks:
+                self._chunks = source_text_chunks
+                self._sizes = [
+                    num_tokens_in_string(chunk) for chunk in source_text_chunks
+                ]
+            return self._sizes
+
+    def context(
+        self, source_text_chunks: List[str], i: int
+    ) -> Tuple[str, str]:
+        sizes = self.chunk_sizes(source_text_chunks)
+        start, end = i, i + 1
+        budget = self.max_tokens
+        grew = True
+        while grew:
+            grew = False
+            if start > 0:
+                cost = sizes[start - 1]
+                if cost <= budget:
+                    start -= 1
+                    budget -= cost
+                    grew = True
+            if end < len(source_text_chunks):
+                cost = sizes[end]
+                if cost <= budget:
+                    end += 1
+                    budget -= cost
+                    grew = True
+
+        return (
+            "".join(source_text_chunks[start:i]),
+            "".join(source_text_chunks[i + 1 : end]),
+        )
+
+
+SUMMARY_PROMPT = """Below is a summary of a text so far, delimited by <SUMMARY> and </SUMMARY>, followed by the next part of the text, \
+delimited by <TEXT> and </TEXT>. Write an updated summary, in the language of the text, covering both. Keep the names of people and places, \
+the terminology and the tone. Use at most {max_words} words and output only the summary.
+
+<SUMMARY>
+{summary}
+</SUMMARY>
+
+<TEXT>
+{text}
+</TEXT>"""
+
+
+class RollingSummaryContext(ContextPolicy):
+    """
+    Show a running summary of the earlier text plus n neighbouring chunks.
+
+    The summary of everything before the window is built incrementally, one
+    chunk at a time, so its size stays bounded by max_words. Summaries are
+    computed lazily and shared between stages; building them is sequential,
+    so the first calls of a long document wait for the summaries they need.
+    """
+
+    def __init__(
+        self,
+        n: int = 1,
+        max_words: int = 200,
+        summarize: Optional[Callable[[str, str], str]] = None,
+        usage: Optional[PromptTokenLog] = None,
+    ):
+        """
+        Initialize the policy.
+
+        Args:
+            n (int): Number of neighbouring chunks shown verbatim on each side.
+            max_words (int): Word limit requested for the running summary.
+            summarize (Callable, optional): Function (summary, text) -> new
+                summary. Defaults to asking the translation model.
+            usage (PromptTokenLog, optional): Records prompt sizes if given.
+        """
+        super().__init__(usage)
+        self.n = n
+        self.max_words = max_words
+        self.summarize = summarize or self._summarize
+        self._lock = threading.Lock()
+        self._chunks: Optional[List[str]] = None
+        self._summaries: List[str] = [""]
+
+    def _summarize(self, summary: str, text: str) -> str:
+        from . import utils
+        from .tracing import trace_stage
+
+        prompt = SUMMARY_PROMPT.format(
+            max_words=self.max_words, summary=summary, text=text
+        )
+        with trace_stage("summary"):
+            return utils.get_completion(
+                prompt, system_message="You are an expert editor."
+            )
+
+    def summary_before(self, source_text_chunks: List[str], k: int) -> str:
+        """Return the summary of chunks 0..k-1."""
+        with self._lock:
+            if self._chunks is not source_text_chunks:
+                self._chunks = source_text_chunks
+                self._summaries = [""]
+            while len(self._summaries) <= k:
+                j = len(self._summaries) - 1
+                self._summaries.append(
+                    self.summarize(self._summaries[j], source_text_chunks[j])
+                )
+            return self._summaries[k]
+
+    def context(
+        self, source_text_chunks: List[str], i: int
+    ) -> Tuple[str, str]:
+        start = max(0, i - self.n)
+        before = "".join(source_text_chunks[start:i])
+        if start > 0:
+            summary = self.summary_before(source_text_chunks, start)
+            before = f"[Summary of the preceding text: {summary}]\n\n{before}"
+        return before, "".join(source_text_chunks[i + 1 : i + 1 + self.n])
+
+
+def get_context_policy(
+    name: str = CONTEXT_POLICY, usage: Optional[PromptTokenLog] = None
+) -> ContextPolicy:
+    """
+    Create a context policy by name, using the configured defaults.
+
+    Args:
+        name (str): One of "full", "neighbours", "tokens" or "summary".
+            Defaults to the TRANSLATION_CONTEXT_POLICY setting.
+        usage (PromptTokenLog, optional): Records prompt sizes if given.
+
+    Returns:
+        ContextPolicy: The policy.
+    """
+    if name == "full":
+        return FullDocumentContext(usage=usage)
+    if name == "neighbours":
+        return NeighbourChunksContext(CONTEXT_CHUNKS, usage=usage)
+    if name == "tokens":
+        return TokenBudgetContext(CONTEXT_TOKEN_BUDGET, usage=usage)
+    if name == "summary":
+        return RollingSummaryContext(CONTEXT_CHUNKS, usage=usage)
+    raise ValueError(f"Unknown context policy {name!r}")
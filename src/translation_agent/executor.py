@@ -0,0 +1,271 @@
+"""
+Chunk executors for the translation pipeline.
+
+An executor runs one function over many chunks and returns the results in
+input order, however the calls were scheduled. The serial executor
+reproduces the original one-at-a-time behaviour, the thread pool and
+asyncio executors keep up to ``max_in_flight`` calls running at once.
+"""
+
+import asyncio
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Iterable, Iterator, List, Optional
+
+from .config import MAX_CONCURRENT_REQUESTS
+
+
+class ChunkExecutor:
+    """Base class for executors that map a function over chunks."""
+
+    def __init__(self, max_in_flight: int = 1):
+        """
+        Initialize the executor.
+
+        Args:
+            max_in_flight (int): Maximum number of calls running at once.
+        """
+        if max_in_flight < 1:
+            raise ValueError("max_in_flight must be at least 1")
+        self.max_in_flight = max_in_flight
+
+    def imap(
+        self, fn: Callable[[Any], Any], items: Iterable[Any]
+    ) -> Iterator[Any]:
+        """
+        Apply fn to every item, yielding results in input order.
+
+        Results are yielded as soon as they and every result before them
+        are ready, so callers can stream output while later items are
+        still running.
+        """
+        raise NotImplementedError
+
+    def map(self, fn: Callable[[Any], Any], items: Iterable[Any]) -> List[Any]:
+        """Apply fn to every item and return the results in input order."""
+        return list(self.imap(fn, items))
+
+    def imap_stream(
+        self, fn: Callable[[Any], Iterable[Any]], items: Iterable[Any]
+    ) -> Iterator[Any]:
+        """
+        Apply fn to every item and yield the pieces of the iterables it returns, item after item.
+
+        The items run through imap, so fn is called for as many items at
+        once as the executor allows. The pieces of the first unfinished
+        item are yielded as they arrive; those of later items are buffered
+        until every item before them has been yielded. If the caller stops
+        early, or an item raises, the items still running stop at their
+        next piece and the ones not started are skipped.
+        """
+        items = list(items)
+        pieces = [queue.Queue() for _ in items]
+        stopped = threading.Event()
+
+        def run(index: int) -> None:
+            try:
+                if not stopped.is_set():
+                    for piece in fn(items[index]):
+                        pieces[index].put((True, piece))
+                        if stopped.is_set():
+                            break
+            except Exception as e:
+                pieces[index].put((False, e))
+            finally:
+                pieces[index].put(None)
+
+        def drain() -> None:
+            for _ in self.imap(run, range(len(items))):
+                pass
+
+        # imap only makes progress while it is consumed, so a helper thread
+        # consumes it and the pieces are handed back through the queues
+        thread = threading.Thread(target=drain)
+        thread.start()
+        try:
+            for results in pieces:
+                for ok, value in iter(results.get, None):
+                    if not ok:
+                        raise value
+                    yield value
+        finally:
+            stopped.set()
+            thread.join()
+
+    def shutdown(self) -> None:
+        """Release any resources held by the executor."""
+
+    def __enter__(self) -> "ChunkExecutor":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.shutdown()
+
+
+class SerialExecutor(ChunkExecutor):
+    """Executor that runs every call in the calling thread, one by one."""
+
+    def __init__(self):
+        super().__init__(max_in_flight=1)
+
+    def imap(
+        self, fn: Callable[[Any], Any], items: Iterable[Any]
+    ) -> Iterator[Any]:
+        for item in items:
+            yield fn(item)
+
+
+class ThreadPoolChunkExecutor(ChunkExecutor):
+    """Executor backed by a thread pool."""
+
+    def __init__(self, max_in_flight: int = MAX_CONCURRENT_REQUESTS):
+        super().__init__(max_in_flight=max_in_flight)
+        self._pool = ThreadPoolExecutor(
+            max_workers=max_in_flight,
+            thread_name_prefix="translation-agent",
+        )
+
+    def imap(
+        self, fn: Callable[[Any], Any], items: Iterable[Any]
+    ) -> Iterator[Any]:
+        # The pool itself bounds the number of calls in flight; futures
+        # are consumed in submission order to keep the output stable.
+        futures = [self._pool.submit(fn, item) for item in items]
+        try:
+            for future in futures:
+                yield future.result()
+        finally:
+            for future in futures:
+                future.cancel()
+
+    def shutdown(self) -> None:
+        self._pool.shutdown(wait=True)
+
+
+class AsyncioChunkExecutor(ChunkExecutor):
+    """
+    Executor driven by an asyncio event loop.
+
+    Coroutine functions are awaited directly, plain functions are run in
+    worker threads. A semaphore bounds the number of calls in flight.
+    map and imap run a private event loop on a helper thread, so the
+    executor can be used from synchronous code as well as from inside a
+    running loop; amap is the native entry point for async callers.
+    """
+
+    def __init__(self, max_in_flight: int = MAX_CONCURRENT_REQUESTS):
+        super().__init__(max_in_flight=max_in_flight)
+
+    async def _run(
+        self,
+        fn: Callable[[Any], Any],
+        item: Any,
+        semaphore: asyncio.Semaphore,
+    ) -> Any:
+        async with semaphore:
+            if asyncio.iscoroutinefunction(fn):
+                return await fn(item)
+            return await asyncio.to_thread(fn, item)
+
+    async def amap(
+        self, fn: Callable[[Any], Any], items: Iterable[Any]
+    ) -> List[Any]:
+        """Apply fn to every item from within a running event loop."""
+        semaphore = asyncio.Semaphore(self.max_in_flight)
+        return await asyncio.gather(
+            *(self._run(fn, item, semaphore) for item in items)
+        )
+
+    def imap(
+        self, fn: Callable[[Any], Any], items: Iterable[Any]
+    ) -> Iterator[Any]:
+        # The event loop runs on a helper thread and hands finished results
+        # back through a queue, so they can be yielded as they complete.
+        results = queue.Queue()
+        items = list(items)
+
+        async def produce() -> None:
+            semaphore = asyncio.Semaphore(self.max_in_flight)
+
+            async def run(index: int, item: Any) -> None:
+                try:
+                    value = await self._run(fn, item, semaphore)
+                except Exception as e:
+                    results.put((index, False, e))
+                else:
+                    results.put((index, True, value))
+
+            await asyncio.gather(
+                *(run(index, item) for index, item in enumerate(items))
+            )
+
+        thread = threading.Thread(target=asyncio.run, args=(produce(),))
+        thread.start()
+        try:
+            finished = {}
+            for index in range(len(items)):
+                while index not in finished:
+                    done, ok, value = results.get()
+                    finished[done] = (ok, value)
+                ok, value = finished.pop(index)
+                if not ok:
+                    raise value
+                yield value
+        finally:
+            thread.join()
+
+
+EXECUTORS = {
+    "serial": SerialExecutor,
+    "thread": ThreadPoolChunkExecutor,
+    "asyncio": AsyncioChunkExecutor,
+}
+
+
+def get_executor(
+    kind: str = "thread", max_in_flight: Optional[int] = None
+) -> ChunkExecutor:
+    """
+    Create a chunk executor by name.
+
+    Args:
+        kind (str): One of "serial", "thread" or "asyncio".
+        max_in_flight (int, optional): Maximum number of calls running at
+            once. Defaults to MAX_CONCURRENT_REQUESTS. Ignored for the
+            serial executor.
+
+    Returns:
+        ChunkExecutor: The executor.
+    """
+    if kind not in EXECUTORS:
+        raise ValueError(
+            f"Unknown executor {kind!r}, expected one of {sorted(EXECUTORS)}"
+        )
+    if kind == "serial":
+        return SerialExecutor()
+    return EXECUTORS[kind](max_in_flight or MAX_CONCURRENT_REQUESTS)
+
+
+def run_chunks(
+    fn: Callable[[Any], Any],
+    items: Iterable[Any],
+    executor: Optional[ChunkExecutor] = None,
+) -> List[Any]:
+    """
+    Map fn over items with the given executor, or a temporary default one.
+
+    Args:
+        fn (Callable): Function called once per item.
+        items (Iterable): Items to process.
+        executor (ChunkExecutor, optional): Executor to use. When omitted a
+            thread pool limited to MAX_CONCURRENT_REQUESTS is created for
+            the call and shut down afterwards.
+
+    Returns:
+        List: The results, in input order.
+    """
+    if executor is not None:
+        return executor.map(fn, items)
+    with get_executor() as default_executor:
+        return default_executor.map(fn, items)
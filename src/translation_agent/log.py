@@ -0,0 +1,67 @@
+"""
+Logging setup.
+
+Every module logs to its own logger under "translation_agent" with lazy
+%-style arguments, so a message below the configured level is dropped
+before it is formatted. The library itself never installs a handler;
+applications call configure_logging once at startup.
+
+Levels:
+    WARNING   errors that are handled and not raised (the default; nothing
+              is logged per chunk)
+    INFO      one line per document or file, model pulls
+    DEBUG     one line per chunk, and errors that are raised to the caller
+"""
+
+import logging
+import sys
+from typing import Optional, Union
+
+from .config import LOG_LEVEL
+
+
+LOGGER_NAME = "translation_agent"
+LOG_FORMAT = "%(asctime)s %(levelname)s %(name)s: %(message)s"
+
+logging.getLogger(LOGGER_NAME).addHandler(logging.NullHandler())
+
+
+def configure_logging(
+    level: Optional[Union[int, str]] = None, stream=None
+) -> logging.Logger:
+    """
+    Send the package's log messages to stderr.
+
+    Calling it again changes the level without adding a second handler.
+
+    Args:
+        level (int or str, optional): Logging level, e.g. "DEBUG" or
+            logging.INFO. Defaults to TRANSLATION_LOG_LEVEL.
+        stream (optional): Stream to write to. Defaults to sys.stderr.
+
+    Returns:
+        logging.Logger: The package logger.
+    """
+    if level is None:
+        level = LOG_LEVEL
+    if isinstance(level, str):
+        level = level.upper()
+
+    logger = logging.getLogger(LOGGER_NAME)
+    logger.setLevel(level)
+    handler = next(
+        (
+            h
+            for h in logger.handlers
+            if getattr(h, "_translation_agent", False)
+        ),
+        None,
+    )
+    if handler is None:
+        handler = logging.StreamHandler(stream or sys.stderr)
+        handler.setFormatter(logging.Formatter(LOG_FORMAT))
+        handler._translation_agent = True
+        logger.addHandler(handler)
+    elif stream is not None:
+        handler.setStream(stream)
+    return logger
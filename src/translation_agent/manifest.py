@@ -0,0 +1,169 @@
+"""
+Job manifest for batch translation.
+
+A batch job records every finished chunk in SQLite as soon as it is
+translated. Running the same job again skips the chunks already recorded,
+so a crash or a restart of the Ollama server only costs the chunks that
+were in flight. A file's chunks are discarded when the file or the job
+settings change, since its chunks would then no longer match.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional
+
+
+def text_hash(text: str) -> str:
+    """Return the hex SHA-256 digest of a text."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class JobManifest:
+    """SQLite record of the files and chunks a batch job has translated."""
+
+    def __init__(self, path: str):
+        """
+        Open or create a manifest.
+
+        Args:
+            path (str): SQLite database file.
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS files ("
+            "path TEXT PRIMARY KEY, source_hash TEXT NOT NULL, "
+            "settings TEXT NOT NULL, num_chunks INTEGER NOT NULL, "
+            "output TEXT, completed REAL)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS chunks ("
+            "path TEXT NOT NULL, idx INTEGER NOT NULL, "
+            "source_hash TEXT NOT NULL, translation TEXT NOT NULL, "
+            "created REAL NOT NULL, PRIMARY KEY (path, idx))"
+        )
+        self._conn.commit()
+
+    @staticmethod
+    def settings_key(settings: Dict[str, Any]) -> str:
+        """Serialize job settings so that equal settings compare equal."""
+        return json.dumps(settings, sort_keys=True, ensure_ascii=False)
+
+    def start_file(
+        self,
+        path: str,
+        source_hash: str,
+        settings: Dict[str, Any],
+        num_chunks: int,
+    ) -> Dict[int, str]:
+        """
+        Register a file and get the chunks already translated.
+
+        The recorded chunks are dropped if the file was last seen with
+        different contents, settings or number of chunks.
+
+        Args:
+            path (str): The source file.
+            source_hash (str): text_hash of the file contents.
+            settings (Dict[str, Any]): Everything else the translation depends on.
+            num_chunks (int): Number of chunks the file is split into.
+
+        Returns:
+            Dict[int, str]: Translations of the finished chunks, by chunk index.
+        """
+        settings_key = self.settings_key(settings)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT source_hash, settings, num_chunks FROM files "
+                "WHERE path = ?",
+                (path,),
+            ).fetchone()
+            if row != (source_hash, settings_key, num_chunks):
+                self._conn.execute(
+                    "DELETE FROM chunks WHERE path = ?", (path,)
+                )
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO files "
+                    "(path, source_hash, settings, num_chunks, output, "
+                    "completed) VALUES (?, ?, ?, ?, NULL, NULL)",
+                    (path, source_hash, settings_key, num_chunks),
+                )
+                self._conn.commit()
+                return {}
+            rows = self._conn.execute(
+                "SELECT idx, translation FROM chunks WHERE path = ?",
+                (path,),
+            ).fetchall()
+        return dict(rows)
+
+    def record_chunk(
+        self, path: str, index: int, source_hash: str, translation: str
+    ) -> None:
+        """
+        Record a finished chunk.
+
+        Args:
+            path (str): The source file.
+            index (int): Index of the chunk in the file.
+            source_hash (str): text_hash of the chunk's source text.
+            translation (str): The final translation of the chunk.
+        """
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO chunks "
+                "(path, idx, source_hash, translation, created) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (path, index, source_hash, translation, time.time()),
+            )
+            self._conn.commit()
+
+    def complete_file(self, path: str, output: str) -> None:
+        """
+        Mark a file as fully translated.
+
+        Args:
+            path (str): The source file.
+            output (str): Where the translation was written.
+        """
+        with self._lock:
+            self._conn.execute(
+                "UPDATE files SET output = ?, completed = ? WHERE path = ?",
+                (output, time.time(), path),
+            )
+            self._conn.commit()
+
+    def completed_output(
+        self, path: str, source_hash: str, settings: Dict[str, Any]
+    ) -> Optional[str]:
+        """
+        Get the output of a file translated with the same contents and settings.
+
+        Returns:
+            str or None: The output path, or None if the file still needs work.
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT output FROM files WHERE path = ? AND source_hash = ? "
+                "AND settings = ? AND completed IS NOT NULL",
+                (path, source_hash, self.settings_key(settings)),
+            ).fetchone()
+        return row[0] if row else None
+
+    def close(self) -> None:
+        """Close the database connection."""
+        with self._lock:
+            self._conn.close()
+
+    def __enter__(self) -> "JobManifest":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
@@ -0,0 +1,481 @@
+"""
+Translation memory for incremental re-translation.
+
+Every translated chunk is stored in SQLite with its initial translation,
+reflection and final translation, keyed on a hash of the chunk's source
+text and the settings it was translated with (languages, country, model).
+
+When a document is translated again, split() diffs it against the stored
+segments instead of chunking it from scratch: every stored chunk found
+verbatim in the new text is reused with its translation, and only the text
+between those matches, i.e. what was changed or added, is chunked and sent
+to the model. Chunking from scratch would not work, since chunk boundaries
+depend on the length of the whole text and one edited paragraph moves them
+all. Segments are indexed by their first characters (their head), and
+split() only looks up the heads that occur in the new text, so its cost
+depends on the length of the text rather than the size of the memory.
+
+Texts that are similar to a stored one without containing it (boilerplate
+with another name or date in it, reworded UI strings) are found by
+similar(). Each stored text gets a MinHash signature of its character
+n-grams, and the signature is cut into bands that are indexed in SQLite
+(locality-sensitive hashing). A lookup reads the rows of its own bands
+from that index, so its cost depends on the number of texts sharing a
+band, not on the size of the memory.
+"""
+
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import struct
+import threading
+import time
+from typing import List, NamedTuple, Optional, Sequence, Set, Tuple, Union
+
+from .chunker import chunk_text
+from .config import MEMORY_EXAMPLE_SIMILARITY, MEMORY_PATH
+from .tokens import TokenizedText
+
+
+# Stored segments are looked up by their first HEAD_CHARS characters
+HEAD_CHARS = 64
+# Heads looked up per query (older SQLite versions allow 999 parameters)
+HEAD_LOOKUP_BATCH = 500
+
+# A chunk starts at the beginning of the text or after whitespace
+_SEGMENT_STARTS = re.compile(r"\s+")
+
+# Texts are compared by their sets of NGRAM_CHARS-character substrings
+NGRAM_CHARS = 5
+# The MinHash signature has BANDS * ROWS values. Two texts are compared if
+# all ROWS values of any band agree: with 16 bands of 4, a text with a
+# Jaccard similarity of 0.6 is found 89% of the time, 0.8 always.
+BANDS = 16
+ROWS = 4
+_SLOTS = BANDS * ROWS
+# Texts compared in full per match returned by similar()
+CANDIDATES_PER_MATCH = 4
+
+
+class StoredTranslation(NamedTuple):
+    """The outputs of the three translation stages for a stored chunk."""
+
+    translation_1: str
+    reflection: str
+    translation_2: str
+
+
+class FuzzyMatch(NamedTuple):
+    """A stored text similar to the one looked up."""
+
+    source: str
+    translation: str
+    similarity: float
+
+
+class Segment(NamedTuple):
+    """A chunk of a text, with its stored translation if it has one."""
+
+    text: str
+    stored: Optional[StoredTranslation]
+
+
+def ngrams(text: str) -> Set[str]:
+    """Return the character n-grams of a text, ignoring case and spacing."""
+    text = " ".join(text.lower().split())
+    if len(text) <= NGRAM_CHARS:
+        return {text}
+    return {
+        text[i : i + NGRAM_CHARS] for i in range(len(text) - NGRAM_CHARS + 1)
+    }
+
+
+def similarity(a: Set[str], b: Set[str]) -> float:
+    """Return the Jaccard similarity of two n-gram sets."""
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+def minhash(grams: Set[str]) -> Tuple[int, ...]:
+    """
+    Return the MinHash signature of an n-gram set.
+
+    Each n-gram is hashed once and the hash picks the slot it competes
+    for (one permutation hashing), rather than hashing every n-gram once
+    per slot. A slot no n-gram fell into takes the value of the next
+    filled slot, marked with the distance, so that two texts only agree
+    on it if they agree on the filled one.
+    """
+    slots: List[Optional[int]] = [None] * _SLOTS
+    for gram in grams:
+        digest = hashlib.blake2b(gram.encode("utf-8"), digest_size=8).digest()
+        slot, value = divmod(int.from_bytes(digest, "little"), 1 << 58)
+        slot %= _SLOTS
+        current = slots[slot]
+        if current is None or value < current:
+            slots[slot] = value
+    signature = []
+    for slot in range(_SLOTS):
+        for distance in range(_SLOTS):
+            value = slots[(slot + distance) % _SLOTS]
+            if value is not None:
+                signature.append(value + (distance << 58))
+                break
+    return tuple(signature)
+
+
+def _band_buckets(scope: str, signature: Sequence[int]) -> List[int]:
+    # One index key per band, as a signed 64-bit SQLite integer
+    buckets = []
+    for band in range(BANDS):
+        values = signature[band * ROWS : (band + 1) * ROWS]
+        digest = hashlib.blake2b(
+            f"{scope}:{band}:{values}".encode(), digest_size=8
+        ).digest()
+        buckets.append(struct.unpack("<q", digest)[0])
+    return buckets
+
+
+class TranslationMemory:
+    """SQLite store of translated chunks."""
+
+    def __init__(self, path: Optional[str] = None):
+        """
+        Initialize the memory.
+
+        Args:
+            path (str, optional): SQLite database file. The memory is
+                disabled when no path is given.
+        """
+        self.path = path
+        self.enabled = bool(path)
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            directory = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS segments ("
+                "key TEXT PRIMARY KEY, scope TEXT NOT NULL, "
+                "head TEXT NOT NULL, source TEXT NOT NULL, "
+                "translation_1 TEXT NOT NULL, reflection TEXT NOT NULL, "
+                "translation_2 TEXT NOT NULL, created REAL NOT NULL)"
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS segments_head "
+                "ON segments (scope, head)"
+            )
+            # The lengths of the heads stored per scope, so split() only
+            # looks up the substrings of a text that could be heads
+            has_lengths = self._conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE name = 'head_lengths'"
+            ).fetchone()
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS head_lengths ("
+                "scope TEXT NOT NULL, length INTEGER NOT NULL, "
+                "PRIMARY KEY (scope, length)) WITHOUT ROWID"
+            )
+            if not has_lengths:
+                # A memory written before the table existed
+                self._conn.execute(
+                    "INSERT OR IGNORE INTO head_lengths (scope, length) "
+                    "SELECT DISTINCT scope, length(head) FROM segments"
+                )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS bands ("
+                "bucket INTEGER NOT NULL, key TEXT NOT NULL, "
+                "PRIMARY KEY (bucket, key)) WITHOUT ROWID"
+            )
+            self._conn.commit()
+        return self._conn
+
+    @staticmethod
+    def make_scope(
+        source_lang: str, target_lang: str, country: str, model: str
+    ) -> str:
+        """
+        Hash the settings a translation depends on, besides the source text.
+
+        Segments are only reused within the same scope.
+        """
+        payload = json.dumps(
+            [source_lang, target_lang, country, model], ensure_ascii=False
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def _key(scope: str, source: str) -> str:
+        payload = json.dumps([scope, source], ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, scope: str, source: str) -> Optional[StoredTranslation]:
+        """
+        Look up the stored translation of a chunk.
+
+        Args:
+            scope (str): make_scope of the translation settings.
+            source (str): The chunk's source text.
+
+        Returns:
+            StoredTranslation or None: The stored stages, if any.
+        """
+        if not self.enabled:
+            return None
+        with self._lock:
+            row = (
+                self._connection()
+                .execute(
+                    "SELECT translation_1, reflection, translation_2 "
+                    "FROM segments WHERE key = ?",
+                    (self._key(scope, source),),
+                )
+                .fetchone()
+            )
+        return StoredTranslation(*row) if row else None
+
+    def put(
+        self,
+        scope: str,
+        source: str,
+        translation_1: str,
+        reflection: str,
+        translation_2: str,
+    ) -> None:
+        """
+        Store the translation of a chunk.
+
+        Args:
+            scope (str): make_scope of the translation settings.
+            source (str): The chunk's source text.
+            translation_1 (str): Its initial translation.
+            reflection (str): The suggestions made for it.
+            translation_2 (str): Its final translation.
+        """
+        if not self.enabled:
+            return
+        key = self._key(scope, source)
+        head = source[:HEAD_CHARS]
+        buckets = _band_buckets(scope, minhash(ngrams(source)))
+        with self._lock:
+            conn = self._connection()
+            conn.executemany(
+                "INSERT OR IGNORE INTO bands (bucket, key) VALUES (?, ?)",
+                [(bucket, key) for bucket in buckets],
+            )
+            conn.execute(
+                "INSERT OR IGNORE INTO head_lengths (scope, length) "
+                "VALUES (?, ?)",
+                (scope, len(head)),
+            )
+            conn.execute(
+                "INSERT OR REPLACE INTO segments (key, scope, head, source, "
+                "translation_1, reflection, translation_2, created) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    key,
+                    scope,
+                    head,
+                    source,
+                    translation_1,
+                    reflection,
+                    translation_2,
+                    time.time(),
+                ),
+            )
+            conn.commit()
+
+    def similar(
+        self,
+        scope: str,
+        source: str,
+        min_similarity: float = MEMORY_EXAMPLE_SIMILARITY,
+        limit: int = 3,
+    ) -> List[FuzzyMatch]:
+        """
+        Find stored texts similar to a text.
+
+        Similarity is the Jaccard similarity of the character n-gram sets,
+        ignoring case and spacing. Texts below about 0.5 are rarely found
+        even when min_similarity is lower.
+
+        Args:
+            scope (str): make_scope of the translation settings.
+            source (str): The text to look up.
+            min_similarity (float): The lowest similarity returned.
+            limit (int): The most matches returned.
+
+        Returns:
+            List[FuzzyMatch]: The matches, most similar first.
+        """
+        if not self.enabled:
+            return []
+        grams = ngrams(source)
+        buckets = _band_buckets(scope, minhash(grams))
+        # The texts sharing the most bands are the most similar ones; only
+        # a few of them are compared in full
+        with self._lock:
+            rows = (
+                self._connection()
+                .execute(
+                    "SELECT source, translation_2 FROM segments JOIN "
+                    "(SELECT key, COUNT(*) AS shared FROM bands "
+                    f"WHERE bucket IN ({', '.join('?' * len(buckets))}) "
+                    "GROUP BY key ORDER BY shared DESC LIMIT ?) "
+                    "USING (key)",
+                    (*buckets, CANDIDATES_PER_MATCH * limit),
+                )
+                .fetchall()
+            )
+
+        matches = [
+            FuzzyMatch(text, translation, similarity(grams, ngrams(text)))
+            for text, translation in rows
+        ]
+        matches = [m for m in matches if m.similarity >= min_similarity]
+        matches.sort(key=lambda match: -match.similarity)
+        return matches[:limit]
+
+    def _heads(self, scope: str, text: str, starts: List[int]) -> Set[str]:
+        """Find the stored heads that occur in text at any of the starts."""
+        heads: Set[str] = set()
+        with self._lock:
+            conn = self._connection()
+            lengths = [
+                length
+                for (length,) in conn.execute(
+                    "SELECT length FROM head_lengths WHERE scope = ?",
+                    (scope,),
+                )
+            ]
+            candidates = {
+                text[start : start + n]
+                for start in starts
+                for n in lengths
+                if start + n <= len(text)
+            }
+            candidates = sorted(candidates)
+            for i in range(0, len(candidates), HEAD_LOOKUP_BATCH):
+                batch = candidates[i : i + HEAD_LOOKUP_BATCH]
+                heads.update(
+                    head
+                    for (head,) in conn.execute(
+                        "SELECT DISTINCT head FROM segments WHERE scope = ? "
+                        f"AND head IN ({', '.join('?' * len(batch))})",
+                        (scope, *batch),
+                    )
+                )
+        return heads
+
+    def _match(
+        self,
+        scope: str,
+        text: str,
+        start: int,
+        heads: Set[str],
+        lengths: Set[int],
+    ) -> Optional[Segment]:
+        candidates = [
+            text[start : start + n] for n in lengths if start + n <= len(text)
+        ]
+        candidates = [head for head in candidates if head in heads]
+        if not candidates:
+            return None
+
+        with self._lock:
+            conn = self._connection()
+            rows = []
+            for head in candidates:
+                rows += conn.execute(
+                    "SELECT source, translation_1, reflection, translation_2 "
+                    "FROM segments WHERE scope = ? AND head = ?",
+                    (scope, head),
+                ).fetchall()
+        # Prefer the longest stored chunk the text continues with
+        for source, *stages in sorted(rows, key=lambda row: -len(row[0])):
+            if text.startswith(source, start):
+                return Segment(source, StoredTranslation(*stages))
+        return None
+
+    def split(
+        self, text: Union[str, TokenizedText], scope: str, max_tokens: int
+    ) -> List[Segment]:
+        """
+        Split a text into chunks, reusing the stored ones it contains.
+
+        Stored chunks are matched at the start of the text and after
+        whitespace, leftmost first. The text between two matches is split
+        with chunker.chunk_text and has no stored translation; text that is
+        only whitespace is passed through as its own translation. Joining
+        the segment texts gives back the text.
+
+        Args:
+            text (str or TokenizedText): The text to split. A TokenizedText
+                is not encoded again if none of it was stored.
+            scope (str): make_scope of the translation settings.
+            max_tokens (int): The maximum number of tokens per new chunk.
+
+        Returns:
+            List[Segment]: The chunks, in order.
+        """
+        tokenized = text if isinstance(text, TokenizedText) else None
+        if tokenized is not None:
+            text = tokenized.text
+        starts = [0] + [m.end() for m in _SEGMENT_STARTS.finditer(text)]
+        heads = self._heads(scope, text, starts) if self.enabled else set()
+        segments: List[Segment] = []
+
+        def add_gap(gap: Union[str, TokenizedText]) -> None:
+            gap_text = gap.text if isinstance(gap, TokenizedText) else gap
+            if not gap_text:
+                return
+            if not gap_text.strip():
+                stored = StoredTranslation(gap_text, "", gap_text)
+                segments.append(Segment(gap_text, stored))
+                return
+            segments.extend(
+                Segment(chunk.text, None)
+                for chunk in chunk_text(gap, max_tokens)
+            )
+
+        # Heads of segments shorter than HEAD_CHARS are shorter too
+        lengths = {len(h) for h in heads}
+        gap_start = 0
+        if heads:
+            for start in starts:
+                if start < gap_start or start == len(text):
+                    continue
+                match = self._match(scope, text, start, heads, lengths)
+                if match is None:
+                    continue
+                add_gap(text[gap_start:start])
+                segments.append(match)
+                gap_start = start + len(match.text)
+        if gap_start == 0 and tokenized is not None:
+            add_gap(tokenized)
+        else:
+            add_gap(text[gap_start:])
+        return segments
+
+    def close(self) -> None:
+        """Close the database connection."""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def __enter__(self) -> "TranslationMemory":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+# Global memory used by translate(), disabled unless TRANSLATION_MEMORY_PATH is set
+translation_memory = TranslationMemory(MEMORY_PATH)
@@ -2,90 +2,483 @@
 Ollama client for translation agent.
 Provides utilities for interacting with Ollama models.
 """
-import os
+
 import json
+import logging
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Iterator, List, Optional, TypeVar
+
 import requests
-from typing import List, Dict, Any, Optional
-from icecream import ic
+from requests.adapters import HTTPAdapter
+
+from .cache import CompletionCache, completion_cache
+from .config import (
+    MODEL_CHECK_TTL,
+    OLLAMA_CONNECT_TIMEOUT,
+    OLLAMA_HEDGE_URL,
+    OLLAMA_KEEP_ALIVE,
+    OLLAMA_POOL_SIZE,
+    OLLAMA_READ_TIMEOUT,
+    get_model_options,
+)
+from .retry import Hedger, RetryPolicy
+from .tracing import active_span
+
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class OllamaError(Exception):
+    """
+    A failed Ollama request.
+
+    retryable is True when the same request may succeed if sent again:
+    after a timeout, a dropped connection or a 429 or 5xx response.
+    """
+
+    def __init__(self, message: str, retryable: bool = False):
+        super().__init__(message)
+        self.retryable = retryable
+
+
+def is_transient(error: requests.exceptions.RequestException) -> bool:
+    """Return whether a failed request is worth sending again."""
+    if isinstance(
+        error,
+        (
+            requests.exceptions.ConnectionError,
+            requests.exceptions.Timeout,
+            requests.exceptions.ChunkedEncodingError,
+        ),
+    ):
+        return True
+    response = getattr(error, "response", None)
+    return response is not None and (
+        response.status_code == 429 or response.status_code >= 500
+    )
+
+
+def make_session(pool_size: int = OLLAMA_POOL_SIZE) -> requests.Session:
+    """
+    Create a requests session with a keep-alive connection pool.
+
+    Args:
+        pool_size (int): Maximum number of connections kept open per host.
+            Should match the number of concurrent requests.
+
+    Returns:
+        requests.Session: The session
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=1, pool_maxsize=pool_size, pool_block=True
+    )
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def chat_messages(system: Optional[str], prompt: str) -> List[Dict[str, str]]:
+    """
+    Build the /api/chat messages for a system message and a prompt.
+
+    Args:
+        system (str, optional): System message
+        prompt (str): User prompt
+
+    Returns:
+        List[Dict[str, str]]: The messages, system message first
+    """
+    messages = []
+    if system:
+        messages.append({"role": "system", "content": system})
+    messages.append({"role": "user", "content": prompt})
+    return messages
+
+
+def request_options(model: str, temperature: float) -> Dict[str, Any]:
+    """
+    Build the "options" of a generation request.
+
+    Args:
+        model (str): Model name; its num_ctx and num_predict settings from
+            MODEL_CONFIGS are included
+        temperature (float): Temperature for sampling
+
+    Returns:
+        Dict[str, Any]: The options
+    """
+    options = {"temperature": temperature, "top_p": 1.0}
+    options.update(get_model_options(model))
+    return options
+
+
+def response_text(result: Dict[str, Any]) -> str:
+    """Return the generated text of an /api/generate or /api/chat response."""
+    if "message" in result:
+        return result["message"].get("content", "")
+    return result.get("response", "")
+
+
+def _messages_key(messages: List[Dict[str, str]]) -> str:
+    return json.dumps(messages, ensure_ascii=False, sort_keys=True)
 
 
 class OllamaClient:
     """Client for interacting with Ollama API."""
-    
-    def __init__(self, base_url: str = None):
+
+    def __init__(
+        self,
+        base_url: str = None,
+        cache: Optional[CompletionCache] = None,
+        pool_size: int = OLLAMA_POOL_SIZE,
+        connect_timeout: float = OLLAMA_CONNECT_TIMEOUT,
+        read_timeout: float = OLLAMA_READ_TIMEOUT,
+        keep_alive: Optional[Any] = OLLAMA_KEEP_ALIVE,
+        retry_policy: Optional[RetryPolicy] = None,
+    ):
         """
         Initialize Ollama client.
-        
+
         Args:
             base_url (str): Base URL for Ollama API. Defaults to http://localhost:11434
+            cache (CompletionCache, optional): Cache consulted by generate before calling the API
+            pool_size (int): Number of keep-alive connections to the server
+            connect_timeout (float): Seconds to wait for a connection
+            read_timeout (float): Seconds to wait for a generation response
+            keep_alive (optional): How long the server keeps a model loaded
+                after each request, e.g. "30m" or -1. None leaves the
+                server's default.
+            retry_policy (RetryPolicy, optional): When failed generations
+                are sent again. Defaults to the OLLAMA_RETRY_* settings.
         """
-        self.base_url = base_url or os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
-        
+        self.base_url = base_url or os.getenv(
+            "OLLAMA_BASE_URL", "http://localhost:11434"
+        )
+        self.cache = cache
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.keep_alive = keep_alive
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.session = make_session(pool_size)
+
+    def close(self) -> None:
+        """Close the pooled connections."""
+        self.session.close()
+
     def list_models(self) -> List[Dict[str, Any]]:
         """
         Get list of available models from Ollama.
-        
+
         Returns:
             List[Dict]: List of available models with their metadata
         """
         try:
-            response = requests.get(f"{self.base_url}/api/tags", timeout=30)
+            response = self.session.get(
+                f"{self.base_url}/api/tags", timeout=(self.connect_timeout, 30)
+            )
             response.raise_for_status()
-            
+
             result = response.json()
             return result.get("models", [])
-            
+
         except requests.exceptions.RequestException as e:
-            ic(f"Error fetching Ollama models: {e}")
+            logger.warning("Error fetching Ollama models: %s", e)
             return []
-    
+
     def get_model_names(self) -> List[str]:
         """
         Get list of model names.
-        
+
         Returns:
             List[str]: List of model names
         """
         models = self.list_models()
         return [model.get("name", "") for model in models if model.get("name")]
-    
+
     def pull_model(self, model_name: str) -> bool:
         """
         Pull a model from Ollama registry.
-        
+
         Args:
             model_name (str): Name of the model to pull
-            
+
         Returns:
             bool: True if successful, False otherwise
         """
         try:
             payload = {"name": model_name}
-            response = requests.post(
+            response = self.session.post(
                 f"{self.base_url}/api/pull",
                 json=payload,
-                timeout=300  # 5 minutes timeout for model pulling
+                timeout=(
+                    self.connect_timeout,
+                    300,
+                ),  # 5 minutes timeout for model pulling
             )
             response.raise_for_status()
             return True
-            
+
         except requests.exceptions.RequestException as e:
-            ic(f"Error pulling model {model_name}: {e}")
+            logger.warning("Error pulling model %s: %s", model_name, e)
             return False
-    
+
     def is_model_available(self, model_name: str) -> bool:
         """
         Check if a model is available locally.
-        
+
         Args:
             model_name (str): Name of the model to check
-            
+
         Returns:
             bool: True if model is available, False otherwise
         """
         available_models = self.get_model_names()
         return model_name in available_models
-    
+
+    def _generate_payload(
+        self,
+        model: str,
+        prompt: str,
+        system: Optional[str],
+        temperature: float,
+        format: Optional[str],
+        stream: bool,
+    ) -> Dict[str, Any]:
+        payload = {
+            "model": model,
+            "prompt": prompt,
+            "stream": stream,
+            "options": request_options(model, temperature),
+        }
+        if self.keep_alive is not None:
+            payload["keep_alive"] = self.keep_alive
+
+        # Ollama places the system message with the model's own template
+        if system:
+            payload["system"] = system
+        if format:
+            payload["format"] = format
+        return payload
+
+    def _chat_payload(
+        self,
+        model: str,
+        messages: List[Dict[str, str]],
+        temperature: float,
+        format: Optional[str],
+        stream: bool,
+    ) -> Dict[str, Any]:
+        payload = {
+            "model": model,
+            "messages": messages,
+            "stream": stream,
+            "options": request_options(model, temperature),
+        }
+        if self.keep_alive is not None:
+            payload["keep_alive"] = self.keep_alive
+
+        if format:
+            payload["format"] = format
+        return payload
+
+    def load_model(self, model: str) -> bool:
+        """
+        Load a model into the server's memory without generating anything.
+
+        The model stays loaded for the client's keep_alive, so the first
+        chunk of a job does not wait for it to load.
+
+        Args:
+            model (str): Model name to load
+
+        Returns:
+            bool: True if the model was loaded, False otherwise
+        """
+        payload = {"model": model, "options": get_model_options(model)}
+        if self.keep_alive is not None:
+            payload["keep_alive"] = self.keep_alive
+        try:
+            response = self.session.post(
+                f"{self.base_url}/api/generate",
+                json=payload,
+                timeout=(self.connect_timeout, self.read_timeout),
+            )
+            response.raise_for_status()
+            return True
+
+        except requests.exceptions.RequestException as e:
+            logger.warning("Error loading model %s: %s", model, e)
+            return False
+
+    def unload_model(self, model: str) -> bool:
+        """
+        Ask the server to free the memory of a model now.
+
+        Args:
+            model (str): Model name to unload
+
+        Returns:
+            bool: True if the server accepted the request, False otherwise
+        """
+        try:
+            response = self.session.post(
+                f"{self.base_url}/api/generate",
+                json={"model": model, "keep_alive": 0},
+                timeout=(self.connect_timeout, 30),
+            )
+            response.raise_for_status()
+            return True
+
+        except requests.exceptions.RequestException as e:
+            logger.warning("Error unloading model %s: %s", model, e)
+            return False
+
+    def _cache_key(
+        self,
+        use_cache: bool,
+        model: str,
+        system: Optional[str],
+        prompt: str,
+        temperature: float,
+        format: Optional[str],
+    ) -> Optional[str]:
+        if use_cache and self.cache is not None and self.cache.enabled:
+            return self.cache.make_key(
+                model, system, prompt, temperature, format
+            )
+        return None
+
+    def _post(
+        self, path: str, payload: Dict[str, Any], cache_key: Optional[str]
+    ) -> str:
+        """Send a non-streaming request and return the generated text."""
+        if cache_key is not None:
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                return cached
+
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                result = self._post_once(path, payload)
+                break
+            except OllamaError as e:
+                delay = self.retry_policy.next_delay(attempt, e)
+                if delay is None:
+                    raise
+                time.sleep(delay)
+
+        text = response_text(result)
+        span = active_span()
+        if span is not None:
+            span.record_response(result)
+        if cache_key is not None:
+            self.cache.set(cache_key, text)
+        return text
+
+    def _post_once(self, path: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+        try:
+            response = self.session.post(
+                f"{self.base_url}{path}",
+                json=payload,
+                timeout=(self.connect_timeout, self.read_timeout),
+            )
+            response.raise_for_status()
+            return response.json()
+
+        except requests.exceptions.RequestException as e:
+            logger.debug("Error generating text with Ollama: %s", e)
+            raise OllamaError(
+                f"Failed to generate text: {e}", is_transient(e)
+            ) from e
+        except json.JSONDecodeError as e:
+            logger.debug("Error parsing Ollama response: %s", e)
+            raise OllamaError(f"Invalid JSON response: {e}") from e
+
+    def _post_stream(
+        self, path: str, payload: Dict[str, Any], cache_key: Optional[str]
+    ) -> Iterator[str]:
+        """
+        Send a streaming request and yield the text of each NDJSON line.
+
+        A failed request is retried only if nothing was yielded yet.
+        """
+        if cache_key is not None:
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                yield cached
+                return
+
+        pieces = []
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                for piece in self._post_stream_once(path, payload):
+                    pieces.append(piece)
+                    yield piece
+                break
+            except OllamaError as e:
+                delay = (
+                    None
+                    if pieces
+                    else self.retry_policy.next_delay(attempt, e)
+                )
+                if delay is None:
+                    raise
+                time.sleep(delay)
+
+        # Only a completed generation is cached
+        if cache_key is not None:
+            self.cache.set(cache_key, "".join(pieces))
+
+    def _post_stream_once(
+        self, path: str, payload: Dict[str, Any]
+    ) -> Iterator[str]:
+        span = active_span()
+        try:
+            with self.session.post(
+                f"{self.base_url}{path}",
+                json=payload,
+                timeout=(self.connect_timeout, self.read_timeout),
+                stream=True,
+            ) as response:
+                response.raise_for_status()
+
+                for line in response.iter_lines():
+                    if not line:
+                        continue
+                    result = json.loads(line)
+                    if "error" in result:
+                        raise OllamaError(
+                            f"Failed to generate text: {result['error']}"
+                        )
+                    piece = response_text(result)
+                    if piece:
+                        if span is not None:
+                            span.mark_first_token()
+                        yield piece
+                    if result.get("done"):
+                        # The last line carries the token counts and timings
+                        if span is not None:
+                            span.record_response(result)
+                        break
+
+        except requests.exceptions.RequestException as e:
+            logger.debug("Error generating text with Ollama: %s", e)
+            raise OllamaError(
+                f"Failed to generate text: {e}", is_transient(e)
+            ) from e
+        except json.JSONDecodeError as e:
+            logger.debug("Error parsing Ollama response: %s", e)
+            raise OllamaError(f"Invalid JSON response: {e}") from e
+
     def generate(
         self,
         model: str,
@@ -93,61 +486,271 @@ class OllamaClient:
         system: Optional[str] = None,
         temperature: float = 0.3,
         format: Optional[str] = None,
-        stream: bool = False
+        stream: bool = False,
+        use_cache: bool = True,
     ) -> str:
         """
-        Generate text using Ollama API.
-        
+        Generate text using Ollama's /api/generate endpoint.
+
         Args:
             model (str): Model name to use
             prompt (str): Input prompt
             system (str, optional): System message
             temperature (float): Temperature for sampling
             format (str, optional): Response format (e.g., "json")
-            stream (bool): Whether to stream the response
-            
+            stream (bool): Whether to stream the response. The streamed
+                tokens are joined, see generate_stream to consume them one by one
+            use_cache (bool): Whether to consult and fill the client's cache
+
         Returns:
             str: Generated text
         """
-        if system:
-            full_prompt = f"System: {system}\\n\\nUser: {prompt}\\n\\nAssistant:"
-        else:
-            full_prompt = prompt
-            
-        payload = {
-            "model": model,
-            "prompt": full_prompt,
-            "stream": stream,
-            "options": {
-                "temperature": temperature,
-                "top_p": 1.0
-            }
-        }
-        
-        if format:
-            payload["format"] = format
-        
-        try:
-            response = requests.post(
-                f"{self.base_url}/api/generate",
-                json=payload,
-                timeout=120
+        if stream:
+            return "".join(
+                self.generate_stream(
+                    model, prompt, system, temperature, format, use_cache
+                )
             )
-            response.raise_for_status()
-            
-            result = response.json()
-            return result.get("response", "")
-            
-        except requests.exceptions.RequestException as e:
-            ic(f"Error generating text with Ollama: {e}")
-            raise Exception(f"Failed to generate text: {e}")
-        except json.JSONDecodeError as e:
-            ic(f"Error parsing Ollama response: {e}")
-            raise Exception(f"Invalid JSON response: {e}")
+
+        cache_key = self._cache_key(
+            use_cache, model, system, prompt, temperature, format
+        )
+        payload = self._generate_payload(
+            model, prompt, system, temperature, format, stream=False
+        )
+        return self._post("/api/generate", payload, cache_key)
+
+    def generate_stream(
+        self,
+        model: str,
+        prompt: str,
+        system: Optional[str] = None,
+        temperature: float = 0.3,
+        format: Optional[str] = None,
+        use_cache: bool = True,
+    ) -> Iterator[str]:
+        """
+        Generate text using Ollama API, yielding tokens as they are produced.
+
+        Ollama streams one JSON object per line; the text of each is yielded
+        as soon as the line arrives. The read timeout applies between lines,
+        not to the whole generation.
+
+        Args:
+            model (str): Model name to use
+            prompt (str): Input prompt
+            system (str, optional): System message
+            temperature (float): Temperature for sampling
+            format (str, optional): Response format (e.g., "json")
+            use_cache (bool): Whether to consult and fill the client's cache.
+                A cached completion is yielded in one piece.
+
+        Yields:
+            str: Pieces of the generated text
+        """
+        cache_key = self._cache_key(
+            use_cache, model, system, prompt, temperature, format
+        )
+        payload = self._generate_payload(
+            model, prompt, system, temperature, format, stream=True
+        )
+        return self._post_stream("/api/generate", payload, cache_key)
+
+    def chat(
+        self,
+        model: str,
+        messages: List[Dict[str, str]],
+        temperature: float = 0.3,
+        format: Optional[str] = None,
+        stream: bool = False,
+        use_cache: bool = True,
+    ) -> str:
+        """
+        Generate the assistant's reply using Ollama's /api/chat endpoint.
+
+        The messages are rendered with the model's own chat template. Keep
+        the parts shared by many calls (system message, document context)
+        at the start of the conversation: Ollama reuses the cached
+        evaluation of a prompt prefix it has already seen.
+
+        Args:
+            model (str): Model name to use
+            messages (List[Dict[str, str]]): Conversation as "role" and
+                "content" pairs, see chat_messages
+            temperature (float): Temperature for sampling
+            format (str, optional): Response format (e.g., "json")
+            stream (bool): Whether to stream the response. The streamed
+                tokens are joined, see chat_stream to consume them one by one
+            use_cache (bool): Whether to consult and fill the client's cache
+
+        Returns:
+            str: Content of the assistant's reply
+        """
+        if stream:
+            return "".join(
+                self.chat_stream(
+                    model, messages, temperature, format, use_cache
+                )
+            )
+
+        cache_key = self._cache_key(
+            use_cache,
+            model,
+            None,
+            _messages_key(messages),
+            temperature,
+            format,
+        )
+        payload = self._chat_payload(
+            model, messages, temperature, format, stream=False
+        )
+        return self._post("/api/chat", payload, cache_key)
+
+    def chat_stream(
+        self,
+        model: str,
+        messages: List[Dict[str, str]],
+        temperature: float = 0.3,
+        format: Optional[str] = None,
+        use_cache: bool = True,
+    ) -> Iterator[str]:
+        """
+        Stream the assistant's reply from /api/chat as it is produced.
+
+        Args:
+            model (str): Model name to use
+            messages (List[Dict[str, str]]): Conversation as "role" and
+                "content" pairs, see chat_messages
+            temperature (float): Temperature for sampling
+            format (str, optional): Response format (e.g., "json")
+            use_cache (bool): Whether to consult and fill the client's cache.
+                A cached completion is yielded in one piece.
+
+        Yields:
+            str: Pieces of the assistant's reply
+        """
+        cache_key = self._cache_key(
+            use_cache,
+            model,
+            None,
+            _messages_key(messages),
+            temperature,
+            format,
+        )
+        payload = self._chat_payload(
+            model, messages, temperature, format, stream=True
+        )
+        return self._post_stream("/api/chat", payload, cache_key)
+
+
+class ModelRegistry:
+    """
+    Caches which models are available on the Ollama server.
+
+    The model list is fetched from /api/tags at most once per TTL instead of
+    before every generation. When the TTL expires the list is fetched again,
+    so a model removed from the server is noticed, and invalidate() forces a
+    fresh check, e.g. after a generation failed.
+    """
+
+    def __init__(self, client: OllamaClient, ttl: float = MODEL_CHECK_TTL):
+        """
+        Initialize the registry.
+
+        Args:
+            client (OllamaClient): Client used to list and pull models
+            ttl (float): Seconds a fetched model list stays valid
+        """
+        self.client = client
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._models: Optional[set] = None
+        self._fetched_at = 0.0
+
+    def _model_names(self, refresh: bool = False) -> set:
+        with self._lock:
+            expired = time.monotonic() - self._fetched_at > self.ttl
+            if refresh or self._models is None or expired:
+                names = set(self.client.get_model_names())
+                # An empty list usually means the server could not be
+                # reached, so it is not cached
+                if names:
+                    self._models = names
+                    self._fetched_at = time.monotonic()
+                else:
+                    self._models = None
+                return names
+            return self._models
+
+    def is_available(self, model_name: str, refresh: bool = False) -> bool:
+        """
+        Check if a model is available, using the cached model list.
+
+        Args:
+            model_name (str): Name of the model to check
+            refresh (bool): Fetch the model list even if the cached one is still valid
+
+        Returns:
+            bool: True if model is available, False otherwise
+        """
+        return model_name in self._model_names(refresh)
+
+    def is_cached(self, model_name: str) -> bool:
+        """
+        Check the cached model list only, without waiting for the server.
+
+        Args:
+            model_name (str): Name of the model to check
+
+        Returns:
+            bool: True if the model is in a model list that is still valid.
+                False means is_available has to ask the server.
+        """
+        # Read without the lock, which is held while the list is fetched
+        models, fetched_at = self._models, self._fetched_at
+        if models is None or time.monotonic() - fetched_at > self.ttl:
+            return False
+        return model_name in models
+
+    def invalidate(self) -> None:
+        """Forget the cached model list so the next check asks the server."""
+        with self._lock:
+            self._models = None
+
+    def ensure(self, model_name: str, refresh: bool = False) -> bool:
+        """
+        Ensure a model is available, pull if necessary.
+
+        Args:
+            model_name (str): Name of the model
+            refresh (bool): Fetch the model list even if the cached one is still valid
+
+        Returns:
+            bool: True if the model is available, False otherwise
+        """
+        if self.is_available(model_name, refresh):
+            return True
+
+        logger.info(
+            "Model %s not found locally, attempting to pull...", model_name
+        )
+        pulled = self.client.pull_model(model_name)
+        if pulled:
+            self.invalidate()
+        return pulled
 
 
 # Global client instance
-ollama_client = OllamaClient()
+ollama_client = OllamaClient(cache=completion_cache)
+
+# Backup server for hedged completions, see hedged
+hedge_client = (
+    OllamaClient(base_url=OLLAMA_HEDGE_URL) if OLLAMA_HEDGE_URL else None
+)
+hedger = Hedger()
+
+# Global model availability registry
+model_registry = ModelRegistry(ollama_client)
 
 
 def get_available_models() -> List[str]:
@@ -155,10 +758,59 @@ def get_available_models() -> List[str]:
     return ollama_client.get_model_names()
 
 
-def ensure_model_available(model_name: str) -> bool:
+def ensure_model_available(model_name: str, refresh: bool = False) -> bool:
     """Ensure a model is available, pull if necessary."""
-    if ollama_client.is_model_available(model_name):
-        return True
-    
-    ic(f"Model {model_name} not found locally, attempting to pull...")
-    return ollama_client.pull_model(model_name)
\ No newline at end of file
+    return model_registry.ensure(model_name, refresh)
+
+
+def hedged(call: Callable[[OllamaClient], T]) -> T:
+    """
+    Make a request to the Ollama server, hedged with OLLAMA_HEDGE_URL.
+
+    Without a hedge server this is call(ollama_client). With one, the same
+    call is made to it as well when the first is slower than
+    OLLAMA_HEDGE_QUANTILE of recent calls, and the first answer is used.
+
+    Args:
+        call (Callable[[OllamaClient], T]): Makes the request with a client.
+
+    Returns:
+        The result of the call that answered first.
+    """
+    if hedge_client is None:
+        return call(ollama_client)
+    return hedger.call(lambda: call(ollama_client), lambda: call(hedge_client))
+
+
+def warm_up_model(model_name: str) -> None:
+    """
+    Check once, against the server, that a model is available before a job
+    starts, and load it so the first chunk does not wait for it.
+
+    Args:
+        model_name (str): Name of the model
+
+    Raises:
+        Exception: If the model is not available and could not be pulled
+    """
+    if not ensure_model_available(model_name, refresh=True):
+        raise Exception(
+            f"Model {model_name} is not available and could not be pulled"
+        )
+    # Not fatal: the first generation loads the model anyway
+    ollama_client.load_model(model_name)
+    if hedge_client is not None:
+        hedge_client.load_model(model_name)
+
+
+def unload_model(model_name: str) -> None:
+    """
+    Free the server's memory of a model once a job is done, instead of
+    keeping it loaded for OLLAMA_KEEP_ALIVE.
+
+    Args:
+        model_name (str): Name of the model
+    """
+    ollama_client.unload_model(model_name)
+    if hedge_client is not None:
+        hedge_client.unload_model(model_name)
@@ -0,0 +1,188 @@
+"""
+Retries and hedged requests for completion calls.
+
+A RetryPolicy decides whether a failed request is sent again and how long
+to wait first: exponential backoff with full jitter, so requests that
+failed together do not all come back at the same moment. Only errors
+marked retryable are retried (timeouts, dropped connections, 429 and 5xx
+responses); a bad request fails the same way every time.
+
+A Hedger sends a duplicate of a slow request to a second backend. A
+request still running after the given quantile of recent latencies (p95 by
+default) is sent again, and whichever answer comes first is used.
+"""
+
+import concurrent.futures
+import contextvars
+import logging
+import random
+import threading
+import time
+from collections import deque
+from typing import Callable, Optional, TypeVar
+
+from .config import (
+    MAX_CONCURRENT_REQUESTS,
+    OLLAMA_HEDGE_QUANTILE,
+    OLLAMA_RETRY_ATTEMPTS,
+    OLLAMA_RETRY_BASE_DELAY,
+    OLLAMA_RETRY_MAX_DELAY,
+)
+
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class RetryPolicy:
+    """How often, and after how long, a failed request is sent again."""
+
+    def __init__(
+        self,
+        attempts: int = OLLAMA_RETRY_ATTEMPTS,
+        base_delay: float = OLLAMA_RETRY_BASE_DELAY,
+        max_delay: float = OLLAMA_RETRY_MAX_DELAY,
+    ):
+        """
+        Initialize the policy.
+
+        Args:
+            attempts (int): Attempts per request, including the first. 1
+                disables retrying.
+            base_delay (float): Upper bound, in seconds, of the wait before
+                the first retry. It doubles with every further retry.
+            max_delay (float): Upper bound, in seconds, of any wait.
+        """
+        if attempts < 1:
+            raise ValueError("attempts must be at least 1")
+        self.attempts = attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def next_delay(self, attempt: int, error: Exception) -> Optional[float]:
+        """
+        Decide whether to retry after a failed attempt.
+
+        Args:
+            attempt (int): Number of the attempt that failed, from 1.
+            error (Exception): The error it failed with.
+
+        Returns:
+            float or None: Seconds to wait before the next attempt, or None
+                if the error should be raised.
+        """
+        if attempt >= self.attempts or not getattr(error, "retryable", False):
+            return None
+        cap = min(self.max_delay, self.base_delay * 2 ** (attempt - 1))
+        delay = random.uniform(0, cap)
+        logger.warning(
+            "Attempt %d failed, retrying in %.2fs: %s", attempt, delay, error
+        )
+        return delay
+
+
+class Hedger:
+    """
+    Sends a duplicate request to a backup when the primary is slow.
+
+    Latencies of successful primary calls are kept in a sliding window.
+    Until it holds min_samples of them no request is hedged.
+    """
+
+    def __init__(
+        self,
+        quantile: float = OLLAMA_HEDGE_QUANTILE,
+        min_samples: int = 20,
+        window: int = 200,
+        max_workers: int = 2 * MAX_CONCURRENT_REQUESTS,
+    ):
+        """
+        Initialize the hedger.
+
+        Args:
+            quantile (float): Latency quantile after which the backup is
+                called, e.g. 0.95.
+            min_samples (int): Latencies needed before hedging starts.
+            window (int): Number of recent latencies kept.
+            max_workers (int): Threads running primary and backup calls.
+                Should cover two calls for every request made at once.
+        """
+        self.quantile = quantile
+        self.min_samples = min_samples
+        self.max_workers = max_workers
+        self._latencies: "deque[float]" = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self._pool: Optional[concurrent.futures.ThreadPoolExecutor] = None
+
+    def record(self, latency: float) -> None:
+        """Add the latency of a successful primary call."""
+        with self._lock:
+            self._latencies.append(latency)
+
+    def hedge_delay(self) -> Optional[float]:
+        """Return how long to wait before calling the backup, if at all."""
+        with self._lock:
+            if len(self._latencies) < self.min_samples:
+                return None
+            latencies = sorted(self._latencies)
+        index = min(int(self.quantile * len(latencies)), len(latencies) - 1)
+        return latencies[index]
+
+    def _timed(self, fn: Callable[[], T]) -> T:
+        started = time.perf_counter()
+        result = fn()
+        self.record(time.perf_counter() - started)
+        return result
+
+    def _submit(
+        self, fn: Callable[..., T], *args
+    ) -> "concurrent.futures.Future[T]":
+        with self._lock:
+            if self._pool is None:
+                self._pool = concurrent.futures.ThreadPoolExecutor(
+                    max_workers=self.max_workers,
+                    thread_name_prefix="translation-agent-hedge",
+                )
+        # Keep the caller's trace stage and span in the worker thread
+        context = contextvars.copy_context()
+        return self._pool.submit(context.run, fn, *args)
+
+    def call(self, primary: Callable[[], T], backup: Callable[[], T]) -> T:
+        """
+        Call primary, and backup as well if primary is slow.
+
+        Args:
+            primary (Callable): The request to the primary backend.
+            backup (Callable): The same request to the backup backend.
+
+        Returns:
+            The first successful result.
+
+        Raises:
+            Exception: The error of primary if it fails before the hedge
+                delay, otherwise the last error once both calls failed.
+        """
+        delay = self.hedge_delay()
+        if delay is None:
+            return self._timed(primary)
+
+        first = self._submit(self._timed, primary)
+        try:
+            return first.result(timeout=delay)
+        except concurrent.futures.TimeoutError:
+            pass
+
+        logger.debug("Request slower than %.2fs, hedging", delay)
+        pending = {first, self._submit(backup)}
+        error: Optional[BaseException] = None
+        while pending:
+            done, pending = concurrent.futures.wait(
+                pending, return_when=concurrent.futures.FIRST_COMPLETED
+            )
+            for future in done:
+                if future.exception() is None:
+                    # The slower call finishes in the background
+                    return future.result()
+                error = future.exception()
+        raise error
@@ -0,0 +1,202 @@
+"""
+Review policies: which chunks are reflected on and improved.
+
+Every chunk normally costs three completions: the initial translation, a
+reflection on it and an improved translation. For headings, numbers, code
+or single words the last two rarely change anything. A review policy
+decides per chunk whether to run them, and counts how many it skipped.
+"""
+
+import re
+import threading
+from typing import Dict, Optional
+
+from .config import REVIEW_MIN_WORDS, REVIEW_POLICY
+
+
+# What the adaptive policy asks the reflection to answer when the
+# translation needs no change
+NO_SUGGESTIONS = "No suggestions."
+
+_NO_SUGGESTIONS = re.compile(
+    r"(no (suggestions|changes|improvements?|issues)"
+    r"( (are )?(needed|required|necessary))?|none)[.!]*",
+    re.IGNORECASE,
+)
+
+# Characters far more common in code and markup than in prose
+_CODE_CHARS = set("{}[]()<>=;_$#*|`\\/")
+
+
+class ReviewStats:
+    """Thread-safe count of the reflections and improvements run and skipped."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.chunks = 0
+        self.reflections = 0
+        self.improvements = 0
+
+    def record_review(self, reflect: bool) -> None:
+        """Count a chunk, and its reflection if it was run."""
+        with self._lock:
+            self.chunks += 1
+            self.reflections += reflect
+
+    def record_improvement(self, improve: bool) -> None:
+        """Count an improvement if it was run."""
+        with self._lock:
+            self.improvements += improve
+
+    @property
+    def skip_rate(self) -> float:
+        """Fraction of the reflection and improvement calls skipped."""
+        if not self.chunks:
+            return 0.0
+        calls = self.reflections + self.improvements
+        return 1 - calls / (2 * self.chunks)
+
+    def __str__(self) -> str:
+        summary = self.summary()
+        return (
+            f"skipped {summary['reflections_skipped']} reflections and "
+            f"{summary['improvements_skipped']} improvements of "
+            f"{summary['chunks']} chunks "
+            f"({summary['skip_rate']:.0%} of review calls)"
+        )
+
+    def summary(self) -> Dict[str, float]:
+        """Return the counts and the skip rate."""
+        with self._lock:
+            return {
+                "chunks": self.chunks,
+                "reflections_skipped": self.chunks - self.reflections,
+                "improvements_skipped": self.chunks - self.improvements,
+                "skip_rate": self.skip_rate,
+            }
+
+
+class ReviewPolicy:
+    """Base class deciding whether a chunk is reflected on and improved."""
+
+    # Appended to the reflection prompt
+    reflection_note = ""
+
+    def __init__(self, stats: Optional[ReviewStats] = None):
+        """
+        Initialize the policy.
+
+        Args:
+            stats (ReviewStats, optional): Where decisions are counted. A
+                new one is created if not given.
+        """
+        self.stats = stats if stats is not None else ReviewStats()
+
+    def should_reflect(self, source_text: str, translation_1: str) -> bool:
+        """
+        Decide whether to reflect on a chunk's initial translation.
+
+        Without a reflection, the initial translation is final.
+        """
+        return True
+
+    def should_improve(self, reflection: str) -> bool:
+        """
+        Decide whether to improve a translation given its reflection.
+
+        Without an improvement, the initial translation is final.
+        """
+        return True
+
+    def review(self, source_text: str, translation_1: str) -> bool:
+        """Call should_reflect and count the decision."""
+        reflect = self.should_reflect(source_text, translation_1)
+        self.stats.record_review(reflect)
+        if not reflect:
+            self.stats.record_improvement(False)
+        return reflect
+
+    def improve(self, reflection: str) -> bool:
+        """Call should_improve and count the decision."""
+        improve = self.should_improve(reflection)
+        self.stats.record_improvement(improve)
+        return improve
+
+
+class AlwaysReview(ReviewPolicy):
+    """Reflects on and improves every chunk, as the original workflow does."""
+
+
+class AdaptiveReview(ReviewPolicy):
+    """
+    Skips the review of trivial chunks and improvements nothing asks for.
+
+    A chunk is not reflected on if it has no letters (numbers, symbols),
+    looks like code, or has fewer than min_words words, unless its initial
+    translation looks wrong: empty or much longer than the source. The
+    reflection is asked to answer NO_SUGGESTIONS if the translation needs
+    no change, and then the improvement is skipped.
+    """
+
+    reflection_note = (
+        "\nIf the translation needs no improvement, output only: "
+        + NO_SUGGESTIONS
+    )
+
+    def __init__(
+        self,
+        min_words: int = REVIEW_MIN_WORDS,
+        stats: Optional[ReviewStats] = None,
+    ):
+        """
+        Initialize the policy.
+
+        Args:
+            min_words (int): Chunks with fewer words are not reviewed.
+            stats (ReviewStats, optional): Where decisions are counted.
+        """
+        super().__init__(stats)
+        self.min_words = min_words
+
+    def should_reflect(self, source_text: str, translation_1: str) -> bool:
+        translation = translation_1.strip()
+        if not translation or len(translation) > 3 * len(source_text) + 20:
+            return True
+        if not any(c.isalpha() for c in source_text):
+            return False
+        if len(source_text.split()) < self.min_words:
+            return False
+        return not _looks_like_code(source_text)
+
+    def should_improve(self, reflection: str) -> bool:
+        return not _NO_SUGGESTIONS.fullmatch(reflection.strip())
+
+
+def _looks_like_code(text: str) -> bool:
+    stripped = text.strip()
+    if stripped.startswith("```"):
+        return True
+    chars = [c for c in stripped if not c.isspace()]
+    code_chars = sum(c in _CODE_CHARS for c in chars)
+    return bool(chars) and code_chars / len(chars) > 0.1
+
+
+def get_review_policy(
+    name: str = REVIEW_POLICY, stats: Optional[ReviewStats] = None
+) -> ReviewPolicy:
+    """
+    Create a review policy by name, using the configured defaults.
+
+    Args:
+        name (str): "always" or "adaptive". Defaults to the
+            TRANSLATION_REVIEW_POLICY setting.
+        stats (ReviewStats, optional): Where decisions are counted.
+
+    Returns:
+        ReviewPolicy: The policy.
+    """
+    if name == "always":
+        return AlwaysReview(stats)
+    if name == "adaptive":
+        return AdaptiveReview(REVIEW_MIN_WORDS, stats)
+    raise ValueError(f"Unknown review policy {name!r}")
@@ -0,0 +1,106 @@
+"""
+Tokenization helpers.
+
+Loading a tiktoken encoding is expensive, so encodings are cached for the
+lifetime of the process. TokenizedText encodes a text once and keeps the
+tokens, so the same pass serves counting the tokens and splitting the text
+at token boundaries.
+"""
+
+import bisect
+import functools
+from typing import Any, List, Optional
+
+import tiktoken
+
+
+DEFAULT_ENCODING = "cl100k_base"
+
+
+@functools.lru_cache(maxsize=None)
+def get_encoding(encoding_name: str = DEFAULT_ENCODING) -> tiktoken.Encoding:
+    """
+    Get a tiktoken encoding, loading it only on first use.
+
+    Args:
+        encoding_name (str): Name of the encoding. Defaults to "cl100k_base".
+
+    Returns:
+        tiktoken.Encoding: The encoding.
+    """
+    return tiktoken.get_encoding(encoding_name)
+
+
+class TokenizedText:
+    """A text encoded once, with the character offset where each token starts."""
+
+    def __init__(self, text: str, encoding: Optional[Any] = None):
+        """
+        Encode a text.
+
+        Args:
+            text (str): The text to encode.
+            encoding (tiktoken.Encoding, optional): Encoding to use. Defaults to
+                the cached "cl100k_base" encoding.
+        """
+        if encoding is None:
+            encoding = get_encoding()
+        self.text = text
+        self.encoding = encoding
+        self.tokens: List[int] = encoding.encode(text)
+        self._offsets: Optional[List[int]] = None
+
+    def __len__(self) -> int:
+        return len(self.tokens)
+
+    @property
+    def offsets(self) -> List[int]:
+        """Character offset of the start of every token, computed on first use."""
+        if self._offsets is None:
+            _, self._offsets = self.encoding.decode_with_offsets(self.tokens)
+        return self._offsets
+
+    def char_offset(self, token_index: int) -> int:
+        """Return the character offset of a token, or the text length past the end."""
+        if token_index >= len(self.tokens):
+            return len(self.text)
+        return self.offsets[token_index]
+
+    def token_index(self, char_offset: int) -> int:
+        """Return the index of the first token starting at or after char_offset."""
+        return bisect.bisect_left(self.offsets, char_offset)
+
+    def token_at(self, char_offset: int) -> int:
+        """Return the index of the token containing char_offset."""
+        return max(bisect.bisect_right(self.offsets, char_offset) - 1, 0)
+
+    def count(self, start: int = 0, end: Optional[int] = None) -> int:
+        """
+        Count the tokens starting within text[start:end].
+
+        Args:
+            start (int): Start character offset.
+            end (int, optional): End character offset. Defaults to the end of the text.
+
+        Returns:
+            int: The number of tokens.
+        """
+        if end is None:
+            end = len(self.text)
+        return self.token_index(end) - self.token_index(start)
+
+
+def tokenize(
+    text: str, encoding_name: str = DEFAULT_ENCODING
+) -> TokenizedText:
+    """
+    Encode a text once with a cached encoding.
+
+    Args:
+        text (str): The text to encode.
+        encoding_name (str): Name of the encoding. Defaults to "cl100k_base".
+
+    Returns:
+        TokenizedText: The encoded text.
+    """
+    return TokenizedText(text, get_encoding(encoding_name))
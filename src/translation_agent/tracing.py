@@ -0,0 +1,270 @@
+"""
+Tracing of completion calls.
+
+Every call to the model is recorded as a Span, tagged with the pipeline
+stage and chunk it was made for, the model, token counts, latency and the
+timings Ollama reports for the generation. Finished spans are passed to the
+listeners registered on the tracer and kept in memory, so a run can be
+exported to JSON and the cost broken down by stage.
+
+The stage and chunk are taken from the surrounding trace_stage block, so
+code that makes completion calls does not have to pass them along.
+"""
+
+import contextlib
+import json
+import threading
+import time
+from collections import deque
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from .config import TRACE_MAX_SPANS
+
+
+# Ollama reports durations in nanoseconds
+NANOSECONDS = 1e9
+
+_stage: ContextVar[Tuple[Optional[str], Optional[int]]] = ContextVar(
+    "translation_agent_stage", default=(None, None)
+)
+_active_span: ContextVar[Optional["Span"]] = ContextVar(
+    "translation_agent_span", default=None
+)
+
+
+class Span:
+    """Timing and token counts of one completion call."""
+
+    def __init__(
+        self,
+        name: str,
+        model: Optional[str] = None,
+        stage: Optional[str] = None,
+        chunk: Optional[int] = None,
+    ):
+        self.name = name
+        self.model = model
+        self.stage = stage
+        self.chunk = chunk
+        self.start = time.time()
+        self._started = time.perf_counter()
+        self.latency: Optional[float] = None
+        self.first_token: Optional[float] = None
+        self.cached = False
+        self.error: Optional[str] = None
+        # Reported by Ollama when the call reaches the server
+        self.prompt_tokens: Optional[int] = None
+        self.response_tokens: Optional[int] = None
+        self.total_duration: Optional[float] = None
+        self.load_duration: Optional[float] = None
+        self.prompt_eval_duration: Optional[float] = None
+        self.eval_duration: Optional[float] = None
+
+    @property
+    def queue_wait(self) -> Optional[float]:
+        """
+        Time the call spent outside the model: waiting for a connection or a
+        free server slot, and on the network.
+        """
+        if self.latency is None or self.total_duration is None:
+            return None
+        return max(self.latency - self.total_duration, 0.0)
+
+    def mark_first_token(self) -> None:
+        """Record the time to the first streamed piece, once."""
+        if self.first_token is None:
+            self.first_token = time.perf_counter() - self._started
+
+    def record_response(self, result: Dict[str, Any]) -> None:
+        """
+        Take the token counts and timings from an Ollama response.
+
+        Args:
+            result (Dict[str, Any]): The /api/generate response, or the final
+                line of a streamed one.
+        """
+        self.prompt_tokens = result.get(
+            "prompt_eval_count", self.prompt_tokens
+        )
+        self.response_tokens = result.get("eval_count", self.response_tokens)
+        for field in (
+            "total_duration",
+            "load_duration",
+            "prompt_eval_duration",
+            "eval_duration",
+        ):
+            if field in result:
+                setattr(self, field, result[field] / NANOSECONDS)
+
+    def finish(self) -> None:
+        self.latency = time.perf_counter() - self._started
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Return the span as a JSON-serializable dictionary."""
+        return {
+            "name": self.name,
+            "stage": self.stage,
+            "chunk": self.chunk,
+            "model": self.model,
+            "start": self.start,
+            "latency": self.latency,
+            "queue_wait": self.queue_wait,
+            "first_token": self.first_token,
+            "cached": self.cached,
+            "error": self.error,
+            "prompt_tokens": self.prompt_tokens,
+            "response_tokens": self.response_tokens,
+            "total_duration": self.total_duration,
+            "load_duration": self.load_duration,
+            "prompt_eval_duration": self.prompt_eval_duration,
+            "eval_duration": self.eval_duration,
+        }
+
+
+class Tracer:
+    """Collects finished spans and passes them to listeners."""
+
+    def __init__(self, max_spans: int = TRACE_MAX_SPANS):
+        """
+        Initialize the tracer.
+
+        Args:
+            max_spans (int): Number of finished spans kept in memory; the
+                oldest are dropped first. 0 keeps none, listeners are still
+                called.
+        """
+        self._lock = threading.Lock()
+        self._listeners: List[Callable[[Span], None]] = []
+        self.spans: "deque[Span]" = deque(maxlen=max_spans)
+
+    def add_listener(self, listener: Callable[[Span], None]) -> None:
+        """Call listener with every span as soon as it finishes."""
+        with self._lock:
+            self._listeners.append(listener)
+
+    def remove_listener(self, listener: Callable[[Span], None]) -> None:
+        """Stop calling a listener added with add_listener."""
+        with self._lock:
+            self._listeners.remove(listener)
+
+    @contextlib.contextmanager
+    def span(self, name: str, model: Optional[str] = None) -> Iterator[Span]:
+        """
+        Time a completion call.
+
+        The span is tagged with the stage and chunk of the enclosing
+        trace_stage block, and is the active span inside the block, so the
+        client can attach Ollama's timings to it with record_response.
+
+        Args:
+            name (str): Name of the call, e.g. "get_completion".
+            model (str, optional): Model the call is made to.
+
+        Yields:
+            Span: The span, finished when the block exits.
+        """
+        stage, chunk = _stage.get()
+        span = Span(name, model, stage, chunk)
+        token = _active_span.set(span)
+        try:
+            yield span
+        except Exception as e:
+            span.error = str(e) or type(e).__name__
+            raise
+        finally:
+            _reset(_active_span, token, None)
+            span.finish()
+            self._finish(span)
+
+    def _finish(self, span: Span) -> None:
+        with self._lock:
+            self.spans.append(span)
+            listeners = list(self._listeners)
+        for listener in listeners:
+            listener(span)
+
+    def clear(self) -> None:
+        """Drop the spans kept in memory."""
+        with self._lock:
+            self.spans.clear()
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """
+        Add up the spans by stage.
+
+        Returns:
+            Dict[str, Dict[str, float]]: Number of calls, total latency,
+                queue wait, prompt and response tokens and Ollama's prompt
+                and response evaluation time, by stage.
+        """
+        with self._lock:
+            spans = list(self.spans)
+        totals: Dict[str, Dict[str, float]] = {}
+        for span in spans:
+            stage = totals.setdefault(
+                span.stage or "other",
+                {
+                    "calls": 0,
+                    "latency": 0.0,
+                    "queue_wait": 0.0,
+                    "prompt_tokens": 0,
+                    "response_tokens": 0,
+                    "prompt_eval_duration": 0.0,
+                    "eval_duration": 0.0,
+                },
+            )
+            stage["calls"] += 1
+            for field in stage:
+                value = getattr(span, field, None)
+                if field != "calls" and value is not None:
+                    stage[field] += value
+        return totals
+
+    def to_json(self) -> str:
+        """Serialize the spans kept in memory and their summary to JSON."""
+        with self._lock:
+            spans = [span.to_dict() for span in self.spans]
+        return json.dumps(
+            {"spans": spans, "summary": self.summary()},
+            ensure_ascii=False,
+            indent=2,
+        )
+
+    def export_json(self, path: str) -> None:
+        """Write to_json to a file."""
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(self.to_json())
+
+
+@contextlib.contextmanager
+def trace_stage(stage: str, chunk: Optional[int] = None) -> Iterator[None]:
+    """
+    Tag the completion calls made inside the block with a stage and chunk.
+
+    Args:
+        stage (str): Pipeline stage, e.g. "initial", "reflect" or "improve".
+        chunk (int, optional): Index of the chunk, None for a single-chunk text.
+    """
+    token = _stage.set((stage, chunk))
+    try:
+        yield
+    finally:
+        _reset(_stage, token, (None, None))
+
+
+def _reset(var: ContextVar, token: Any, default: Any) -> None:
+    try:
+        var.reset(token)
+    except ValueError:
+        # A streaming generator closed from another context
+        var.set(default)
+
+
+def active_span() -> Optional[Span]:
+    """Return the span of the completion call in progress, if any."""
+    return _active_span.get()
+
+
+# Global tracer used by the completion functions
+tracer = Tracer()
@@ -1,30 +1,101 @@
 import os
 import json
-from typing import List, Union, Dict, Any
+import logging
+from contextlib import ExitStack
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Generator,
+    Iterator,
+    List,
+    Mapping,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
 
 import requests
-import tiktoken
 from dotenv import load_dotenv
-from icecream import ic
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from .ollama_client import ollama_client, ensure_model_available
-from .config import DEFAULT_OLLAMA_MODEL, get_model_config
+from .ollama_client import (
+    chat_messages,
+    ensure_model_available,
+    hedged,
+    model_registry,
+    ollama_client,
+    warm_up_model,
+)
+from .cache import completion_cache
+
+# calculate_chunk_size is re-exported for existing callers of utils
+from .chunker import calculate_chunk_size, chunk_text  # noqa: F401
+from .config import (
+    DEFAULT_OLLAMA_MODEL,
+    MEMORY_EDIT_SIMILARITY,
+    OLLAMA_API,
+    get_model_config,
+)
+from .context_policy import ContextPolicy, PromptTokenLog, get_context_policy
+from .executor import ChunkExecutor, get_executor, run_chunks
+from .memory import FuzzyMatch, TranslationMemory, translation_memory
+from .review_policy import ReviewPolicy, get_review_policy
+from .tokens import TokenizedText, get_encoding, tokenize
+from .tracing import trace_stage, tracer
 
 
 load_dotenv()  # read local .env file
 
+logger = logging.getLogger(__name__)
+
 MAX_TOKENS_PER_CHUNK = (
     1000  # if text is more than this many tokens, we'll break it up into
 )
 # discrete chunks to translate one chunk at a time
 
 
+def completion_cache_key(
+    prompt: str,
+    system_message: str = "You are a helpful assistant.",
+    model: Optional[str] = None,
+    temperature: float = 0.3,
+    json_mode: bool = False,
+) -> str:
+    """
+    Get the completion cache key of a get_completion call with these arguments.
+
+    Code that reads and writes the cache itself, like the batches, uses it
+    to share entries with get_completion.
+
+    Args:
+        prompt (str): The user's prompt or query.
+        system_message (str, optional): The system message.
+        model (str, optional): The name of the Ollama model. Defaults to DEFAULT_OLLAMA_MODEL.
+        temperature (float, optional): The sampling temperature. Defaults to 0.3.
+        json_mode (bool, optional): Whether the response is requested in JSON format.
+
+    Returns:
+        str: The key, see cache.CompletionCache.make_key.
+    """
+    if model is None:
+        model = DEFAULT_OLLAMA_MODEL
+    return completion_cache.make_key(
+        model,
+        system_message,
+        prompt,
+        temperature,
+        "json" if json_mode else None,
+    )
+
+
 def get_completion(
     prompt: str,
     system_message: str = "You are a helpful assistant.",
     model: str = None,
     temperature: float = 0.3,
     json_mode: bool = False,
+    use_cache: bool = True,
 ) -> Union[str, dict]:
     """
         Generate a completion using the Ollama API.
@@ -39,36 +110,196 @@ def get_completion(
             Defaults to 0.3.
         json_mode (bool, optional): Whether to return the response in JSON format.
             Defaults to False.
+        use_cache (bool, optional): Whether to look the completion up in, and store it to,
+            the persistent completion cache (when one is configured). Defaults to True.
 
     Returns:
         Union[str, dict]: The generated completion.
-            If json_mode is True, returns the complete API response as a dictionary.
-            If json_mode is False, returns the generated text as a string.
+            If json_mode is True, the text is a JSON document, to be decoded with json.loads.
     """
     if model is None:
         model = DEFAULT_OLLAMA_MODEL
-    
-    
-    # Ensure model is available
-    if not ensure_model_available(model):
-        raise Exception(f"Model {model} is not available and could not be pulled")
-    
-    try:
-        return ollama_client.generate(
-            model=model,
-            prompt=prompt,
-            system=system_message,
-            temperature=temperature,
-            format="json" if json_mode else None
-        )
-        
-    except Exception as e:
-        ic(f"Error calling Ollama API: {e}")
-        raise Exception(f"Failed to get completion from Ollama: {e}")
+
+    response_format = "json" if json_mode else None
+
+    with tracer.span("get_completion", model) as span:
+        # A cached completion needs neither the model nor the server
+        cache_key = None
+        if use_cache and completion_cache.enabled:
+            cache_key = completion_cache_key(
+                prompt, system_message, model, temperature, json_mode
+            )
+            cached = completion_cache.get(cache_key)
+            if cached is not None:
+                span.cached = True
+                return cached
+
+        # Ensure model is available
+        if not ensure_model_available(model):
+            raise Exception(
+                f"Model {model} is not available and could not be pulled"
+            )
+
+        try:
+            if OLLAMA_API == "chat":
+                messages = chat_messages(system_message, prompt)
+                completion = hedged(
+                    lambda client: client.chat(
+                        model=model,
+                        messages=messages,
+                        temperature=temperature,
+                        format=response_format,
+                        use_cache=False,
+                    )
+                )
+            else:
+                completion = hedged(
+                    lambda client: client.generate(
+                        model=model,
+                        prompt=prompt,
+                        system=system_message,
+                        temperature=temperature,
+                        format=response_format,
+                        use_cache=False,
+                    )
+                )
+
+        except Exception as e:
+            # The model may have been removed; check again on the next call
+            model_registry.invalidate()
+            logger.debug("Error calling Ollama API: %s", e)
+            raise Exception(
+                f"Failed to get completion from Ollama: {e}"
+            ) from e
+
+        if cache_key is not None:
+            completion_cache.set(cache_key, completion)
+        return completion
+
+
+def get_completion_stream(
+    prompt: str,
+    system_message: str = "You are a helpful assistant.",
+    model: str = None,
+    temperature: float = 0.3,
+    use_cache: bool = True,
+) -> Iterator[str]:
+    """
+        Generate a completion using the Ollama API, yielding text as it is produced.
+
+    Args:
+        prompt (str): The user's prompt or query.
+        system_message (str, optional): The system message to set the context for the assistant.
+            Defaults to "You are a helpful assistant.".
+        model (str, optional): The name of the Ollama model to use for generating the completion.
+            Defaults to DEFAULT_OLLAMA_MODEL.
+        temperature (float, optional): The sampling temperature for controlling the randomness of the generated text.
+            Defaults to 0.3.
+        use_cache (bool, optional): Whether to use the persistent completion cache. A cached
+            completion is yielded in one piece. Defaults to True.
+
+    Yields:
+        str: Pieces of the generated completion.
+    """
+    if model is None:
+        model = DEFAULT_OLLAMA_MODEL
+
+    with tracer.span("get_completion_stream", model) as span:
+        cache_key = None
+        if use_cache and completion_cache.enabled:
+            cache_key = completion_cache_key(
+                prompt, system_message, model, temperature
+            )
+            cached = completion_cache.get(cache_key)
+            if cached is not None:
+                span.cached = True
+                yield cached
+                return
+
+        if not ensure_model_available(model):
+            raise Exception(
+                f"Model {model} is not available and could not be pulled"
+            )
+
+        pieces = []
+        try:
+            if OLLAMA_API == "chat":
+                stream = ollama_client.chat_stream(
+                    model=model,
+                    messages=chat_messages(system_message, prompt),
+                    temperature=temperature,
+                    use_cache=False,
+                )
+            else:
+                stream = ollama_client.generate_stream(
+                    model=model,
+                    prompt=prompt,
+                    system=system_message,
+                    temperature=temperature,
+                    use_cache=False,
+                )
+            for piece in stream:
+                pieces.append(piece)
+                yield piece
+
+        except Exception as e:
+            model_registry.invalidate()
+            logger.debug("Error calling Ollama API: %s", e)
+            raise Exception(
+                f"Failed to get completion from Ollama: {e}"
+            ) from e
+
+        if cache_key is not None:
+            completion_cache.set(cache_key, "".join(pieces))
+
+
+def one_chunk_initial_translation_prompt(
+    source_lang: str,
+    target_lang: str,
+    source_text: str,
+    examples: Sequence[FuzzyMatch] = (),
+) -> Tuple[str, str]:
+    """
+    Build the system message and prompt for translating the entire text as one chunk.
+
+    Args:
+        source_lang (str): The source language of the text.
+        target_lang (str): The target language for translation.
+        source_text (str): The text to be translated.
+        examples (Sequence[FuzzyMatch]): Translations of similar texts,
+            shown before the text, e.g. from TranslationMemory.similar.
+
+    Returns:
+        Tuple[str, str]: The system message and the prompt.
+    """
+
+    system_message = f"You are an expert linguist, specializing in translation from {source_lang} to {target_lang}."
+
+    reference = ""
+    if examples:
+        reference = "Earlier translations of similar texts, for reference:\n"
+        for example in examples:
+            reference += f"""<EXAMPLE>
+{source_lang}: {example.source}
+{target_lang}: {example.translation}
+</EXAMPLE>
+"""
+        reference += "\n"
+
+    translation_prompt = f"""This is an {source_lang} to {target_lang} translation, please provide the {target_lang} translation for this text. \
+Do not provide any explanations or text apart from the translation.
+{reference}{source_lang}: {source_text}
+
+{target_lang}:"""
+
+    return system_message, translation_prompt
 
 
 def one_chunk_initial_translation(
-    source_lang: str, target_lang: str, source_text: str
+    source_lang: str,
+    target_lang: str,
+    source_text: str,
+    examples: Sequence[FuzzyMatch] = (),
 ) -> str:
     """
     Translate the entire text as one chunk using an LLM.
@@ -77,33 +308,104 @@ def one_chunk_initial_translation(
         source_lang (str): The source language of the text.
         target_lang (str): The target language for translation.
         source_text (str): The text to be translated.
+        examples (Sequence[FuzzyMatch]): Translations of similar texts to
+            show the model.
 
     Returns:
         str: The translated text.
     """
 
+    system_message, translation_prompt = one_chunk_initial_translation_prompt(
+        source_lang, target_lang, source_text, examples
+    )
+
+    with trace_stage("initial"):
+        translation = get_completion(
+            translation_prompt, system_message=system_message
+        )
+
+    return translation
+
+
+def one_chunk_edit_prompt(
+    source_lang: str, target_lang: str, source_text: str, match: FuzzyMatch
+) -> Tuple[str, str]:
+    """
+    Build the system message and prompt for adapting the translation of a similar text.
+
+    Args:
+        source_lang (str): The source language of the text.
+        target_lang (str): The target language for translation.
+        source_text (str): The text to be translated.
+        match (FuzzyMatch): A translated text very similar to source_text.
+
+    Returns:
+        Tuple[str, str]: The system message and the prompt.
+    """
+
     system_message = f"You are an expert linguist, specializing in translation from {source_lang} to {target_lang}."
 
-    translation_prompt = f"""This is an {source_lang} to {target_lang} translation, please provide the {target_lang} translation for this text. \
-Do not provide any explanations or text apart from the translation.
-{source_lang}: {source_text}
+    prompt = f"""Your task is to translate a {source_lang} text into {target_lang}. \
+A very similar {source_lang} text, delimited by XML tags <EARLIER_SOURCE></EARLIER_SOURCE>, \
+has already been translated; its {target_lang} translation is delimited by XML tags <EARLIER_TRANSLATION></EARLIER_TRANSLATION>.
 
-{target_lang}:"""
+<EARLIER_SOURCE>
+{match.source}
+</EARLIER_SOURCE>
 
-    translation = get_completion(translation_prompt, system_message=system_message)
+<EARLIER_TRANSLATION>
+{match.translation}
+</EARLIER_TRANSLATION>
+
+Edit the earlier translation into a translation of the text below, delimited by XML tags <SOURCE_TEXT></SOURCE_TEXT>. \
+Only change what the differences between the two {source_lang} texts require and keep the rest of the wording.
+
+<SOURCE_TEXT>
+{source_text}
+</SOURCE_TEXT>
+
+Output only the new translation and nothing else."""
+
+    return system_message, prompt
+
+
+def one_chunk_edit_translation(
+    source_lang: str, target_lang: str, source_text: str, match: FuzzyMatch
+) -> str:
+    """
+    Translate the text by editing the translation of a very similar text.
+
+    One call replaces the initial translation, reflection and improvement.
+
+    Args:
+        source_lang (str): The source language of the text.
+        target_lang (str): The target language for translation.
+        source_text (str): The text to be translated.
+        match (FuzzyMatch): A translated text very similar to source_text.
+
+    Returns:
+        str: The translated text.
+    """
+
+    system_message, prompt = one_chunk_edit_prompt(
+        source_lang, target_lang, source_text, match
+    )
+
+    with trace_stage("edit"):
+        translation = get_completion(prompt, system_message=system_message)
 
     return translation
 
 
-def one_chunk_reflect_on_translation(
+def one_chunk_reflection_prompt(
     source_lang: str,
     target_lang: str,
     source_text: str,
     translation_1: str,
     country: str = "",
-) -> str:
+) -> Tuple[str, str]:
     """
-    Use an LLM to reflect on the translation, treating the entire text as one chunk.
+    Build the system message and prompt for reflecting on a one-chunk translation.
 
     Args:
         source_lang (str): The source language of the text.
@@ -113,7 +415,7 @@ def one_chunk_reflect_on_translation(
         country (str): Country specified for the target language.
 
     Returns:
-        str: The LLM's reflection on the translation, providing constructive criticism and suggestions for improvement.
+        Tuple[str, str]: The system message and the prompt.
     """
 
     system_message = f"You are an expert linguist specializing in translation from {source_lang} to {target_lang}. \
@@ -166,19 +468,52 @@ Write a list of specific, helpful and constructive suggestions for improving the
 Each suggestion should address one specific part of the translation.
 Output only the suggestions and nothing else."""
 
-    reflection = get_completion(reflection_prompt, system_message=system_message)
+    return system_message, reflection_prompt
+
+
+def one_chunk_reflect_on_translation(
+    source_lang: str,
+    target_lang: str,
+    source_text: str,
+    translation_1: str,
+    country: str = "",
+    note: str = "",
+) -> str:
+    """
+    Use an LLM to reflect on the translation, treating the entire text as one chunk.
+
+    Args:
+        source_lang (str): The source language of the text.
+        target_lang (str): The target language of the translation.
+        source_text (str): The original text in the source language.
+        translation_1 (str): The initial translation of the source text.
+        country (str): Country specified for the target language.
+        note (str): Appended to the prompt, e.g. ReviewPolicy.reflection_note.
+
+    Returns:
+        str: The LLM's reflection on the translation, providing constructive criticism and suggestions for improvement.
+    """
+
+    system_message, reflection_prompt = one_chunk_reflection_prompt(
+        source_lang, target_lang, source_text, translation_1, country
+    )
+
+    with trace_stage("reflect"):
+        reflection = get_completion(
+            reflection_prompt + note, system_message=system_message
+        )
     return reflection
 
 
-def one_chunk_improve_translation(
+def one_chunk_improvement_prompt(
     source_lang: str,
     target_lang: str,
     source_text: str,
     translation_1: str,
     reflection: str,
-) -> str:
+) -> Tuple[str, str]:
     """
-    Use the reflection to improve the translation, treating the entire text as one chunk.
+    Build the system message and prompt for improving a one-chunk translation.
 
     Args:
         source_lang (str): The source language of the text.
@@ -188,7 +523,7 @@ def one_chunk_improve_translation(
         reflection (str): Expert suggestions and constructive criticism for improving the translation.
 
     Returns:
-        str: The improved translation based on the expert suggestions.
+        Tuple[str, str]: The system message and the prompt.
     """
 
     system_message = f"You are an expert linguist, specializing in translation editing from {source_lang} to {target_lang}."
@@ -221,13 +556,193 @@ Please take into account the expert suggestions when editing the translation. Ed
 
 Output only the new translation and nothing else."""
 
-    translation_2 = get_completion(prompt, system_message)
+    return system_message, prompt
+
+
+def one_chunk_improve_translation(
+    source_lang: str,
+    target_lang: str,
+    source_text: str,
+    translation_1: str,
+    reflection: str,
+) -> str:
+    """
+    Use the reflection to improve the translation, treating the entire text as one chunk.
+
+    Args:
+        source_lang (str): The source language of the text.
+        target_lang (str): The target language for the translation.
+        source_text (str): The original text in the source language.
+        translation_1 (str): The initial translation of the source text.
+        reflection (str): Expert suggestions and constructive criticism for improving the translation.
+
+    Returns:
+        str: The improved translation based on the expert suggestions.
+    """
+
+    system_message, prompt = one_chunk_improvement_prompt(
+        source_lang, target_lang, source_text, translation_1, reflection
+    )
+
+    with trace_stage("improve"):
+        translation_2 = get_completion(prompt, system_message)
 
     return translation_2
 
 
+def one_chunk_translation(
+    source_lang: str,
+    target_lang: str,
+    source_text: str,
+    country: str = "",
+    memory: Optional[TranslationMemory] = None,
+    scope: str = "",
+    review_policy: Optional[ReviewPolicy] = None,
+) -> "ChunkTranslation":
+    """
+    Run a single chunk through the initial translation, reflection and improvement stages.
+
+    With a memory, similar texts translated before are looked up first. If
+    one is at least MEMORY_EDIT_SIMILARITY similar, its translation is
+    edited in a single call instead; otherwise the similar texts are shown
+    as examples in the initial translation prompt.
+
+    Args:
+        source_lang (str): The source language of the text.
+        target_lang (str): The target language for the translation.
+        source_text (str): The text to be translated.
+        country (str): Country specified for the target language.
+        memory (TranslationMemory, optional): Memory to look up similar texts in.
+        scope (str): The memory scope of the translation settings.
+        review_policy (ReviewPolicy, optional): Decides whether to reflect and improve.
+            Defaults to the policy selected by TRANSLATION_REVIEW_POLICY.
+    Returns:
+        ChunkTranslation: The outputs of the three stages, as chunk 0. After
+            an edit, translation_1 is the similar text's translation and
+            reflection is empty. Stages the review policy skipped are empty,
+            and translation_2 is then translation_1.
+    """
+    if review_policy is None:
+        review_policy = get_review_policy()
+
+    matches = []
+    if memory is not None:
+        matches = memory.similar(scope, source_text)
+
+    return run_steps(
+        one_chunk_steps(
+            source_lang,
+            target_lang,
+            source_text,
+            country,
+            matches,
+            review_policy,
+        ),
+        {
+            "edit": one_chunk_edit_translation,
+            "initial": one_chunk_initial_translation,
+            "reflect": one_chunk_reflect_on_translation,
+            "improve": one_chunk_improve_translation,
+        },
+    )
+
+
+# Which stages a chunk goes through depends on the memory and the review
+# policy, not on how the model is called. The steps generators hold that
+# logic once for the sync and async pipelines: they yield the name and
+# arguments of each stage call, are sent its result, and return the
+# ChunkTranslation. run_steps drives them with blocking calls,
+# async_utils.arun_steps with awaited ones.
+ChunkSteps = Generator[Tuple[str, tuple], str, "ChunkTranslation"]
+
+
+def run_steps(
+    steps: ChunkSteps, stages: Mapping[str, Callable[..., str]]
+) -> "ChunkTranslation":
+    """
+    Run the stage calls of a steps generator.
+
+    Args:
+        steps (ChunkSteps): E.g. one_chunk_steps or multichunk_steps.
+        stages (Mapping[str, Callable]): The function called for each stage name.
+
+    Returns:
+        ChunkTranslation: The value the steps return.
+    """
+    try:
+        stage, args = next(steps)
+        while True:
+            stage, args = steps.send(stages[stage](*args))
+    except StopIteration as done:
+        return done.value
+
+
+def one_chunk_steps(
+    source_lang: str,
+    target_lang: str,
+    source_text: str,
+    country: str,
+    matches: Sequence[FuzzyMatch],
+    review_policy: ReviewPolicy,
+) -> ChunkSteps:
+    """
+    The stage calls of one_chunk_translation, see run_steps.
+
+    The stages are "edit", "initial", "reflect" and "improve", called with
+    the arguments of the one_chunk_* function of the same name.
+    """
+    if matches and matches[0].similarity >= MEMORY_EDIT_SIMILARITY:
+        logger.debug(
+            "Editing a stored translation %.2f similar", matches[0].similarity
+        )
+        translation_2 = yield (
+            "edit",
+            (source_lang, target_lang, source_text, matches[0]),
+        )
+        return ChunkTranslation(
+            0, source_text, matches[0].translation, "", translation_2
+        )
+
+    translation_1 = yield (
+        "initial",
+        (source_lang, target_lang, source_text, matches),
+    )
+    if not review_policy.review(source_text, translation_1):
+        return ChunkTranslation(
+            0, source_text, translation_1, "", translation_1
+        )
+
+    reflection = yield (
+        "reflect",
+        (
+            source_lang,
+            target_lang,
+            source_text,
+            translation_1,
+            country,
+            review_policy.reflection_note,
+        ),
+    )
+    if not review_policy.improve(reflection):
+        return ChunkTranslation(
+            0, source_text, translation_1, reflection, translation_1
+        )
+    translation_2 = yield (
+        "improve",
+        (source_lang, target_lang, source_text, translation_1, reflection),
+    )
+
+    return ChunkTranslation(
+        0, source_text, translation_1, reflection, translation_2
+    )
+
+
 def one_chunk_translate_text(
-    source_lang: str, target_lang: str, source_text: str, country: str = ""
+    source_lang: str,
+    target_lang: str,
+    source_text: str,
+    country: str = "",
+    review_policy: Optional[ReviewPolicy] = None,
 ) -> str:
     """
     Translate a single chunk of text from the source language to the target language.
@@ -241,21 +756,18 @@ def one_chunk_translate_text(
         target_lang (str): The target language for the translation.
         source_text (str): The text to be translated.
         country (str): Country specified for the target language.
+        review_policy (ReviewPolicy, optional): Decides whether to reflect and improve.
+            Defaults to the policy selected by TRANSLATION_REVIEW_POLICY.
     Returns:
         str: The improved translation of the source text.
     """
-    translation_1 = one_chunk_initial_translation(
-        source_lang, target_lang, source_text
-    )
-
-    reflection = one_chunk_reflect_on_translation(
-        source_lang, target_lang, source_text, translation_1, country
-    )
-    translation_2 = one_chunk_improve_translation(
-        source_lang, target_lang, source_text, translation_1, reflection
-    )
-
-    return translation_2
+    return one_chunk_translation(
+        source_lang,
+        target_lang,
+        source_text,
+        country,
+        review_policy=review_policy,
+    ).translation_2
 
 
 def num_tokens_in_string(
@@ -278,39 +790,28 @@ def num_tokens_in_string(
         >>> print(num_tokens)
         5
     """
-    encoding = tiktoken.get_encoding(encoding_name)
+    encoding = get_encoding(encoding_name)
     num_tokens = len(encoding.encode(input_str))
     return num_tokens
 
 
-def multichunk_initial_translation(
-    source_lang: str, target_lang: str, source_text_chunks: List[str]
-) -> List[str]:
-    """
-    Translate a text in multiple chunks from the source language to the target language.
+# The multichunk prompts put everything that is the same for every chunk of a
+# document first: the instructions and the source text, shown without tags.
+# The chunk being translated, its translation and the suggestions come last,
+# so consecutive chunk calls share a long prompt prefix that Ollama does not
+# have to evaluate again.
+MULTICHUNK_TRANSLATION_PROMPT = """Your task is to provide a professional translation from {source_lang} to {target_lang} of PART of a text.
 
-    Args:
-        source_lang (str): The source language of the text.
-        target_lang (str): The target language for translation.
-        source_text_chunks (List[str]): A list of text chunks to be translated.
-
-    Returns:
-        List[str]: A list of translated text chunks.
-    """
-
-    system_message = f"You are an expert linguist, specializing in translation from {source_lang} to {target_lang}."
-
-    translation_prompt = """Your task is to provide a professional translation from {source_lang} to {target_lang} of PART of a text.
-
-The source text is below, delimited by XML tags <SOURCE_TEXT> and </SOURCE_TEXT>. Translate only the part within the source text
-delimited by <TRANSLATE_THIS> and </TRANSLATE_THIS>. You can use the rest of the source text as context, but do not translate any
-of the other text. Do not output anything other than the translation of the indicated part of the text.
+The source text is below, delimited by XML tags <SOURCE_TEXT> and </SOURCE_TEXT>. After it, you will be shown the part
+of the source text to translate, delimited by <TRANSLATE_THIS> and </TRANSLATE_THIS>. You can use the rest of the source
+text as context, but do not translate any of the other text. Do not output anything other than the translation of the
+indicated part of the text.
 
 <SOURCE_TEXT>
-{tagged_text}
+{source_text}
 </SOURCE_TEXT>
 
-To reiterate, you should translate only this part of the text, shown here again between <TRANSLATE_THIS> and </TRANSLATE_THIS>:
+Translate only this part of the text, shown between <TRANSLATE_THIS> and </TRANSLATE_THIS>:
 <TRANSLATE_THIS>
 {chunk_to_translate}
 </TRANSLATE_THIS>
@@ -318,67 +819,24 @@ To reiterate, you should translate only this part of the text, shown here again
 Output only the translation of the portion you are asked to translate, and nothing else.
 """
 
-    translation_chunks = []
-    for i in range(len(source_text_chunks)):
-        # Will translate chunk i
-        tagged_text = (
-            "".join(source_text_chunks[0:i])
-            + "<TRANSLATE_THIS>"
-            + source_text_chunks[i]
-            + "</TRANSLATE_THIS>"
-            + "".join(source_text_chunks[i + 1 :])
-        )
-
-        prompt = translation_prompt.format(
-            source_lang=source_lang,
-            target_lang=target_lang,
-            tagged_text=tagged_text,
-            chunk_to_translate=source_text_chunks[i],
-        )
-
-        translation = get_completion(prompt, system_message=system_message)
-        translation_chunks.append(translation)
-
-    return translation_chunks
-
-
-def multichunk_reflect_on_translation(
-    source_lang: str,
-    target_lang: str,
-    source_text_chunks: List[str],
-    translation_1_chunks: List[str],
-    country: str = "",
-) -> List[str]:
-    """
-    Provides constructive criticism and suggestions for improving a partial translation.
-
-    Args:
-        source_lang (str): The source language of the text.
-        target_lang (str): The target language of the translation.
-        source_text_chunks (List[str]): The source text divided into chunks.
-        translation_1_chunks (List[str]): The translated chunks corresponding to the source text chunks.
-        country (str): Country specified for the target language.
-
-    Returns:
-        List[str]: A list of reflections containing suggestions for improving each translated chunk.
-    """
-
-    system_message = f"You are an expert linguist specializing in translation from {source_lang} to {target_lang}. \
-You will be provided with a source text and its translation and your goal is to improve the translation."
-
-    if country != "":
-        reflection_prompt = """Your task is to carefully read a source text and part of a translation of that text from {source_lang} to {target_lang}, and then give constructive criticism and helpful suggestions for improving the translation.
+MULTICHUNK_REFLECTION_PROMPT_WITH_COUNTRY = """Your task is to carefully read a source text and part of a translation of that text from {source_lang} to {target_lang}, and then give constructive criticism and helpful suggestions for improving the translation.
 The final style and tone of the translation should match the style of {target_lang} colloquially spoken in {country}.
 
-The source text is below, delimited by XML tags <SOURCE_TEXT> and </SOURCE_TEXT>, and the part that has been translated
-is delimited by <TRANSLATE_THIS> and </TRANSLATE_THIS> within the source text. You can use the rest of the source text
-as context for critiquing the translated part.
+The source text is below, delimited by XML tags <SOURCE_TEXT> and </SOURCE_TEXT>. After it, you will be shown the part
+that has been translated, delimited by <TRANSLATE_THIS> and </TRANSLATE_THIS>, and its translation. You can use the rest
+of the source text as context for critiquing the translated part.
 
 <SOURCE_TEXT>
-{tagged_text}
+{source_text}
 </SOURCE_TEXT>
 
-To reiterate, only part of the text is being translated, shown here again between <TRANSLATE_THIS> and </TRANSLATE_THIS>:
+When writing suggestions, pay attention to whether there are ways to improve the translation's:\n\
+(i) accuracy (by correcting errors of addition, mistranslation, omission, or untranslated text),\n\
+(ii) fluency (by applying {target_lang} grammar, spelling and punctuation rules, and ensuring there are no unnecessary repetitions),\n\
+(iii) style (by ensuring the translations reflect the style of the source text and take into account any cultural context),\n\
+(iv) terminology (by ensuring terminology use is consistent and reflects the source text domain; and by only ensuring you use equivalent idioms {target_lang}).\n\
+
+Only part of the text has been translated, shown here between <TRANSLATE_THIS> and </TRANSLATE_THIS>:
 <TRANSLATE_THIS>
 {chunk_to_translate}
 </TRANSLATE_THIS>
@@ -388,28 +846,60 @@ The translation of the indicated part, delimited below by <TRANSLATION> and </TR
 {translation_1_chunk}
 </TRANSLATION>
 
+Write a list of specific, helpful and constructive suggestions for improving the translation.
+Each suggestion should address one specific part of the translation.
+Output only the suggestions and nothing else."""
+
+MULTICHUNK_REFLECTION_PROMPT = """Your task is to carefully read a source text and part of a translation of that text from {source_lang} to {target_lang}, and then give constructive criticism and helpful suggestions for improving the translation.
+
+The source text is below, delimited by XML tags <SOURCE_TEXT> and </SOURCE_TEXT>. After it, you will be shown the part
+that has been translated, delimited by <TRANSLATE_THIS> and </TRANSLATE_THIS>, and its translation. You can use the rest
+of the source text as context for critiquing the translated part.
+
+<SOURCE_TEXT>
+{source_text}
+</SOURCE_TEXT>
+
 When writing suggestions, pay attention to whether there are ways to improve the translation's:\n\
 (i) accuracy (by correcting errors of addition, mistranslation, omission, or untranslated text),\n\
 (ii) fluency (by applying {target_lang} grammar, spelling and punctuation rules, and ensuring there are no unnecessary repetitions),\n\
 (iii) style (by ensuring the translations reflect the style of the source text and take into account any cultural context),\n\
 (iv) terminology (by ensuring terminology use is consistent and reflects the source text domain; and by only ensuring you use equivalent idioms {target_lang}).\n\
 
+Only part of the text has been translated, shown here between <TRANSLATE_THIS> and </TRANSLATE_THIS>:
+<TRANSLATE_THIS>
+{chunk_to_translate}
+</TRANSLATE_THIS>
+
+The translation of the indicated part, delimited below by <TRANSLATION> and </TRANSLATION>, is as follows:
+<TRANSLATION>
+{translation_1_chunk}
+</TRANSLATION>
+
 Write a list of specific, helpful and constructive suggestions for improving the translation.
 Each suggestion should address one specific part of the translation.
 Output only the suggestions and nothing else."""
 
-    else:
-        reflection_prompt = """Your task is to carefully read a source text and part of a translation of that text from {source_lang} to {target_lang}, and then give constructive criticism and helpful suggestions for improving the translation.
+MULTICHUNK_IMPROVEMENT_PROMPT = """Your task is to carefully read, then improve, a translation from {source_lang} to {target_lang}, taking into
+account a set of expert suggestions and constructive criticisms. Below, the source text, initial translation, and expert suggestions are provided.
 
-The source text is below, delimited by XML tags <SOURCE_TEXT> and </SOURCE_TEXT>, and the part that has been translated
-is delimited by <TRANSLATE_THIS> and </TRANSLATE_THIS> within the source text. You can use the rest of the source text
-as context for critiquing the translated part.
+The source text is below, delimited by XML tags <SOURCE_TEXT> and </SOURCE_TEXT>. After it, you will be shown the part
+that has been translated, delimited by <TRANSLATE_THIS> and </TRANSLATE_THIS>. You can use the rest of the source text
+as context, but need to provide a translation only of the part indicated by <TRANSLATE_THIS> and </TRANSLATE_THIS>.
 
 <SOURCE_TEXT>
-{tagged_text}
+{source_text}
 </SOURCE_TEXT>
 
-To reiterate, only part of the text is being translated, shown here again between <TRANSLATE_THIS> and </TRANSLATE_THIS>:
+When rewriting the translation, pay attention to whether there are ways to improve the translation's
+
+(i) accuracy (by correcting errors of addition, mistranslation, omission, or untranslated text),
+(ii) fluency (by applying {target_lang} grammar, spelling and punctuation rules and ensuring there are no unnecessary repetitions), \
+(iii) style (by ensuring the translations reflect the style of the source text)
+(iv) terminology (inappropriate for context, inconsistent use), or
+(v) other errors.
+
+Only part of the text is being translated, shown here between <TRANSLATE_THIS> and </TRANSLATE_THIS>:
 <TRANSLATE_THIS>
 {chunk_to_translate}
 </TRANSLATE_THIS>
@@ -419,48 +909,377 @@ The translation of the indicated part, delimited below by <TRANSLATION> and </TR
 {translation_1_chunk}
 </TRANSLATION>
 
-When writing suggestions, pay attention to whether there are ways to improve the translation's:\n\
-(i) accuracy (by correcting errors of addition, mistranslation, omission, or untranslated text),\n\
-(ii) fluency (by applying {target_lang} grammar, spelling and punctuation rules, and ensuring there are no unnecessary repetitions),\n\
-(iii) style (by ensuring the translations reflect the style of the source text and take into account any cultural context),\n\
-(iv) terminology (by ensuring terminology use is consistent and reflects the source text domain; and by only ensuring you use equivalent idioms {target_lang}).\n\
+The expert translations of the indicated part, delimited below by <EXPERT_SUGGESTIONS> and </EXPERT_SUGGESTIONS>, are as follows:
+<EXPERT_SUGGESTIONS>
+{reflection_chunk}
+</EXPERT_SUGGESTIONS>
 
-Write a list of specific, helpful and constructive suggestions for improving the translation.
-Each suggestion should address one specific part of the translation.
-Output only the suggestions and nothing else."""
+Taking into account the expert suggestions, rewrite the translation to improve it.
+Output only the new translation of the indicated part and nothing else."""
+
+
+class ChunkTranslation(NamedTuple):
+    """The outputs of the three translation stages for one chunk."""
+
+    index: int
+    source_text: str
+    translation_1: str
+    reflection: str
+    translation_2: str
+
+
+class ChunkTranslationError(Exception):
+    """
+    Some chunks of a text could not be translated.
+
+    The other chunks were still translated. They are kept in completed,
+    which can be passed back to multichunk_translation or translate so
+    that only the failed chunks are translated again.
+    """
 
-    reflection_chunks = []
-    for i in range(len(source_text_chunks)):
-        # Will translate chunk i
-        tagged_text = (
-            "".join(source_text_chunks[0:i])
-            + "<TRANSLATE_THIS>"
-            + source_text_chunks[i]
-            + "</TRANSLATE_THIS>"
-            + "".join(source_text_chunks[i + 1 :])
+    def __init__(
+        self,
+        completed: Dict[int, ChunkTranslation],
+        errors: Dict[int, Exception],
+    ):
+        first = min(errors)
+        super().__init__(
+            f"{len(errors)} of {len(completed) + len(errors)} chunks failed, "
+            f"chunk {first}: {errors[first]}"
         )
-        if country != "":
-            prompt = reflection_prompt.format(
-                source_lang=source_lang,
-                target_lang=target_lang,
-                tagged_text=tagged_text,
-                chunk_to_translate=source_text_chunks[i],
-                translation_1_chunk=translation_1_chunks[i],
-                country=country,
-            )
-        else:
-            prompt = reflection_prompt.format(
-                source_lang=source_lang,
-                target_lang=target_lang,
-                tagged_text=tagged_text,
-                chunk_to_translate=source_text_chunks[i],
-                translation_1_chunk=translation_1_chunks[i],
-            )
+        self.completed = completed
+        self.errors = errors
+
+
+def multichunk_initial_translation_prompt(
+    source_lang: str,
+    target_lang: str,
+    source_text_chunks: List[str],
+    i: int,
+    context_policy: Optional[ContextPolicy] = None,
+) -> Tuple[str, str]:
+    """
+    Build the system message and prompt for translating chunk i of a text.
+
+    Args:
+        source_lang (str): The source language of the text.
+        target_lang (str): The target language for translation.
+        source_text_chunks (List[str]): The source text divided into chunks.
+        i (int): Index of the chunk to translate.
+        context_policy (ContextPolicy, optional): Decides how much surrounding text is shown.
+            Defaults to the policy selected by TRANSLATION_CONTEXT_POLICY.
+
+    Returns:
+        Tuple[str, str]: The system message and the prompt.
+    """
+
+    system_message = f"You are an expert linguist, specializing in translation from {source_lang} to {target_lang}."
+
+    if context_policy is None:
+        context_policy = get_context_policy()
+
+    prompt = MULTICHUNK_TRANSLATION_PROMPT.format(
+        source_lang=source_lang,
+        target_lang=target_lang,
+        source_text=context_policy.context_text(source_text_chunks, i),
+        chunk_to_translate=source_text_chunks[i],
+    )
+    context_policy.record("initial", i, prompt)
+
+    return system_message, prompt
+
+
+def multichunk_reflection_prompt(
+    source_lang: str,
+    target_lang: str,
+    source_text_chunks: List[str],
+    i: int,
+    translation_1_chunk: str,
+    country: str = "",
+    context_policy: Optional[ContextPolicy] = None,
+) -> Tuple[str, str]:
+    """
+    Build the system message and prompt for reflecting on the translation of chunk i.
+
+    Args:
+        source_lang (str): The source language of the text.
+        target_lang (str): The target language of the translation.
+        source_text_chunks (List[str]): The source text divided into chunks.
+        i (int): Index of the chunk whose translation is reviewed.
+        translation_1_chunk (str): The initial translation of chunk i.
+        country (str): Country specified for the target language.
+        context_policy (ContextPolicy, optional): Decides how much surrounding text is shown.
+            Defaults to the policy selected by TRANSLATION_CONTEXT_POLICY.
+
+    Returns:
+        Tuple[str, str]: The system message and the prompt.
+    """
+
+    system_message = f"You are an expert linguist specializing in translation from {source_lang} to {target_lang}. \
+You will be provided with a source text and its translation and your goal is to improve the translation."
+
+    if context_policy is None:
+        context_policy = get_context_policy()
+
+    source_text = context_policy.context_text(source_text_chunks, i)
+    if country != "":
+        prompt = MULTICHUNK_REFLECTION_PROMPT_WITH_COUNTRY.format(
+            source_lang=source_lang,
+            target_lang=target_lang,
+            source_text=source_text,
+            chunk_to_translate=source_text_chunks[i],
+            translation_1_chunk=translation_1_chunk,
+            country=country,
+        )
+    else:
+        prompt = MULTICHUNK_REFLECTION_PROMPT.format(
+            source_lang=source_lang,
+            target_lang=target_lang,
+            source_text=source_text,
+            chunk_to_translate=source_text_chunks[i],
+            translation_1_chunk=translation_1_chunk,
+        )
+    context_policy.record("reflect", i, prompt)
+
+    return system_message, prompt
+
+
+def multichunk_improvement_prompt(
+    source_lang: str,
+    target_lang: str,
+    source_text_chunks: List[str],
+    i: int,
+    translation_1_chunk: str,
+    reflection_chunk: str,
+    context_policy: Optional[ContextPolicy] = None,
+) -> Tuple[str, str]:
+    """
+    Build the system message and prompt for improving the translation of chunk i.
+
+    Args:
+        source_lang (str): The source language of the text.
+        target_lang (str): The target language for translation.
+        source_text_chunks (List[str]): The source text divided into chunks.
+        i (int): Index of the chunk whose translation is improved.
+        translation_1_chunk (str): The initial translation of chunk i.
+        reflection_chunk (str): Expert suggestions for chunk i.
+        context_policy (ContextPolicy, optional): Decides how much surrounding text is shown.
+            Defaults to the policy selected by TRANSLATION_CONTEXT_POLICY.
+
+    Returns:
+        Tuple[str, str]: The system message and the prompt.
+    """
+
+    system_message = f"You are an expert linguist, specializing in translation editing from {source_lang} to {target_lang}."
+
+    if context_policy is None:
+        context_policy = get_context_policy()
+
+    prompt = MULTICHUNK_IMPROVEMENT_PROMPT.format(
+        source_lang=source_lang,
+        target_lang=target_lang,
+        source_text=context_policy.context_text(source_text_chunks, i),
+        chunk_to_translate=source_text_chunks[i],
+        translation_1_chunk=translation_1_chunk,
+        reflection_chunk=reflection_chunk,
+    )
+    context_policy.record("improve", i, prompt)
+
+    return system_message, prompt
+
+
+def multichunk_initial_translation_chunk(
+    source_lang: str,
+    target_lang: str,
+    source_text_chunks: List[str],
+    i: int,
+    context_policy: Optional[ContextPolicy] = None,
+) -> str:
+    """
+    Translate chunk i of a text, using the other chunks as context.
+
+    Args:
+        source_lang (str): The source language of the text.
+        target_lang (str): The target language for translation.
+        source_text_chunks (List[str]): The source text divided into chunks.
+        i (int): Index of the chunk to translate.
+        context_policy (ContextPolicy, optional): Decides how much surrounding text is shown.
+            Defaults to the policy selected by TRANSLATION_CONTEXT_POLICY.
+
+    Returns:
+        str: The translation of chunk i.
+    """
+
+    system_message, prompt = multichunk_initial_translation_prompt(
+        source_lang, target_lang, source_text_chunks, i, context_policy
+    )
+
+    with trace_stage("initial", i):
+        return get_completion(prompt, system_message=system_message)
+
+
+def multichunk_reflect_on_translation_chunk(
+    source_lang: str,
+    target_lang: str,
+    source_text_chunks: List[str],
+    i: int,
+    translation_1_chunk: str,
+    country: str = "",
+    context_policy: Optional[ContextPolicy] = None,
+    note: str = "",
+) -> str:
+    """
+    Reflect on the translation of chunk i, using the other chunks as context.
+
+    Args:
+        source_lang (str): The source language of the text.
+        target_lang (str): The target language of the translation.
+        source_text_chunks (List[str]): The source text divided into chunks.
+        i (int): Index of the chunk whose translation is reviewed.
+        translation_1_chunk (str): The initial translation of chunk i.
+        country (str): Country specified for the target language.
+        context_policy (ContextPolicy, optional): Decides how much surrounding text is shown.
+            Defaults to the policy selected by TRANSLATION_CONTEXT_POLICY.
+        note (str): Appended to the prompt, e.g. ReviewPolicy.reflection_note.
+
+    Returns:
+        str: Suggestions for improving the translation of chunk i.
+    """
 
-        reflection = get_completion(prompt, system_message=system_message)
-        reflection_chunks.append(reflection)
+    system_message, prompt = multichunk_reflection_prompt(
+        source_lang,
+        target_lang,
+        source_text_chunks,
+        i,
+        translation_1_chunk,
+        country,
+        context_policy,
+    )
+
+    with trace_stage("reflect", i):
+        return get_completion(prompt + note, system_message=system_message)
 
-    return reflection_chunks
+
+def multichunk_improve_translation_chunk(
+    source_lang: str,
+    target_lang: str,
+    source_text_chunks: List[str],
+    i: int,
+    translation_1_chunk: str,
+    reflection_chunk: str,
+    context_policy: Optional[ContextPolicy] = None,
+) -> str:
+    """
+    Improve the translation of chunk i using the expert suggestions.
+
+    Args:
+        source_lang (str): The source language of the text.
+        target_lang (str): The target language for translation.
+        source_text_chunks (List[str]): The source text divided into chunks.
+        i (int): Index of the chunk whose translation is improved.
+        translation_1_chunk (str): The initial translation of chunk i.
+        reflection_chunk (str): Expert suggestions for chunk i.
+        context_policy (ContextPolicy, optional): Decides how much surrounding text is shown.
+            Defaults to the policy selected by TRANSLATION_CONTEXT_POLICY.
+
+    Returns:
+        str: The improved translation of chunk i.
+    """
+
+    system_message, prompt = multichunk_improvement_prompt(
+        source_lang,
+        target_lang,
+        source_text_chunks,
+        i,
+        translation_1_chunk,
+        reflection_chunk,
+        context_policy,
+    )
+
+    with trace_stage("improve", i):
+        return get_completion(prompt, system_message=system_message)
+
+
+def multichunk_initial_translation(
+    source_lang: str,
+    target_lang: str,
+    source_text_chunks: List[str],
+    executor: Optional[ChunkExecutor] = None,
+    context_policy: Optional[ContextPolicy] = None,
+) -> List[str]:
+    """
+    Translate a text in multiple chunks from the source language to the target language.
+
+    Args:
+        source_lang (str): The source language of the text.
+        target_lang (str): The target language for translation.
+        source_text_chunks (List[str]): A list of text chunks to be translated.
+        executor (ChunkExecutor, optional): Executor used to send the chunks concurrently.
+            Defaults to a thread pool limited to MAX_CONCURRENT_REQUESTS.
+        context_policy (ContextPolicy, optional): Decides how much surrounding text is shown.
+            Defaults to the policy selected by TRANSLATION_CONTEXT_POLICY.
+
+    Returns:
+        List[str]: A list of translated text chunks.
+    """
+
+    if context_policy is None:
+        context_policy = get_context_policy()
+
+    def translate_chunk(i: int) -> str:
+        return multichunk_initial_translation_chunk(
+            source_lang, target_lang, source_text_chunks, i, context_policy
+        )
+
+    return run_chunks(
+        translate_chunk, range(len(source_text_chunks)), executor
+    )
+
+
+def multichunk_reflect_on_translation(
+    source_lang: str,
+    target_lang: str,
+    source_text_chunks: List[str],
+    translation_1_chunks: List[str],
+    country: str = "",
+    executor: Optional[ChunkExecutor] = None,
+    context_policy: Optional[ContextPolicy] = None,
+) -> List[str]:
+    """
+    Provides constructive criticism and suggestions for improving a partial translation.
+
+    Args:
+        source_lang (str): The source language of the text.
+        target_lang (str): The target language of the translation.
+        source_text_chunks (List[str]): The source text divided into chunks.
+        translation_1_chunks (List[str]): The translated chunks corresponding to the source text chunks.
+        country (str): Country specified for the target language.
+        executor (ChunkExecutor, optional): Executor used to send the chunks concurrently.
+            Defaults to a thread pool limited to MAX_CONCURRENT_REQUESTS.
+        context_policy (ContextPolicy, optional): Decides how much surrounding text is shown.
+            Defaults to the policy selected by TRANSLATION_CONTEXT_POLICY.
+
+    Returns:
+        List[str]: A list of reflections containing suggestions for improving each translated chunk.
+    """
+
+    if context_policy is None:
+        context_policy = get_context_policy()
+
+    def reflect_on_chunk(i: int) -> str:
+        return multichunk_reflect_on_translation_chunk(
+            source_lang,
+            target_lang,
+            source_text_chunks,
+            i,
+            translation_1_chunks[i],
+            country,
+            context_policy,
+        )
+
+    return run_chunks(
+        reflect_on_chunk, range(len(source_text_chunks)), executor
+    )
 
 
 def multichunk_improve_translation(
@@ -469,6 +1288,8 @@ def multichunk_improve_translation(
     source_text_chunks: List[str],
     translation_1_chunks: List[str],
     reflection_chunks: List[str],
+    executor: Optional[ChunkExecutor] = None,
+    context_policy: Optional[ContextPolicy] = None,
 ) -> List[str]:
     """
     Improves the translation of a text from source language to target language by considering expert suggestions.
@@ -479,155 +1300,473 @@ def multichunk_improve_translation(
         source_text_chunks (List[str]): The source text divided into chunks.
         translation_1_chunks (List[str]): The initial translation of each chunk.
         reflection_chunks (List[str]): Expert suggestions for improving each translated chunk.
+        executor (ChunkExecutor, optional): Executor used to send the chunks concurrently.
+            Defaults to a thread pool limited to MAX_CONCURRENT_REQUESTS.
+        context_policy (ContextPolicy, optional): Decides how much surrounding text is shown.
+            Defaults to the policy selected by TRANSLATION_CONTEXT_POLICY.
 
     Returns:
         List[str]: The improved translation of each chunk.
     """
 
-    system_message = f"You are an expert linguist, specializing in translation editing from {source_lang} to {target_lang}."
+    if context_policy is None:
+        context_policy = get_context_policy()
+
+    def improve_chunk(i: int) -> str:
+        return multichunk_improve_translation_chunk(
+            source_lang,
+            target_lang,
+            source_text_chunks,
+            i,
+            translation_1_chunks[i],
+            reflection_chunks[i],
+            context_policy,
+        )
 
-    improvement_prompt = """Your task is to carefully read, then improve, a translation from {source_lang} to {target_lang}, taking into
-account a set of expert suggestions and constructive criticisms. Below, the source text, initial translation, and expert suggestions are provided.
+    return run_chunks(improve_chunk, range(len(source_text_chunks)), executor)
 
-The source text is below, delimited by XML tags <SOURCE_TEXT> and </SOURCE_TEXT>, and the part that has been translated
-is delimited by <TRANSLATE_THIS> and </TRANSLATE_THIS> within the source text. You can use the rest of the source text
-as context, but need to provide a translation only of the part indicated by <TRANSLATE_THIS> and </TRANSLATE_THIS>.
 
-<SOURCE_TEXT>
-{tagged_text}
-</SOURCE_TEXT>
+def multichunk_translate_chunk(
+    source_lang: str,
+    target_lang: str,
+    source_text_chunks: List[str],
+    i: int,
+    country: str = "",
+    context_policy: Optional[ContextPolicy] = None,
+    review_policy: Optional[ReviewPolicy] = None,
+) -> ChunkTranslation:
+    """
+    Run chunk i through the initial translation, reflection and improvement stages.
 
-To reiterate, only part of the text is being translated, shown here again between <TRANSLATE_THIS> and </TRANSLATE_THIS>:
-<TRANSLATE_THIS>
-{chunk_to_translate}
-</TRANSLATE_THIS>
+    Each stage only depends on the earlier stages of the same chunk, so chunks
+    can move through the pipeline independently of each other.
 
-The translation of the indicated part, delimited below by <TRANSLATION> and </TRANSLATION>, is as follows:
-<TRANSLATION>
-{translation_1_chunk}
-</TRANSLATION>
+    Args:
+        source_lang (str): The source language of the text.
+        target_lang (str): The target language for translation.
+        source_text_chunks (List[str]): The source text divided into chunks.
+        i (int): Index of the chunk to translate.
+        country (str): Country specified for the target language.
+        context_policy (ContextPolicy, optional): Decides how much surrounding text is shown.
+            Defaults to the policy selected by TRANSLATION_CONTEXT_POLICY.
+        review_policy (ReviewPolicy, optional): Decides whether to reflect and improve.
+            Defaults to the policy selected by TRANSLATION_REVIEW_POLICY.
 
-The expert translations of the indicated part, delimited below by <EXPERT_SUGGESTIONS> and </EXPERT_SUGGESTIONS>, are as follows:
-<EXPERT_SUGGESTIONS>
-{reflection_chunk}
-</EXPERT_SUGGESTIONS>
+    Returns:
+        ChunkTranslation: The outputs of the three stages for chunk i. Stages
+            the review policy skipped are empty, and translation_2 is then
+            translation_1.
+    """
+    if context_policy is None:
+        context_policy = get_context_policy()
+    if review_policy is None:
+        review_policy = get_review_policy()
+
+    return run_steps(
+        multichunk_steps(
+            source_lang,
+            target_lang,
+            source_text_chunks,
+            i,
+            country,
+            context_policy,
+            review_policy,
+        ),
+        {
+            "initial": multichunk_initial_translation_chunk,
+            "reflect": multichunk_reflect_on_translation_chunk,
+            "improve": multichunk_improve_translation_chunk,
+        },
+    )
 
-Taking into account the expert suggestions rewrite the translation to improve it, paying attention
-to whether there are ways to improve the translation's
 
-(i) accuracy (by correcting errors of addition, mistranslation, omission, or untranslated text),
-(ii) fluency (by applying {target_lang} grammar, spelling and punctuation rules and ensuring there are no unnecessary repetitions), \
-(iii) style (by ensuring the translations reflect the style of the source text)
-(iv) terminology (inappropriate for context, inconsistent use), or
-(v) other errors.
+def multichunk_steps(
+    source_lang: str,
+    target_lang: str,
+    source_text_chunks: List[str],
+    i: int,
+    country: str,
+    context_policy: ContextPolicy,
+    review_policy: ReviewPolicy,
+) -> ChunkSteps:
+    """
+    The stage calls of multichunk_translate_chunk, see run_steps.
 
-Output only the new translation of the indicated part and nothing else."""
+    The stages are "initial", "reflect" and "improve", called with the
+    arguments of the multichunk_*_chunk function of the same name.
+    """
+    chunk = source_text_chunks[i]
 
-    translation_2_chunks = []
-    for i in range(len(source_text_chunks)):
-        # Will translate chunk i
-        tagged_text = (
-            "".join(source_text_chunks[0:i])
-            + "<TRANSLATE_THIS>"
-            + source_text_chunks[i]
-            + "</TRANSLATE_THIS>"
-            + "".join(source_text_chunks[i + 1 :])
+    translation_1 = yield (
+        "initial",
+        (source_lang, target_lang, source_text_chunks, i, context_policy),
+    )
+    if not review_policy.review(chunk, translation_1):
+        return ChunkTranslation(i, chunk, translation_1, "", translation_1)
+
+    reflection = yield (
+        "reflect",
+        (
+            source_lang,
+            target_lang,
+            source_text_chunks,
+            i,
+            translation_1,
+            country,
+            context_policy,
+            review_policy.reflection_note,
+        ),
+    )
+    if not review_policy.improve(reflection):
+        return ChunkTranslation(
+            i, chunk, translation_1, reflection, translation_1
         )
 
-        prompt = improvement_prompt.format(
-            source_lang=source_lang,
-            target_lang=target_lang,
-            tagged_text=tagged_text,
-            chunk_to_translate=source_text_chunks[i],
-            translation_1_chunk=translation_1_chunks[i],
-            reflection_chunk=reflection_chunks[i],
-        )
+    translation_2 = yield (
+        "improve",
+        (
+            source_lang,
+            target_lang,
+            source_text_chunks,
+            i,
+            translation_1,
+            reflection,
+            context_policy,
+        ),
+    )
 
-        translation_2 = get_completion(prompt, system_message=system_message)
-        translation_2_chunks.append(translation_2)
+    return ChunkTranslation(i, chunk, translation_1, reflection, translation_2)
 
-    return translation_2_chunks
+
+def _matching_chunks(
+    completed: Optional[Mapping[int, ChunkTranslation]],
+    source_text_chunks: List[str],
+) -> Dict[int, ChunkTranslation]:
+    # A chunk translated before is only reused if the text was split the same way
+    return {
+        i: chunk
+        for i, chunk in (completed or {}).items()
+        if i < len(source_text_chunks)
+        and chunk.source_text == source_text_chunks[i]
+    }
+
+
+def iter_multichunk_translation(
+    source_lang: str,
+    target_lang: str,
+    source_text_chunks: List[str],
+    country: str = "",
+    executor: Optional[ChunkExecutor] = None,
+    context_policy: Optional[ContextPolicy] = None,
+    completed: Optional[Mapping[int, ChunkTranslation]] = None,
+    review_policy: Optional[ReviewPolicy] = None,
+) -> Iterator[ChunkTranslation]:
+    """
+    Translate multiple chunks, yielding each one as soon as it is finished.
+
+    Every chunk moves through initial translation, reflection and improvement
+    on its own, without waiting for the other chunks to finish a stage.
+    Chunks are yielded in document order: chunk i is yielded once it and all
+    chunks before it are done, while later chunks may still be in progress.
+    A chunk that fails does not stop the others: they are all finished, then
+    ChunkTranslationError is raised with every chunk that succeeded.
+
+    Args:
+        source_lang (str): The source language of the text chunks.
+        target_lang (str): The target language for translation.
+        source_text_chunks (List[str]): The list of source text chunks to be translated.
+        country (str): Country specified for the target language.
+        executor (ChunkExecutor, optional): Executor running the per-chunk pipelines.
+            Defaults to a thread pool limited to MAX_CONCURRENT_REQUESTS.
+        context_policy (ContextPolicy, optional): Decides how much surrounding text is shown.
+            Defaults to the policy selected by TRANSLATION_CONTEXT_POLICY.
+        completed (Mapping[int, ChunkTranslation], optional): Chunks translated
+            before, e.g. ChunkTranslationError.completed; they are not translated again.
+        review_policy (ReviewPolicy, optional): Decides whether to reflect and improve.
+            Defaults to the policy selected by TRANSLATION_REVIEW_POLICY.
+
+    Yields:
+        ChunkTranslation: The outputs of the three stages, one chunk at a time.
+
+    Raises:
+        ChunkTranslationError: If any chunk failed, once all the others are done.
+    """
+
+    if context_policy is None:
+        context_policy = get_context_policy()
+    if review_policy is None:
+        review_policy = get_review_policy()
+    completed = _matching_chunks(completed, source_text_chunks)
+
+    def translate_chunk(i: int) -> Union[ChunkTranslation, Exception]:
+        if i in completed:
+            return completed[i]
+        try:
+            return multichunk_translate_chunk(
+                source_lang,
+                target_lang,
+                source_text_chunks,
+                i,
+                country,
+                context_policy,
+                review_policy,
+            )
+        except Exception as e:
+            # Returned, not raised, so the executor keeps running the others
+            logger.debug("Chunk %d failed: %s", i, e)
+            return e
+
+    errors: Dict[int, Exception] = {}
+    with ExitStack() as stack:
+        if executor is None:
+            executor = stack.enter_context(get_executor())
+
+        results = executor.imap(
+            translate_chunk, range(len(source_text_chunks))
+        )
+        for i, result in enumerate(results):
+            if isinstance(result, Exception):
+                errors[i] = result
+                continue
+            completed[i] = result
+            if not errors:
+                yield result
+
+    if errors:
+        raise ChunkTranslationError(completed, errors)
 
 
 def multichunk_translation(
-    source_lang, target_lang, source_text_chunks, country: str = ""
+    source_lang,
+    target_lang,
+    source_text_chunks,
+    country: str = "",
+    executor: Optional[ChunkExecutor] = None,
+    context_policy: Optional[ContextPolicy] = None,
+    completed: Optional[Mapping[int, ChunkTranslation]] = None,
+    review_policy: Optional[ReviewPolicy] = None,
 ):
     """
     Improves the translation of multiple text chunks based on the initial translation and reflection.
 
+    The chunks are pipelined: each chunk is reflected on and improved as soon
+    as its own initial translation is available.
+
     Args:
         source_lang (str): The source language of the text chunks.
         target_lang (str): The target language for translation.
         source_text_chunks (List[str]): The list of source text chunks to be translated.
-        translation_1_chunks (List[str]): The list of initial translations for each source text chunk.
-        reflection_chunks (List[str]): The list of reflections on the initial translations.
         country (str): Country specified for the target language
+        executor (ChunkExecutor, optional): Executor running the per-chunk pipelines.
+            Defaults to a thread pool limited to MAX_CONCURRENT_REQUESTS.
+        context_policy (ContextPolicy, optional): Decides how much surrounding text is shown.
+            Defaults to the policy selected by TRANSLATION_CONTEXT_POLICY.
+        completed (Mapping[int, ChunkTranslation], optional): Chunks translated
+            before, e.g. ChunkTranslationError.completed; they are not translated again.
+        review_policy (ReviewPolicy, optional): Decides whether to reflect and improve.
+            Defaults to the policy selected by TRANSLATION_REVIEW_POLICY.
     Returns:
         List[str]: The list of improved translations for each source text chunk.
+
+    Raises:
+        ChunkTranslationError: If any chunk failed; it holds the chunks that did not.
     """
 
-    translation_1_chunks = multichunk_initial_translation(
-        source_lang, target_lang, source_text_chunks
-    )
+    return [
+        chunk.translation_2
+        for chunk in iter_multichunk_translation(
+            source_lang,
+            target_lang,
+            source_text_chunks,
+            country,
+            executor,
+            context_policy,
+            completed,
+            review_policy,
+        )
+    ]
 
-    reflection_chunks = multichunk_reflect_on_translation(
-        source_lang,
-        target_lang,
-        source_text_chunks,
-        translation_1_chunks,
-        country,
-    )
 
-    translation_2_chunks = multichunk_improve_translation(
-        source_lang,
-        target_lang,
-        source_text_chunks,
-        translation_1_chunks,
-        reflection_chunks,
-    )
+def split_source_text(
+    tokenized: TokenizedText, max_tokens: int = MAX_TOKENS_PER_CHUNK
+) -> List[str]:
+    """
+    Split a text into chunks of roughly equal token size, at most max_tokens each.
+
+    See chunker.chunk_text for how the boundaries are chosen.
+
+    Args:
+        tokenized (TokenizedText): The encoded text to split.
+        max_tokens (int): The maximum number of tokens per chunk.
+
+    Returns:
+        List[str]: The text chunks.
+    """
+    chunks = chunk_text(tokenized, max_tokens)
 
-    return translation_2_chunks
+    logger.debug("Split text into %d chunks", len(chunks))
 
+    return [chunk.text for chunk in chunks]
 
-def calculate_chunk_size(token_count: int, token_limit: int) -> int:
+
+class TranslationPlan:
+    """
+    The chunks of a text to translate, and those the translation memory already has.
+
+    translate, translate_stream and async_utils.atranslate share it, so the
+    memory is used the same way however the model is called. Made by
+    plan_translation.
+
+    Attributes:
+        memory (TranslationMemory): The memory chunks are looked up in and stored to.
+        scope (str): The memory scope of the translation settings.
+        review_policy (ReviewPolicy): Decides whether to reflect and improve.
+        context_policy (ContextPolicy, optional): Decides how much surrounding
+            text is shown; None for a single chunk.
+        source_text_chunks (List[str]): The chunks of the text.
+        single (bool): Whether the text is translated as a single chunk.
+        reused (Dict[int, ChunkTranslation]): The chunks found in the memory.
+    """
+
+    def __init__(
+        self,
+        memory: TranslationMemory,
+        scope: str,
+        review_policy: ReviewPolicy,
+        context_policy: Optional[ContextPolicy],
+        source_text_chunks: List[str],
+        single: bool,
+        reused: Dict[int, ChunkTranslation],
+    ):
+        self.memory = memory
+        self.scope = scope
+        self.review_policy = review_policy
+        self.context_policy = context_policy
+        self.source_text_chunks = source_text_chunks
+        self.single = single
+        self.reused = reused
+
+    def remember(self, chunks: Mapping[int, ChunkTranslation]) -> None:
+        """Store the chunks that were translated, not reused, in the memory."""
+        for i, chunk in chunks.items():
+            if i not in self.reused:
+                self.memory.put(
+                    self.scope,
+                    chunk.source_text,
+                    chunk.translation_1,
+                    chunk.reflection,
+                    chunk.translation_2,
+                )
+
+    def log(self) -> None:
+        """Log the prompt tokens, if the context policy recorded them, and the review policy's counts."""
+        usage = getattr(self.context_policy, "usage", None)
+        if usage is not None:
+            logger.info(
+                "Prompt tokens: %d, largest prompt %d, by stage %s",
+                usage.total,
+                usage.largest,
+                usage.by_stage(),
+            )
+        logger.info("Review policy %s", self.review_policy.stats)
+
+
+def plan_translation(
+    source_lang: str,
+    target_lang: str,
+    source_text: str,
+    country: str,
+    max_tokens: int = MAX_TOKENS_PER_CHUNK,
+    context_policy: Optional[ContextPolicy] = None,
+    memory: Optional[TranslationMemory] = None,
+    review_policy: Optional[ReviewPolicy] = None,
+) -> TranslationPlan:
     """
-    Calculate the chunk size based on the token count and token limit.
+    Split the source_text as translate() does and look its chunks up in the memory.
+
+    A text shorter than max_tokens is a single chunk. A longer one is split
+    by the memory when it is enabled, so the chunks translated before keep
+    their boundaries, see memory.TranslationMemory.split, and by
+    split_source_text otherwise.
 
     Args:
-        token_count (int): The total number of tokens.
-        token_limit (int): The maximum number of tokens allowed per chunk.
+        source_lang (str): The source language of the text.
+        target_lang (str): The target language for translation.
+        source_text (str): The text to be translated.
+        country (str): Country specified for the target language.
+        max_tokens (int): The maximum number of tokens per chunk.
+        context_policy (ContextPolicy, optional): Decides how much surrounding text is shown.
+            Defaults to the configured policy, recording the prompt tokens.
+        memory (TranslationMemory, optional): Defaults to the memory at TRANSLATION_MEMORY_PATH.
+        review_policy (ReviewPolicy, optional): Decides whether to reflect and improve.
+            Defaults to the policy selected by TRANSLATION_REVIEW_POLICY.
 
     Returns:
-        int: The calculated chunk size.
+        TranslationPlan: The chunks and the defaults filled in.
+    """
+    if memory is None:
+        memory = translation_memory
+    if review_policy is None:
+        review_policy = get_review_policy()
+    scope = memory.make_scope(
+        source_lang, target_lang, country, DEFAULT_OLLAMA_MODEL
+    )
 
-    Description:
-        This function calculates the chunk size based on the given token count and token limit.
-        If the token count is less than or equal to the token limit, the function returns the token count as the chunk size.
-        Otherwise, it calculates the number of chunks needed to accommodate all the tokens within the token limit.
-        The chunk size is determined by dividing the token limit by the number of chunks.
-        If there are remaining tokens after dividing the token count by the token limit,
-        the chunk size is adjusted by adding the remaining tokens divided by the number of chunks.
+    # Encoded once; the tokens are reused to split the text
+    tokenized = tokenize(source_text)
+    num_tokens_in_text = len(tokenized)
 
-    Example:
-        >>> calculate_chunk_size(1000, 500)
-        500
-        >>> calculate_chunk_size(1530, 500)
-        389
-        >>> calculate_chunk_size(2242, 500)
-        496
-    """
+    logger.debug("Text has %d tokens", num_tokens_in_text)
 
-    if token_count <= token_limit:
-        return token_count
+    if num_tokens_in_text < max_tokens:
+        logger.debug("Translating text as a single chunk")
+
+        reused = {}
+        stored = memory.get(scope, source_text)
+        if stored is not None:
+            logger.debug("Reusing the translation memory")
+            reused[0] = ChunkTranslation(0, source_text, *stored)
+        return TranslationPlan(
+            memory,
+            scope,
+            review_policy,
+            context_policy,
+            [source_text],
+            True,
+            reused,
+        )
 
-    num_chunks = (token_count + token_limit - 1) // token_limit
-    chunk_size = token_count // num_chunks
+    logger.debug("Translating text as multiple chunks")
+
+    reused = {}
+    if memory.enabled:
+        segments = memory.split(tokenized, scope, max_tokens)
+        source_text_chunks = [segment.text for segment in segments]
+        reused = {
+            i: ChunkTranslation(i, segment.text, *segment.stored)
+            for i, segment in enumerate(segments)
+            if segment.stored is not None
+        }
+        logger.info(
+            "Reusing %d of %d chunks from the translation memory",
+            len(reused),
+            len(segments),
+        )
+    else:
+        source_text_chunks = split_source_text(tokenized, max_tokens)
 
-    remaining_tokens = token_count % token_limit
-    if remaining_tokens > 0:
-        chunk_size += remaining_tokens // num_chunks
+    if context_policy is None:
+        context_policy = get_context_policy(usage=PromptTokenLog())
 
-    return chunk_size
+    return TranslationPlan(
+        memory,
+        scope,
+        review_policy,
+        context_policy,
+        source_text_chunks,
+        False,
+        reused,
+    )
 
 
 def translate(
@@ -636,41 +1775,250 @@ def translate(
     source_text,
     country,
     max_tokens=MAX_TOKENS_PER_CHUNK,
+    context_policy: Optional[ContextPolicy] = None,
+    completed: Optional[Mapping[int, ChunkTranslation]] = None,
+    memory: Optional[TranslationMemory] = None,
+    review_policy: Optional[ReviewPolicy] = None,
 ):
-    """Translate the source_text from source_lang to target_lang."""
+    """
+    Translate the source_text from source_lang to target_lang.
 
-    num_tokens_in_text = num_tokens_in_string(source_text)
+    If some chunks of a long text fail, ChunkTranslationError is raised with
+    the chunks that were translated; pass its completed to a second call
+    with the same text and max_tokens to translate only the rest.
 
-    ic(num_tokens_in_text)
+    With a translation memory (TRANSLATION_MEMORY_PATH, or the memory
+    argument), every translated chunk is stored, and chunks of the text that
+    were translated before are taken from the memory instead of the model,
+    see memory.TranslationMemory.split.
 
-    if num_tokens_in_text < max_tokens:
-        ic("Translating text as a single chunk")
+    The review policy (TRANSLATION_REVIEW_POLICY, or the review_policy
+    argument) decides which chunks are reflected on and improved; how many
+    calls it skipped is logged at INFO level.
 
-        final_translation = one_chunk_translate_text(
-            source_lang, target_lang, source_text, country
-        )
+    The prompt tokens of a long text's chunks are logged at INFO level as
+    well: the default context policy records them in a PromptTokenLog, as
+    does a context_policy argument created with one.
+    """
 
-        return final_translation
+    # Check the model once up front; completions then rely on the cached check
+    warm_up_model(DEFAULT_OLLAMA_MODEL)
 
-    else:
-        ic("Translating text as multiple chunks")
+    plan = plan_translation(
+        source_lang,
+        target_lang,
+        source_text,
+        country,
+        max_tokens,
+        context_policy,
+        memory,
+        review_policy,
+    )
 
-        token_size = calculate_chunk_size(
-            token_count=num_tokens_in_text, token_limit=max_tokens
+    if plan.single:
+        if plan.reused:
+            return plan.reused[0].translation_2
+
+        chunk = one_chunk_translation(
+            source_lang,
+            target_lang,
+            source_text,
+            country,
+            plan.memory,
+            plan.scope,
+            plan.review_policy,
         )
+        plan.remember({0: chunk})
+        plan.log()
 
-        ic(token_size)
+        return chunk.translation_2
 
-        text_splitter = RecursiveCharacterTextSplitter.from_tiktoken_encoder(
-            model_name="gpt-4",
-            chunk_size=token_size,
-            chunk_overlap=0,
+    try:
+        chunks = list(
+            iter_multichunk_translation(
+                source_lang,
+                target_lang,
+                plan.source_text_chunks,
+                country,
+                context_policy=plan.context_policy,
+                completed={**plan.reused, **(completed or {})},
+                review_policy=plan.review_policy,
+            )
         )
+    except ChunkTranslationError as e:
+        # The chunks that did succeed are not translated again next time
+        plan.remember(e.completed)
+        raise
+    finally:
+        plan.log()
+    plan.remember({chunk.index: chunk for chunk in chunks})
+
+    return "".join(chunk.translation_2 for chunk in chunks)
+
+
+def stream_steps(
+    steps: ChunkSteps,
+    stages: Mapping[str, Callable[..., str]],
+    prompts: Mapping[str, Callable[..., Tuple[str, str]]],
+    chunk: Optional[int] = None,
+) -> Generator[str, None, ChunkTranslation]:
+    """
+    Run the stage calls of a steps generator, streaming the final translation.
 
-        source_text_chunks = text_splitter.split_text(source_text)
+    The stages in prompts produce the final translation: their completion
+    is streamed from the prompt prompts[stage] builds from the stage's
+    arguments. The other stages are called through stages. If the review
+    policy ends the steps before such a stage, the chunk's translation_2 is
+    yielded whole.
+
+    Args:
+        steps (ChunkSteps): E.g. one_chunk_steps or multichunk_steps.
+        stages (Mapping[str, Callable]): The function called for each earlier stage.
+        prompts (Mapping[str, Callable]): The prompt function of each streamed stage.
+        chunk (int, optional): Index of the chunk, for tracing.
 
-        translation_2_chunks = multichunk_translation(
-            source_lang, target_lang, source_text_chunks, country
+    Yields:
+        str: Pieces of the final translation.
+
+    Returns:
+        ChunkTranslation: The value the steps return.
+    """
+    streamed = False
+    try:
+        stage, args = next(steps)
+        while True:
+            if stage in prompts:
+                system_message, prompt = prompts[stage](*args)
+                pieces = []
+                with trace_stage(stage, chunk):
+                    for piece in get_completion_stream(prompt, system_message):
+                        pieces.append(piece)
+                        yield piece
+                streamed = True
+                result = "".join(pieces)
+            else:
+                result = stages[stage](*args)
+            stage, args = steps.send(result)
+    except StopIteration as done:
+        translation = done.value
+    if not streamed:
+        yield translation.translation_2
+    return translation
+
+
+def translate_stream(
+    source_lang,
+    target_lang,
+    source_text,
+    country,
+    max_tokens=MAX_TOKENS_PER_CHUNK,
+    executor: Optional[ChunkExecutor] = None,
+    context_policy: Optional[ContextPolicy] = None,
+    review_policy: Optional[ReviewPolicy] = None,
+    memory: Optional[TranslationMemory] = None,
+) -> Iterator[str]:
+    """
+    Translate the source_text from source_lang to target_lang, yielding the final translation as it is generated.
+
+    Joining the yielded pieces gives the text translate() returns: the text
+    is split, and the translation memory used, as translate() does (see
+    plan_translation). The final translation is streamed token by token,
+    in document order; chunks taken from the memory are yielded whole. For
+    a long text every chunk is translated, reflected on and improved on the
+    executor, concurrently with the others. The improvement of the first
+    unfinished chunk is streamed as it is generated, while those of later
+    chunks are buffered until the chunks before them are out, so output
+    starts after the first chunk rather than after the whole document.
+
+    Args:
+        source_lang (str): The source language of the text.
+        target_lang (str): The target language for translation.
+        source_text (str): The text to be translated.
+        country (str): Country specified for the target language.
+        max_tokens (int): The maximum number of tokens per chunk.
+        executor (ChunkExecutor, optional): Executor running the chunks of a long text.
+            Defaults to a thread pool limited to MAX_CONCURRENT_REQUESTS.
+        context_policy (ContextPolicy, optional): Decides how much surrounding text is shown.
+            Defaults to the policy selected by TRANSLATION_CONTEXT_POLICY.
+        review_policy (ReviewPolicy, optional): Decides whether to reflect and improve.
+            Defaults to the policy selected by TRANSLATION_REVIEW_POLICY. A
+            chunk that is not improved yields its initial translation whole.
+        memory (TranslationMemory, optional): Defaults to the memory at TRANSLATION_MEMORY_PATH.
+
+    Yields:
+        str: Pieces of the final translation.
+    """
+
+    warm_up_model(DEFAULT_OLLAMA_MODEL)
+
+    plan = plan_translation(
+        source_lang,
+        target_lang,
+        source_text,
+        country,
+        max_tokens,
+        context_policy,
+        memory,
+        review_policy,
+    )
+
+    if plan.single:
+        if plan.reused:
+            yield plan.reused[0].translation_2
+            return
+
+        matches = plan.memory.similar(plan.scope, source_text)
+        chunk = yield from stream_steps(
+            one_chunk_steps(
+                source_lang,
+                target_lang,
+                source_text,
+                country,
+                matches,
+                plan.review_policy,
+            ),
+            {
+                "initial": one_chunk_initial_translation,
+                "reflect": one_chunk_reflect_on_translation,
+            },
+            {
+                "edit": one_chunk_edit_prompt,
+                "improve": one_chunk_improvement_prompt,
+            },
         )
+        plan.remember({0: chunk})
+        plan.log()
+        return
+
+    def stream_chunk(i: int) -> Iterator[str]:
+        if i in plan.reused:
+            yield plan.reused[i].translation_2
+            return
+        chunk = yield from stream_steps(
+            multichunk_steps(
+                source_lang,
+                target_lang,
+                plan.source_text_chunks,
+                i,
+                country,
+                plan.context_policy,
+                plan.review_policy,
+            ),
+            {
+                "initial": multichunk_initial_translation_chunk,
+                "reflect": multichunk_reflect_on_translation_chunk,
+            },
+            {"improve": multichunk_improvement_prompt},
+            i,
+        )
+        # Stored right away, like the chunks translate() finishes
+        plan.remember({i: chunk})
+
+    with ExitStack() as stack:
+        if executor is None:
+            executor = stack.enter_context(get_executor())
 
-        return "".join(translation_2_chunks)
+        yield from executor.imap_stream(
+            stream_chunk, range(len(plan.source_text_chunks))
+        )
+    plan.log()
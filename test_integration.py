@@ -10,7 +10,7 @@ sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'app'))
 
 import requests
-from app.patch import get_ollama_models, ensure_ollama_model, model_load
+from app.patch import TranslationSession, get_ollama_models, ensure_ollama_model
 
 
 def test_ollama_connection():
@@ -43,7 +43,7 @@ def test_get_models():
 def test_model_loading(model_name):
     """Test loading a model."""
     try:
-        model_load(
+        session = TranslationSession(
             endpoint="Ollama",
             base_url="http://localhost:11434",
             model=model_name,
@@ -52,24 +52,18 @@ def test_model_loading(model_name):
             rpm=60
         )
         print(f"✅ Successfully loaded model: {model_name}")
-        return True
+        return session
     except Exception as e:
         print(f"❌ Failed to load model {model_name}: {e}")
-        return False
+        return None
 
 
-def test_simple_completion():
+def test_simple_completion(session):
     """Test a simple completion."""
     try:
-        # Import after model is loaded
-        from app.patch import get_completion
-        
-        result = get_completion(
+        result = session.complete(
             prompt="Translate 'Hello, world!' from English to Spanish",
             system_message="You are a helpful translation assistant.",
-            model="llama3.1:8b",
-            temperature=0.3,
-            json_mode=False
         )
         
         if result and len(result.strip()) > 0:
@@ -100,12 +94,13 @@ def main():
         return False
     
     # Test 3: Load model
-    if not test_model_loading(model):
+    session = test_model_loading(model)
+    if session is None:
         print(f"\n❌ Cannot proceed without loading model {model}")
         return False
     
     # Test 4: Simple completion
-    if not test_simple_completion():
+    if not test_simple_completion(session):
         print("\n❌ Translation functionality is not working")
         return False
     
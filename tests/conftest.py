@@ -0,0 +1,35 @@
+import re
+
+import pytest
+
+
+class WordEncoding:
+    """Stand-in for a tiktoken encoding: one token per word and the space before it."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def encode(self, text):
+        self.calls += 1
+        return [m.start() for m in re.finditer(r"\s*\S+|\s+$", text)]
+
+    def decode_with_offsets(self, tokens):
+        return "", list(tokens)
+
+
+class CharEncoding(WordEncoding):
+    """Stand-in for a tiktoken encoding: one token per character."""
+
+    def encode(self, text):
+        self.calls += 1
+        return list(range(len(text)))
+
+
+@pytest.fixture
+def word_encoding():
+    return WordEncoding()
+
+
+@pytest.fixture
+def char_encoding():
+    return CharEncoding()
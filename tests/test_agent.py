@@ -13,6 +13,7 @@ from translation_agent.utils import one_chunk_improve_translation
 from translation_agent.utils import one_chunk_initial_translation
 from translation_agent.utils import one_chunk_reflect_on_translation
 from translation_agent.utils import one_chunk_translate_text
+from translation_agent.utils import translate_stream
 
 
 load_dotenv()
@@ -249,10 +250,10 @@ def test_one_chunk_translate_text(mocker):
 
     # Assert that the helper functions were called with the correct arguments
     mock_initial_translation.assert_called_once_with(
-        source_lang, target_lang, source_text
+        source_lang, target_lang, source_text, []
     )
     mock_reflect_on_translation.assert_called_once_with(
-        source_lang, target_lang, source_text, translation_1, country
+        source_lang, target_lang, source_text, translation_1, country, ""
     )
     mock_improve_translation.assert_called_once_with(
         source_lang, target_lang, source_text, translation_1, reflection
@@ -287,3 +288,37 @@ def test_num_tokens_in_string():
     assert (
         num_tokens_in_string("Hello, world!", encoding_name="p50k_base") == 4
     )
+
+
+def test_translate_stream_yields_final_translation_in_order(mocker, word_encoding):
+    chunks = ["a. ", "b. ", "c. "]
+    mocker.patch("translation_agent.utils.warm_up_model")
+    # The default context policy counts the prompt tokens
+    mocker.patch(
+        "translation_agent.utils.get_encoding", return_value=word_encoding
+    )
+    tokenize = mocker.patch("translation_agent.utils.tokenize")
+    tokenize.return_value.__len__.return_value = 3000
+    mocker.patch(
+        "translation_agent.utils.split_source_text", return_value=chunks
+    )
+    mocker.patch(
+        "translation_agent.utils.get_completion",
+        side_effect=lambda prompt, system_message: "draft",
+    )
+
+    def fake_stream(prompt, system_message):
+        chunk = prompt.rsplit("<TRANSLATE_THIS>\n", 1)[1].split("\n", 1)[0]
+        yield from chunk.upper()
+
+    mocker.patch(
+        "translation_agent.utils.get_completion_stream",
+        side_effect=fake_stream,
+    )
+
+    pieces = list(
+        translate_stream("English", "Spanish", "".join(chunks), "", 1000)
+    )
+
+    assert len(pieces) == 9
+    assert "".join(pieces) == "A. B. C. "
@@ -0,0 +1,226 @@
+import os
+import sys
+
+import pytest
+
+
+# The web app's modules live in app/ and need its extra dependencies
+pytest.importorskip("gradio")
+pytest.importorskip("openai")
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "app"))
+
+import patch
+from patch import RateLimiter
+from patch import TokenBucket
+
+
+@pytest.fixture(autouse=True)
+def fresh_endpoints(mocker):
+    mocker.patch.dict(patch.rate_limiters, clear=True)
+    mocker.patch.dict(patch.backends, clear=True)
+
+
+@pytest.fixture
+def clock(mocker):
+    now = [1000.0]
+    mocker.patch("patch.time.monotonic", side_effect=lambda: now[0])
+    sleep = mocker.patch(
+        "patch.time.sleep",
+        side_effect=lambda s: now.__setitem__(0, now[0] + s),
+    )
+    return sleep
+
+
+def test_reconfigure_does_not_refill(clock):
+    limiter = RateLimiter(rpm=2)
+    limiter.acquire()
+    limiter.acquire()
+
+    # Switching the budget away and back does not give a fresh burst
+    limiter.configure(4)
+    limiter.configure(2)
+    limiter.acquire()
+
+    clock.assert_called_once_with(pytest.approx(30.0))
+
+
+def test_sessions_keep_their_own_budgets(clock):
+    first = patch.TranslationSession("Ollama", "", "llama3.1:8b", rpm=2)
+    second = patch.TranslationSession("Ollama", "", "llama3.1:8b", rpm=600)
+
+    # Another user's sliders change neither this session's budget nor the
+    # endpoint's
+    assert first.limiter is not second.limiter
+    assert second.backend.limiter is first.backend.limiter
+    assert first.limiter.rpm == 2
+    assert first.backend.limiter.rpm == patch.ENDPOINT_RPM
+
+    patch.acquire_all(first.limiters)
+    patch.acquire_all(first.limiters)
+    clock.assert_not_called()
+    patch.acquire_all(first.limiters)
+    clock.assert_called_once_with(pytest.approx(30.0))
+
+
+def test_sessions_share_the_endpoint_budget(clock, mocker):
+    mocker.patch("patch.ENDPOINT_RPM", 4)
+    first = patch.TranslationSession("Ollama", "", "llama3.1:8b", rpm=600)
+    second = patch.TranslationSession("Ollama", "", "qwen2:7b", rpm=600)
+
+    for session in (first, second, first, second):
+        patch.acquire_all(session.limiters)
+    clock.assert_not_called()
+
+    # The endpoint's budget is spent, however large the session's is
+    patch.acquire_all(second.limiters)
+    clock.assert_called_once_with(pytest.approx(15.0))
+
+
+@pytest.mark.parametrize("per_minute", [0, -5])
+def test_token_bucket_rejects_empty_budgets(per_minute):
+    with pytest.raises(ValueError):
+        TokenBucket(per_minute)
+
+
+def test_rate_limiter_rejects_invalid_budgets():
+    with pytest.raises(ValueError):
+        RateLimiter(rpm=0)
+    with pytest.raises(ValueError):
+        RateLimiter(rpm=60, tpm=-1)
+    limiter = RateLimiter(rpm=60, tpm=0)
+    assert limiter.tokens is None
+    with pytest.raises(ValueError):
+        limiter.configure(0)
+    assert limiter.rpm == 60
+
+
+def test_token_bucket_refills_up_to_capacity():
+    bucket = TokenBucket(60)
+    now = bucket.updated
+
+    assert bucket.reserve(60, now) == 0
+    # One per second comes back
+    assert bucket.reserve(2, now) == pytest.approx(2.0)
+    assert bucket.reserve(0, now + 2) == 0
+    assert bucket.level == pytest.approx(0)
+    bucket.reserve(0, now + 600)
+    assert bucket.level == 60
+
+
+def test_rate_limiter_blocks_when_requests_run_out(clock):
+    limiter = RateLimiter(rpm=3)
+    for _ in range(3):
+        limiter.acquire()
+    clock.assert_not_called()
+
+    # Each further request waits for the next one to refill
+    limiter.acquire()
+    limiter.acquire()
+    assert [call.args[0] for call in clock.call_args_list] == [
+        pytest.approx(20.0),
+        pytest.approx(20.0),
+    ]
+
+
+def test_rate_limiter_charges_prompt_and_completion_tokens(clock):
+    limiter = RateLimiter(rpm=1000, tpm=600)
+    limiter.acquire(400)
+    limiter.consume(200)
+    clock.assert_not_called()
+
+    # 600 tokens spent: the next 100 wait for 10 tokens per second
+    limiter.acquire(100)
+    clock.assert_called_once_with(pytest.approx(10.0))
+
+
+def test_unlimited_tokens_are_not_counted(clock):
+    limiter = RateLimiter(rpm=1000)
+    limiter.acquire(10**6)
+    limiter.consume(10**6)
+
+    assert limiter.tokens is None
+    clock.assert_not_called()
+
+
+def test_configure_keeps_unchanged_budgets(clock):
+    limiter = RateLimiter(rpm=60, tpm=6000)
+    requests, tokens = limiter.requests, limiter.tokens
+    limiter.acquire(1000)
+
+    limiter.configure(60, 6000)
+    assert (limiter.requests, limiter.tokens) == (requests, tokens)
+
+    limiter.configure(120, 0)
+    assert limiter.requests is requests
+    assert requests.capacity == 120 and requests.level == pytest.approx(59)
+    assert limiter.tokens is None
+
+
+def test_backends_are_reused_per_endpoint_url_and_key(mocker):
+    make_client = mocker.patch("patch.make_client")
+
+    backend = patch.get_backend("CUSTOM", "http://a/v1", "key")
+    assert patch.get_backend("CUSTOM", "http://a/v1", "key") is backend
+    assert patch.get_backend("CUSTOM", "http://b/v1", "key") is not backend
+    assert patch.get_backend("CUSTOM", "http://a/v1", "other") is not backend
+    # Built once per distinct backend
+    assert make_client.call_count == 3
+
+    first = patch.TranslationSession("CUSTOM", "http://a/v1", "m", "key")
+    second = patch.TranslationSession("CUSTOM", "http://a/v1", "n", "key")
+    assert first.backend is second.backend is backend
+    assert first.client is backend.client
+    # Budgets are kept per endpoint, URL and key, like the backends
+    assert patch.get_backend("CUSTOM", "http://a/v1", "other").limiter is not (
+        backend.limiter
+    )
+    assert patch.get_backend("CUSTOM", "http://b/v1", "key").limiter is not (
+        backend.limiter
+    )
+    assert first.backend.limiter is second.backend.limiter
+
+
+def test_ollama_backends_share_one_connection_pool():
+    first = patch.TranslationSession("Ollama", "", "llama3.1:8b")
+    second = patch.TranslationSession("Ollama", "", "qwen2:7b")
+
+    assert first.backend.http is second.backend.http
+    assert first.backend.base_url == patch.OLLAMA_BASE_URL
+
+
+@pytest.mark.parametrize(
+    "stages, expected",
+    [
+        (["reflect", "improve"], ["primary", "additional", "additional"]),
+        (["initial"], ["additional", "primary", "primary"]),
+        ([], ["primary", "primary", "primary"]),
+    ],
+)
+def test_route_stages_sends_each_stage_to_its_backend(
+    mocker, stages, expected
+):
+    mocker.patch("patch.make_client")
+    primary = patch.TranslationSession("Ollama", "", "llama3.1:8b")
+    additional = patch.TranslationSession("CUSTOM", "http://a/v1", "m", "k")
+    sessions = {"primary": primary, "additional": additional}
+
+    routes = patch.route_stages(primary, additional, stages)
+
+    assert [routes[stage] for stage in patch.STAGES] == [
+        sessions[name] for name in expected
+    ]
+    endpoints = {"primary": "Ollama", "additional": "CUSTOM"}
+    assert [routes[stage].backend.endpoint for stage in patch.STAGES] == [
+        endpoints[name] for name in expected
+    ]
+
+
+def test_route_stages_without_additional_endpoint():
+    session = patch.TranslationSession("Ollama", "", "llama3.1:8b")
+
+    routes = patch.route_stages(session, None, ["reflect", "improve"])
+
+    assert set(routes) == set(patch.STAGES)
+    assert all(routes[stage] is session for stage in patch.STAGES)
+    with pytest.raises(ValueError):
+        patch.route_stages(session, session, ["review"])
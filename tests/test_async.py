@@ -0,0 +1,261 @@
+import asyncio
+import json
+import re
+import threading
+
+import httpx
+
+from translation_agent.async_client import AsyncOllamaClient
+from translation_agent.async_client import get_async_client
+from translation_agent.async_utils import aget_completion
+from translation_agent.async_utils import amultichunk_translation
+from translation_agent.async_utils import aone_chunk_translate_text
+from translation_agent.async_utils import atranslate
+from translation_agent.cache import CompletionCache
+from translation_agent.context_policy import FullDocumentContext
+from translation_agent.memory import TranslationMemory
+from translation_agent.utils import one_chunk_improvement_prompt
+from translation_agent.utils import one_chunk_initial_translation_prompt
+
+
+def mock_client(handler, max_concurrency=2):
+    client = AsyncOllamaClient(
+        base_url="http://ollama.test", max_concurrency=max_concurrency
+    )
+    client._client()
+    client._http = httpx.AsyncClient(
+        base_url=client.base_url, transport=httpx.MockTransport(handler)
+    )
+    return client
+
+
+def test_async_client_generate_and_list_models():
+    def handler(request):
+        if request.url.path == "/api/tags":
+            return httpx.Response(200, json={"models": [{"name": "m:1"}]})
+        payload = json.loads(request.content)
+        return httpx.Response(200, json={"response": payload["prompt"][::-1]})
+
+    async def run():
+        async with mock_client(handler) as client:
+            assert await client.get_model_names() == ["m:1"]
+            assert await client.is_model_available("m:1")
+            return await client.generate("m:1", "abc")
+
+    assert asyncio.run(run()) == "cba"
+
+
+def test_async_client_limits_concurrency():
+    in_flight = [0]
+    peak = [0]
+
+    async def handler(request):
+        in_flight[0] += 1
+        peak[0] = max(peak[0], in_flight[0])
+        await asyncio.sleep(0.01)
+        in_flight[0] -= 1
+        return httpx.Response(200, json={"response": "ok"})
+
+    async def run():
+        async with mock_client(handler, max_concurrency=3) as client:
+            return await asyncio.gather(
+                *(client.generate("m", str(i)) for i in range(10))
+            )
+
+    assert asyncio.run(run()) == ["ok"] * 10
+    assert peak[0] == 3
+
+
+def test_shared_async_client_is_closed_with_its_loop():
+    async def run():
+        client = get_async_client()
+        assert get_async_client() is client
+        client._client()
+        return client, client._http
+
+    client, http = asyncio.run(run())
+
+    assert http.is_closed
+    assert client._http is None
+
+
+def test_aone_chunk_translate_text_uses_shared_prompts(mocker):
+    calls = []
+
+    async def fake_completion(prompt, system_message):
+        calls.append((system_message, prompt))
+        return f"step {len(calls)}"
+
+    mocker.patch(
+        "translation_agent.async_utils.aget_completion",
+        side_effect=fake_completion,
+    )
+
+    result = asyncio.run(
+        aone_chunk_translate_text("English", "Spanish", "Hello", "Mexico")
+    )
+
+    assert result == "step 3"
+    assert calls[0] == one_chunk_initial_translation_prompt(
+        "English", "Spanish", "Hello"
+    )
+    assert calls[2] == one_chunk_improvement_prompt(
+        "English", "Spanish", "Hello", "step 1", "step 2"
+    )
+
+
+def test_amultichunk_translation_keeps_order(mocker):
+    async def fake_completion(prompt, system_message):
+        chunk = prompt.rsplit("<TRANSLATE_THIS>\n", 1)[1].split("\n", 1)[0]
+        await asyncio.sleep(0.001 * (5 - len(chunk)))
+        return chunk.upper()
+
+    mocker.patch(
+        "translation_agent.async_utils.aget_completion",
+        side_effect=fake_completion,
+    )
+
+    result = asyncio.run(
+        amultichunk_translation(
+            "English",
+            "Spanish",
+            ["a. ", "bb. ", "c. "],
+            context_policy=FullDocumentContext(),
+        )
+    )
+
+    assert result == ["A. ", "BB. ", "C. "]
+
+
+class ThreadRecordingCache(CompletionCache):
+    def __init__(self, path):
+        super().__init__(path)
+        self.threads = []
+
+    def get(self, key):
+        self.threads.append(threading.current_thread())
+        return super().get(key)
+
+    def set(self, key, value):
+        self.threads.append(threading.current_thread())
+        super().set(key, value)
+
+
+def test_aget_completion_uses_the_cache_off_the_event_loop(mocker, tmp_path):
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        return httpx.Response(200, json={"message": {"content": "Hola"}})
+
+    cache = ThreadRecordingCache(str(tmp_path / "cache.sqlite3"))
+    mocker.patch("translation_agent.async_utils.completion_cache", cache)
+    mocker.patch(
+        "translation_agent.async_utils.ensure_model_available",
+        return_value=True,
+    )
+    mocker.patch("translation_agent.async_utils.OLLAMA_API", "chat")
+
+    async def run():
+        async with mock_client(handler) as client:
+            first = await aget_completion("Hello", model="m", client=client)
+            second = await aget_completion("Hello", model="m", client=client)
+            return first, second, threading.current_thread()
+
+    first, second, loop_thread = asyncio.run(run())
+    cache.close()
+
+    assert first == second == "Hola"
+    assert len(requests) == 1
+    # get, set, then the cached get
+    assert len(cache.threads) == 3
+    assert loop_thread not in cache.threads
+
+
+def test_aget_completion_checks_a_cached_model_on_the_loop(mocker):
+    mocker.patch(
+        "translation_agent.async_utils.model_registry.is_cached",
+        return_value=True,
+    )
+    ensure = mocker.patch(
+        "translation_agent.async_utils.ensure_model_available"
+    )
+    to_thread = mocker.patch("translation_agent.async_utils.asyncio.to_thread")
+    mocker.patch("translation_agent.async_utils.OLLAMA_API", "chat")
+
+    def handler(request):
+        return httpx.Response(200, json={"message": {"content": "Hola"}})
+
+    async def run():
+        async with mock_client(handler) as client:
+            return await aget_completion(
+                "Hello", model="m", use_cache=False, client=client
+            )
+
+    assert asyncio.run(run()) == "Hola"
+    ensure.assert_not_called()
+    to_thread.assert_not_called()
+
+
+def test_atranslate_uses_the_translation_memory(
+    mocker, tmp_path, word_encoding
+):
+    for module in ("tokens", "utils"):
+        mocker.patch(
+            f"translation_agent.{module}.get_encoding",
+            return_value=word_encoding,
+        )
+    mocker.patch("translation_agent.async_utils.warm_up_model")
+    calls = []
+
+    async def fake_completion(prompt, system_message):
+        calls.append(prompt)
+        for pattern in (
+            r"<TRANSLATE_THIS>\n(.*?)\n</TRANSLATE_THIS>",
+            r"<SOURCE_TEXT>\n(.*?)\n</SOURCE_TEXT>",
+            r"English: (.*)\n\nSpanish:",
+        ):
+            found = re.findall(pattern, prompt, re.DOTALL)
+            if found:
+                return found[-1].upper()
+
+    mocker.patch(
+        "translation_agent.async_utils.aget_completion",
+        side_effect=fake_completion,
+    )
+    paragraphs = [f"Paragraph {n} says a few words here." for n in range(4)]
+    text = "\n\n".join(paragraphs)
+    clause = (
+        "The licensee shall not sublicense, sell, lease or otherwise "
+        "transfer the software to any third party without the prior "
+        "written consent of Acme Corporation."
+    )
+
+    with TranslationMemory(str(tmp_path / "memory.sqlite3")) as memory:
+
+        async def run(source_text, max_tokens=10):
+            return await atranslate(
+                "English",
+                "Spanish",
+                source_text,
+                "",
+                max_tokens,
+                memory=memory,
+            )
+
+        first = asyncio.run(run(text))
+        assert calls
+
+        calls.clear()
+        assert asyncio.run(run(text)) == first
+        assert not calls
+
+        asyncio.run(run(clause, 1000))
+        calls.clear()
+        other = clause.replace("Acme", "Apex")
+        edited = asyncio.run(run(other, 1000))
+
+    assert edited == other.upper()
+    # A near-duplicate is edited in a single call
+    assert len(calls) == 1
+    assert "<EARLIER_SOURCE>" in calls[0]
@@ -0,0 +1,388 @@
+import json
+import re
+
+import pytest
+
+from translation_agent.batch import JsonSegments
+from translation_agent.batch import SUGGESTIONS_SCHEMA
+from translation_agent.batch import TRANSLATION_SCHEMA
+from translation_agent.batch import get_segment_format
+from translation_agent.batch import pack_texts
+from translation_agent.batch import parse_segments
+from translation_agent.batch import translate_batch
+from translation_agent.cache import CompletionCache
+from translation_agent.config import DEFAULT_OLLAMA_MODEL
+from translation_agent.executor import SerialExecutor
+from translation_agent.memory import TranslationMemory
+from translation_agent.review_policy import NO_SUGGESTIONS, AdaptiveReview
+from translation_agent.utils import ChunkTranslationError
+
+
+TEXTS = [f"Data point {n} has a few words." for n in range(10)]
+
+SEGMENT = re.compile(r"<SEGMENT_(\d+)>\n(.*?)\n</SEGMENT_\1>", re.DOTALL)
+JSON_SEGMENTS = re.compile(r":\n\n(\{\n.*?\n\})\n\n", re.DOTALL)
+
+# Where each chunk prompt of a long text shows the chunk being translated
+CHUNK_SOURCE = r"<TRANSLATE_THIS>\n(.*?)\n</TRANSLATE_THIS>"
+# Where each one-chunk prompt shows the text being translated
+PROMPT_SOURCES = [
+    r"<SOURCE_TEXT>\n(.*?)\n</SOURCE_TEXT>",
+    r"English: (.*)\n\nSpanish:",
+]
+
+
+class FakeModel:
+    """Upper-cases the texts it is asked about, batched or not."""
+
+    def __init__(self, drop=()):
+        self.drop = set(drop)
+        self.prompts = []
+        self.suggestions = ["Use a better word."]
+
+    def __call__(
+        self, prompt, system_message, json_mode=False, use_cache=True
+    ):
+        self.prompts.append(prompt)
+        if json_mode:
+            return self.answer_json(prompt)
+        segments = SEGMENT.findall(prompt)
+        if segments:
+            return "Here you go:\n" + "\n".join(
+                f"<SEGMENT_{n}>\n{self.answer(text)}\n</SEGMENT_{n}>"
+                for n, text in segments
+                if self.source(text) not in self.drop
+            )
+        for pattern in [CHUNK_SOURCE] + PROMPT_SOURCES:
+            found = re.findall(pattern, prompt, re.DOTALL)
+            if found:
+                return self.answer(found[-1])
+
+    def source(self, text):
+        found = re.findall(PROMPT_SOURCES[0], text, re.DOTALL)
+        return found[0] if found else text
+
+    def answer(self, text):
+        return self.source(text).upper()
+
+    def answer_json(self, prompt):
+        segments = json.loads(JSON_SEGMENTS.search(prompt).group(1))
+        answers = {}
+        for n, segment in segments.items():
+            if isinstance(segment, dict):
+                segment = segment["source_text"]
+            text = segment
+            if text in self.drop:
+                # Malformed: the wrong type
+                answers[n] = 42
+            elif "list of suggestions" in prompt:
+                answers[n] = self.suggestions
+            else:
+                answers[n] = text.upper()
+        return json.dumps(answers)
+
+    @property
+    def batched(self):
+        return [prompt for prompt in self.prompts if "<SEGMENT_1>" in prompt]
+
+
+@pytest.fixture
+def model(mocker, word_encoding):
+    mocker.patch(
+        "translation_agent.tokens.get_encoding", return_value=word_encoding
+    )
+    mocker.patch("translation_agent.utils.warm_up_model")
+    model = FakeModel()
+    mocker.patch("translation_agent.utils.get_completion", side_effect=model)
+    return model
+
+
+def test_pack_texts_respects_budget(word_encoding, mocker):
+    mocker.patch(
+        "translation_agent.tokens.get_encoding", return_value=word_encoding
+    )
+    long_text = "word " * 30
+    texts = ["one two three"] * 5 + [long_text] + ["four five"] * 3
+
+    batches, too_long = pack_texts(texts, max_tokens=10, max_segments=4)
+
+    assert too_long == [5]
+    assert batches == [[0, 1, 2], [3, 4, 6, 7], [8]]
+
+
+def test_parse_segments_tolerates_chatter_and_gaps():
+    response = (
+        "Sure! Here are the translations:\n"
+        "<SEGMENT_1>\nHola\n</SEGMENT_1>\n"
+        "<segment_2> <TRANSLATION>Adiós</TRANSLATION> </segment_2>\n"
+        "<SEGMENT_3>\n\n</SEGMENT_3>\n"
+        "<SEGMENT_1>Otra vez</SEGMENT_1>\n"
+        "<SEGMENT_9>Nueve</SEGMENT_9>\n"
+        "<SEGMENT_4>\n<b>Sin cerrar</b>"
+    )
+
+    assert parse_segments(response, 4) == {0: "Hola", 1: "Adiós"}
+
+
+def test_translate_batch_packs_every_stage(model):
+    result = translate_batch(
+        "English",
+        "Spanish",
+        TEXTS,
+        max_tokens=1000,
+        max_segments=5,
+        executor=SerialExecutor(),
+        memory=TranslationMemory(),
+    )
+
+    assert result == [text.upper() for text in TEXTS]
+    # Two batches of five texts, three stages each
+    assert len(model.prompts) == 6
+    assert len(model.batched) == 6
+
+
+def test_unparsed_segments_fall_back_to_single_calls(model):
+    model.drop = {TEXTS[1]}
+    texts = TEXTS[:3] + ["", TEXTS[0]]
+
+    result = translate_batch(
+        "English",
+        "Spanish",
+        texts,
+        executor=SerialExecutor(),
+        memory=TranslationMemory(),
+    )
+
+    assert result == [text.upper() for text in texts]
+    # One batched call and one single call per stage
+    assert len(model.batched) == 3
+    assert len(model.prompts) == 6
+    single = [p for p in model.prompts if "<SEGMENT_1>" not in p]
+    assert all(TEXTS[1] in prompt for prompt in single)
+
+
+def test_review_policy_and_memory_shrink_the_batches(model, tmp_path):
+    heading = "Results"
+    with TranslationMemory(str(tmp_path / "memory.sqlite3")) as memory:
+        translate_batch(
+            "English",
+            "Spanish",
+            [heading] + TEXTS[:3],
+            executor=SerialExecutor(),
+            memory=memory,
+            review_policy=AdaptiveReview(),
+        )
+        initial, reflect, improve = model.batched
+        assert heading in initial
+        assert heading not in reflect and heading not in improve
+        assert NO_SUGGESTIONS in reflect
+
+        model.prompts.clear()
+        texts = TEXTS[:3] + ["Nothing like the others."]
+        result = translate_batch(
+            "English",
+            "Spanish",
+            texts,
+            executor=SerialExecutor(),
+            memory=memory,
+        )
+
+    assert result == [text.upper() for text in texts]
+    # Only the new text is translated, on its own
+    assert len(model.prompts) == 3
+    assert not model.batched
+
+
+def test_json_segments_validate_each_output():
+    segments = get_segment_format("json")
+    response = (
+        "```json\n"
+        '{"translations": {"1": "Hola", "2": "", "3": 7, "x": "?", '
+        '"9": "Nueve", "4": " Adiós "}}\n'
+        "```"
+    )
+
+    assert segments.parse(response, 4, TRANSLATION_SCHEMA) == {
+        0: "Hola",
+        3: "Adiós",
+    }
+    assert segments.parse("Sorry, I can't.", 4, TRANSLATION_SCHEMA) == {}
+    assert segments.parse(
+        '{"1": ["Use tú.", "Drop the comma."], "2": [], "3": [""]}',
+        3,
+        SUGGESTIONS_SCHEMA,
+    ) == {0: "1. Use tú.\n2. Drop the comma.", 1: NO_SUGGESTIONS}
+
+
+def test_json_batches_use_json_mode_and_suggestion_lists(model, mocker):
+    completion = mocker.patch(
+        "translation_agent.utils.get_completion", side_effect=model
+    )
+    model.suggestions = []
+
+    result = translate_batch(
+        "English",
+        "Spanish",
+        TEXTS[:4],
+        executor=SerialExecutor(),
+        memory=TranslationMemory(),
+        review_policy=AdaptiveReview(),
+        segment_format=JsonSegments(),
+    )
+
+    assert result == [text.upper() for text in TEXTS[:4]]
+    # No suggestions for any text: the improvement is skipped
+    assert completion.call_count == 2
+    assert all(call.kwargs["json_mode"] for call in completion.call_args_list)
+    assert '"source_text": "Data point 0' in model.prompts[1]
+
+
+def test_json_retries_only_malformed_outputs(model):
+    model.drop = {TEXTS[1], TEXTS[3]}
+
+    result = translate_batch(
+        "English",
+        "Spanish",
+        TEXTS[:5],
+        executor=SerialExecutor(),
+        memory=TranslationMemory(),
+        segment_format=JsonSegments(),
+    )
+
+    assert result == [text.upper() for text in TEXTS[:5]]
+    # Per stage: the batch, a retry of the two malformed outputs, then one
+    # call for each of them
+    assert len(model.prompts) == 3 * 4
+    initial, retry, first, second = model.prompts[:4]
+    assert all(text in initial for text in TEXTS[:5])
+    assert TEXTS[1] in retry and TEXTS[3] in retry
+    assert TEXTS[0] not in retry and TEXTS[2] not in retry
+    assert first.endswith(f"English: {TEXTS[1]}\n\nSpanish:")
+    assert second.endswith(f"English: {TEXTS[3]}\n\nSpanish:")
+
+
+def test_unreadable_batches_are_not_cached(model, mocker, tmp_path):
+    cache = CompletionCache(str(tmp_path / "cache.sqlite3"))
+    mocker.patch("translation_agent.batch.completion_cache", cache)
+    completion = mocker.patch(
+        "translation_agent.utils.get_completion",
+        side_effect=["I cannot do that.", "Still no.", *TEXTS[:2]],
+    )
+
+    result = translate_batch(
+        "English",
+        "Spanish",
+        TEXTS[:2],
+        executor=SerialExecutor(),
+        memory=TranslationMemory(),
+        review_policy=AdaptiveReview(min_words=100),
+    )
+
+    assert result == TEXTS[:2]
+    # The retry went to the server, and neither bad response was cached
+    assert completion.call_count == 4
+    assert not any(
+        call.kwargs["use_cache"] for call in completion.call_args_list[:2]
+    )
+    assert len(cache) == 0
+
+    # A batch that is read in full is cached
+    mocker.patch("translation_agent.utils.get_completion", side_effect=model)
+    for _ in range(2):
+        translate_batch(
+            "English",
+            "Spanish",
+            TEXTS[2:4],
+            executor=SerialExecutor(),
+            memory=TranslationMemory(),
+            review_policy=AdaptiveReview(min_words=100),
+        )
+    assert len(model.prompts) == 1
+    cache.close()
+
+
+def test_failed_batch_keeps_the_finished_ones(model, mocker, tmp_path):
+    def flaky(prompt, system_message, **kwargs):
+        if TEXTS[3] in prompt:
+            raise Exception("Failed to get completion from Ollama")
+        return model(prompt, system_message, **kwargs)
+
+    mocker.patch("translation_agent.utils.get_completion", side_effect=flaky)
+    with TranslationMemory(str(tmp_path / "memory.sqlite3")) as memory:
+        with pytest.raises(ChunkTranslationError) as raised:
+            translate_batch(
+                "English",
+                "Spanish",
+                TEXTS[:4],
+                max_segments=2,
+                executor=SerialExecutor(),
+                memory=memory,
+            )
+        assert sorted(raised.value.errors) == [2, 3]
+        assert sorted(raised.value.completed) == [0, 1]
+        scope = memory.make_scope(
+            "English", "Spanish", "", DEFAULT_OLLAMA_MODEL
+        )
+        stored = memory.get(scope, TEXTS[0])
+        assert stored.translation_2 == TEXTS[0].upper()
+
+    # Without a memory, the finished texts are passed back instead
+    mocker.patch("translation_agent.utils.get_completion", side_effect=model)
+    model.prompts.clear()
+    result = translate_batch(
+        "English",
+        "Spanish",
+        TEXTS[:4],
+        max_segments=2,
+        executor=SerialExecutor(),
+        memory=TranslationMemory(),
+        completed=raised.value.completed,
+    )
+    assert result == [text.upper() for text in TEXTS[:4]]
+    assert len(model.prompts) == 3
+    assert all(TEXTS[0] not in prompt for prompt in model.prompts)
+
+
+def test_long_texts_are_chunked_on_the_same_executor(model, mocker):
+    paragraphs = [f"Paragraph {n} says a few words here." for n in range(4)]
+    long_text = "\n\n".join(paragraphs)
+    texts = TEXTS[:3] + [long_text]
+    executor = SerialExecutor()
+    imap = mocker.spy(executor, "imap")
+
+    def flaky(prompt, system_message, **kwargs):
+        if f"<TRANSLATE_THIS>\n{paragraphs[2]}" in prompt:
+            raise Exception("Failed to get completion from Ollama")
+        return model(prompt, system_message, **kwargs)
+
+    mocker.patch("translation_agent.utils.get_completion", side_effect=flaky)
+    with pytest.raises(ChunkTranslationError) as raised:
+        translate_batch(
+            "English",
+            "Spanish",
+            texts,
+            max_tokens=10,
+            executor=executor,
+            memory=TranslationMemory(),
+        )
+
+    # The batch and every chunk of the long text ran in one pass
+    imap.assert_called_once()
+    assert sorted(raised.value.completed) == [0, 1, 2]
+    failed = raised.value.errors[3]
+    assert isinstance(failed, ChunkTranslationError)
+    assert sorted(failed.errors) == [2]
+    finished = failed.completed
+    assert sorted(finished) == [0, 1, 3]
+    assert finished[1].translation_2.split() == paragraphs[1].upper().split()
+
+    mocker.patch("translation_agent.utils.get_completion", side_effect=model)
+    result = translate_batch(
+        "English",
+        "Spanish",
+        texts,
+        max_tokens=10,
+        executor=SerialExecutor(),
+        memory=TranslationMemory(),
+    )
+    assert result[3].split() == long_text.upper().split()
@@ -0,0 +1,90 @@
+import pytest
+
+from translation_agent.cache import CompletionCache
+from translation_agent.utils import completion_cache_key
+from translation_agent.utils import get_completion
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = CompletionCache(str(tmp_path / "cache.sqlite3"))
+    yield cache
+    cache.close()
+
+
+def test_key_depends_on_every_input():
+    base = ("llama3.1:8b", "system", "prompt", 0.3, None)
+    key = CompletionCache.make_key(*base)
+    assert key == CompletionCache.make_key(*base)
+    for i, other in enumerate(["mistral:7b", "other", "other", 0.5, "json"]):
+        changed = list(base)
+        changed[i] = other
+        assert CompletionCache.make_key(*changed) != key
+
+
+def test_hits_and_misses(cache):
+    assert cache.get("k") is None
+    cache.set("k", "Hola")
+    assert cache.get("k") == "Hola"
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+    assert cache.stats()["entries"] == 1
+
+
+def test_cache_persists_across_instances(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    first = CompletionCache(path)
+    first.set("k", "Hola")
+    first.close()
+    assert CompletionCache(path).get("k") == "Hola"
+
+
+def test_expired_entries_are_misses(cache, mocker):
+    cache.max_age = 10
+    clock = mocker.patch("translation_agent.cache.time.time")
+    clock.return_value = 1000.0
+    cache.set("k", "Hola")
+    clock.return_value = 1011.0
+    assert cache.get("k") is None
+    assert len(cache) == 0
+
+
+def test_size_eviction_keeps_recently_used(cache, mocker):
+    cache.max_entries = 2
+    clock = mocker.patch("translation_agent.cache.time.time")
+    for t, key in enumerate(["a", "b", "c"]):
+        clock.return_value = float(t)
+        cache.set(key, key)
+    clock.return_value = 10.0
+    cache.get("a")
+    cache.evict()
+    assert len(cache) == 2
+    assert cache.get("b") is None
+    assert cache.get("a") == "a"
+
+
+def test_disabled_cache_without_path():
+    cache = CompletionCache(None)
+    cache.set("k", "v")
+    assert cache.get("k") is None
+    assert not cache.enabled
+
+
+def test_get_completion_uses_cache(cache, mocker):
+    mocker.patch("translation_agent.utils.completion_cache", cache)
+    ensure = mocker.patch(
+        "translation_agent.utils.ensure_model_available", return_value=True
+    )
+    generate = mocker.patch(
+        "translation_agent.utils.ollama_client.chat", return_value="Hola"
+    )
+
+    assert get_completion("Hello", model="m") == "Hola"
+    assert get_completion("Hello", model="m") == "Hola"
+    assert generate.call_count == 1
+    assert ensure.call_count == 1
+    assert cache.get(completion_cache_key("Hello", model="m")) == "Hola"
+
+    # Bypass switch
+    assert get_completion("Hello", model="m", use_cache=False) == "Hola"
+    assert generate.call_count == 2
@@ -0,0 +1,54 @@
+from translation_agent.chunker import calculate_chunk_size
+from translation_agent.chunker import chunk_text
+from translation_agent.tokens import TokenizedText
+
+
+def test_calculate_chunk_size():
+    assert calculate_chunk_size(1000, 500) == 500
+    assert calculate_chunk_size(1530, 500) == 389
+    assert calculate_chunk_size(2242, 500) == 496
+    assert calculate_chunk_size(300, 500) == 300
+
+
+def test_chunks_cover_text_with_offsets(word_encoding):
+    text = "First paragraph here.\n\nSecond one follows. " * 30
+    tokenized = TokenizedText(text, word_encoding)
+
+    chunks = chunk_text(tokenized, max_tokens=50)
+
+    assert "".join(chunk.text for chunk in chunks) == text
+    assert chunks[0].start == 0
+    assert chunks[-1].end == len(text)
+    for chunk, following in zip(chunks, chunks[1:]):
+        assert text[chunk.start : chunk.end] == chunk.text
+        assert chunk.end == following.start
+
+
+def test_chunks_keep_calculated_size(word_encoding):
+    text = " ".join(f"w{i}" for i in range(1530))
+    tokenized = TokenizedText(text, word_encoding)
+    token_size = calculate_chunk_size(len(tokenized), 500)
+
+    chunks = chunk_text(tokenized, max_tokens=500)
+
+    assert len(chunks) == 4
+    for chunk in chunks:
+        size = len(word_encoding.encode(chunk.text))
+        assert token_size // 2 <= size <= token_size
+
+
+def test_prefers_paragraph_then_sentence_boundaries(word_encoding):
+    sentence = "This is a sentence with several words in it. "
+    paragraphs = (sentence * 3 + "\n\n") * 4
+    chunks = chunk_text(TokenizedText(paragraphs, word_encoding), 40)
+    assert all(chunk.text.endswith("\n\n") for chunk in chunks[:-1])
+
+    sentences = sentence * 12
+    chunks = chunk_text(TokenizedText(sentences, word_encoding), 40)
+    assert all(chunk.text.endswith("it. ") for chunk in chunks[:-1])
+
+
+def test_falls_back_to_token_boundaries(char_encoding):
+    text = "x" * 100
+    chunks = chunk_text(TokenizedText(text, char_encoding), 30)
+    assert [len(chunk.text) for chunk in chunks] == [27, 27, 27, 19]
@@ -0,0 +1,151 @@
+import re
+
+import pytest
+
+from translation_agent import cli
+from translation_agent.manifest import JobManifest, text_hash
+from translation_agent.memory import TranslationMemory
+
+
+SETTINGS = {"source_lang": "English", "target_lang": "Spanish"}
+
+# Where each prompt shows the text being translated
+PROMPT_SOURCES = [
+    r"<TRANSLATE_THIS>\n(.*?)\n</TRANSLATE_THIS>",
+    r"<SOURCE_TEXT>\n(.*?)\n</SOURCE_TEXT>",
+    r"English: (.*)\n\nSpanish:",
+]
+
+
+class FakeModel:
+    """Echoes the text to translate, upper-cased, and fails on request."""
+
+    def __init__(self):
+        self.calls = []
+        self.fail_on = None
+
+    def __call__(self, prompt, system_message=None, **kwargs):
+        for pattern in PROMPT_SOURCES:
+            found = re.findall(pattern, prompt, re.DOTALL)
+            if found:
+                text = found[-1]
+                break
+        self.calls.append(text)
+        if self.fail_on and self.fail_on in text:
+            raise Exception("Ollama went away")
+        return text.upper()
+
+
+@pytest.fixture
+def fake_model(mocker, word_encoding):
+    mocker.patch(
+        "translation_agent.tokens.get_encoding", return_value=word_encoding
+    )
+    model = FakeModel()
+    model.warm_up = mocker.patch("translation_agent.cli.warm_up_model")
+    model.unload = mocker.patch("translation_agent.cli.unload_model")
+    mocker.patch("translation_agent.utils.get_completion", side_effect=model)
+    return model
+
+
+def test_manifest_keeps_chunks_for_same_file(tmp_path):
+    path = str(tmp_path / "manifest.sqlite3")
+    with JobManifest(path) as manifest:
+        assert manifest.start_file("a.txt", "h1", SETTINGS, 2) == {}
+        manifest.record_chunk("a.txt", 0, text_hash("one"), "uno")
+    with JobManifest(path) as manifest:
+        assert manifest.start_file("a.txt", "h1", SETTINGS, 2) == {0: "uno"}
+
+
+def test_manifest_drops_chunks_when_file_or_settings_change(tmp_path):
+    with JobManifest(str(tmp_path / "manifest.sqlite3")) as manifest:
+        manifest.start_file("a.txt", "h1", SETTINGS, 2)
+        manifest.record_chunk("a.txt", 0, text_hash("one"), "uno")
+        assert manifest.start_file("a.txt", "h2", SETTINGS, 2) == {}
+
+        manifest.record_chunk("a.txt", 0, text_hash("one"), "uno")
+        other = dict(SETTINGS, target_lang="French")
+        assert manifest.start_file("a.txt", "h2", other, 2) == {}
+
+
+def test_collect_files_keeps_directory_layout(tmp_path):
+    (tmp_path / "docs" / "sub").mkdir(parents=True)
+    (tmp_path / "docs" / "a.txt").write_text("a")
+    (tmp_path / "docs" / "sub" / "b.txt").write_text("b")
+    (tmp_path / "docs" / "c.md").write_text("c")
+
+    files = cli.collect_files([str(tmp_path / "docs")], "*.txt")
+
+    assert sorted(relative for _, relative in files) == ["a.txt", "sub/b.txt"]
+
+
+def test_batch_resumes_failed_chunks(tmp_path, fake_model):
+    docs = tmp_path / "docs"
+    docs.mkdir()
+    (docs / "short.txt").write_text("hello there")
+    (docs / "long.txt").write_text(
+        "".join(f"Sentence {i}. " for i in range(12))
+    )
+    out = tmp_path / "out"
+    args = [
+        str(docs),
+        "-s", "English",
+        "-t", "Spanish",
+        "-o", str(out),
+        "--max-tokens", "8",
+        "-j", "2",
+    ]
+
+    fake_model.fail_on = "Sentence 7."
+    assert cli.main(args) == 1
+    assert (out / "short.txt").read_text() == "HELLO THERE"
+    assert not (out / "long.txt").exists()
+
+    fake_model.fail_on = None
+    fake_model.calls.clear()
+    assert cli.main(args) == 0
+    # Only the chunk that failed is translated again
+    assert fake_model.calls
+    assert all("Sentence 7." in text for text in fake_model.calls)
+    assert (out / "long.txt").read_text() == "".join(
+        f"SENTENCE {i}. " for i in range(12)
+    )
+
+
+def test_batch_skips_finished_files(tmp_path, fake_model):
+    docs = tmp_path / "docs"
+    docs.mkdir()
+    (docs / "a.txt").write_text("hello there")
+    args = [str(docs), "-s", "English", "-t", "Spanish"]
+    args += ["-o", str(tmp_path / "out")]
+
+    assert cli.main(args) == 0
+    calls = len(fake_model.calls)
+    fake_model.unload.assert_called_once()
+    assert cli.main(args) == 0
+    assert len(fake_model.calls) == calls
+    # Nothing to translate, so the model is neither loaded nor unloaded
+    fake_model.warm_up.assert_called_once()
+    fake_model.unload.assert_called_once()
+
+
+def test_batch_reuses_translation_memory_after_edit(tmp_path, fake_model, mocker):
+    memory = TranslationMemory(str(tmp_path / "memory.sqlite3"))
+    mocker.patch("translation_agent.cli.translation_memory", memory)
+    docs = tmp_path / "docs"
+    docs.mkdir()
+    text = "".join(f"Sentence {i}. " for i in range(12))
+    (docs / "long.txt").write_text(text)
+    out = tmp_path / "out"
+    args = [str(docs), "-s", "English", "-t", "Spanish", "-o", str(out)]
+    args += ["--max-tokens", "8"]
+
+    assert cli.main(args) == 0
+    edited = text.replace("Sentence 7.", "Sentence seven.")
+    (docs / "long.txt").write_text(edited)
+    fake_model.calls.clear()
+    assert cli.main(args) == 0
+    assert fake_model.calls
+    assert all("Sentence seven." in text for text in fake_model.calls)
+    assert (out / "long.txt").read_text() == edited.upper()
+    memory.close()
@@ -0,0 +1,129 @@
+import pytest
+
+from translation_agent.context_policy import FullDocumentContext
+from translation_agent.context_policy import NeighbourChunksContext
+from translation_agent.context_policy import PromptTokenLog
+from translation_agent.context_policy import RollingSummaryContext
+from translation_agent.context_policy import TokenBudgetContext
+from translation_agent.executor import SerialExecutor
+from translation_agent.utils import multichunk_improvement_prompt
+from translation_agent.utils import multichunk_initial_translation_prompt
+from translation_agent.utils import multichunk_reflection_prompt
+from translation_agent.utils import multichunk_translation
+
+
+@pytest.fixture(autouse=True)
+def word_tokens(mocker):
+    # Count words instead of tiktoken tokens so no encoding is downloaded
+    mocker.patch(
+        "translation_agent.utils.num_tokens_in_string",
+        side_effect=lambda text: len(text.split()),
+    )
+
+
+CHUNKS = ["zero ", "one ", "two ", "three ", "four ", "five "]
+
+
+def test_full_document_context_matches_original_tagging():
+    tagged = FullDocumentContext().tagged_text(CHUNKS, 2)
+    assert tagged == (
+        "zero one <TRANSLATE_THIS>two </TRANSLATE_THIS>three four five "
+    )
+
+
+def test_full_document_prompts_share_prefix_up_to_the_chunk():
+    policy = FullDocumentContext()
+    for build, args in (
+        (multichunk_initial_translation_prompt, ()),
+        (multichunk_reflection_prompt, ("T", "Mexico")),
+        (multichunk_improvement_prompt, ("T", "R")),
+    ):
+        first, second = (
+            build("English", "Spanish", CHUNKS, i, *args, context_policy=policy)
+            for i in (1, 4)
+        )
+        assert first[0] == second[0]
+        prefix, chunk = first[1].rsplit("<TRANSLATE_THIS>\n", 1)
+        assert second[1].startswith(prefix)
+        assert "".join(CHUNKS) in prefix
+        assert chunk.startswith("one \n</TRANSLATE_THIS>")
+
+
+def test_neighbour_chunks_context():
+    policy = NeighbourChunksContext(1)
+    assert policy.tagged_text(CHUNKS, 0) == (
+        "<TRANSLATE_THIS>zero </TRANSLATE_THIS>one "
+    )
+    assert policy.tagged_text(CHUNKS, 3) == (
+        "two <TRANSLATE_THIS>three </TRANSLATE_THIS>four "
+    )
+
+
+def test_token_budget_context_grows_nearest_first():
+    chunks = ["a b c ", "d ", "e ", "f g ", "h "]
+    assert TokenBudgetContext(2).context(chunks, 2) == ("d ", "")
+    assert TokenBudgetContext(3).context(chunks, 2) == ("d ", "f g ")
+    assert TokenBudgetContext(100).context(chunks, 2) == ("a b c d ", "f g h ")
+
+
+def test_token_budget_context_counts_each_chunk_once(mocker):
+    count = mocker.patch(
+        "translation_agent.utils.num_tokens_in_string",
+        side_effect=lambda text: len(text.split()),
+    )
+    policy = TokenBudgetContext(3)
+    chunks = list(CHUNKS)
+
+    for i in range(len(chunks)):
+        for _ in range(3):
+            policy.context(chunks, i)
+    assert count.call_count == len(chunks)
+
+    # Another text is counted afresh
+    other = ["a b c d ", "e "]
+    assert policy.context(other, 1) == ("", "")
+    assert count.call_count == len(chunks) + 2
+
+
+def test_rolling_summary_context_summarizes_earlier_chunks():
+    calls = []
+
+    def summarize(summary, text):
+        calls.append(text)
+        return (summary + text.strip()[0]).strip()
+
+    policy = RollingSummaryContext(n=1, summarize=summarize)
+    before, after = policy.context(CHUNKS, 4)
+    assert before == "[Summary of the preceding text: zot]\n\nthree "
+    assert after == "five "
+    # Summaries are reused by later calls
+    policy.context(CHUNKS, 5)
+    assert calls == ["zero ", "one ", "two ", "three "]
+
+
+def test_bounded_context_keeps_prompt_size_constant(mocker):
+    mocker.patch("translation_agent.utils.get_completion", return_value="x")
+    chunks = [f"sentence number {i}. " for i in range(40)]
+
+    full, bounded = PromptTokenLog(), PromptTokenLog()
+    multichunk_translation(
+        "English",
+        "Spanish",
+        chunks,
+        executor=SerialExecutor(),
+        context_policy=FullDocumentContext(usage=full),
+    )
+    multichunk_translation(
+        "English",
+        "Spanish",
+        chunks,
+        executor=SerialExecutor(),
+        context_policy=NeighbourChunksContext(2, usage=bounded),
+    )
+
+    assert len(full.entries) == len(bounded.entries) == 3 * len(chunks)
+    assert set(bounded.by_stage()) == {"initial", "reflect", "improve"}
+    middle = [e.tokens for e in bounded.entries if 2 <= e.index < 38]
+    assert len(set(middle)) == 3  # one size per stage, whatever the index
+    assert bounded.largest < full.largest
+    assert bounded.total < full.total
@@ -0,0 +1,199 @@
+import threading
+import time
+
+import pytest
+
+from translation_agent.executor import get_executor
+from translation_agent.utils import iter_multichunk_translation
+from translation_agent.utils import multichunk_initial_translation
+from translation_agent.utils import translate_stream
+
+
+@pytest.mark.parametrize("kind", ["serial", "thread", "asyncio"])
+def test_executor_preserves_order(kind):
+    def slow_square(x):
+        # Later items finish first when run concurrently
+        time.sleep(0.01 * (5 - x))
+        return x * x
+
+    with get_executor(kind, max_in_flight=5) as executor:
+        assert executor.map(slow_square, range(5)) == [0, 1, 4, 9, 16]
+
+
+@pytest.mark.parametrize("kind", ["thread", "asyncio"])
+def test_executor_limits_in_flight_calls(kind):
+    lock = threading.Lock()
+    running = [0]
+    peak = [0]
+
+    def work(x):
+        with lock:
+            running[0] += 1
+            peak[0] = max(peak[0], running[0])
+        time.sleep(0.02)
+        with lock:
+            running[0] -= 1
+        return x
+
+    with get_executor(kind, max_in_flight=3) as executor:
+        assert executor.map(work, range(10)) == list(range(10))
+
+    assert 1 < peak[0] <= 3
+
+
+@pytest.mark.parametrize("kind", ["serial", "thread", "asyncio"])
+def test_imap_stream_yields_pieces_in_order(kind):
+    def spell(word):
+        for letter in word:
+            # Later words finish first when run concurrently
+            time.sleep(0.01 / len(word))
+            yield letter
+
+    with get_executor(kind, max_in_flight=3) as executor:
+        pieces = list(executor.imap_stream(spell, ["abc", "de", "f"]))
+
+    assert pieces == list("abcdef")
+
+
+def test_imap_stream_runs_streams_concurrently_and_stops_on_error():
+    started = []
+    lock = threading.Lock()
+
+    def stream(x):
+        with lock:
+            started.append(x)
+        time.sleep(0.02)
+        if x == 1:
+            raise RuntimeError("stream failed")
+        yield x
+
+    with get_executor("thread", max_in_flight=2) as executor:
+        pieces = executor.imap_stream(stream, range(10))
+        assert next(pieces) == 0
+        # The second stream ran alongside the first
+        assert 1 in started
+        with pytest.raises(RuntimeError):
+            next(pieces)
+
+    # The streams waiting for a worker were skipped
+    assert len(started) < 10
+
+
+def test_asyncio_executor_awaits_coroutines():
+    async def double(x):
+        return 2 * x
+
+    with get_executor("asyncio", max_in_flight=2) as executor:
+        assert executor.map(double, [1, 2, 3]) == [2, 4, 6]
+
+
+def test_get_executor_rejects_unknown_kind():
+    with pytest.raises(ValueError):
+        get_executor("process")
+
+
+def test_multichunk_initial_translation_is_concurrent_and_ordered(mocker):
+    chunks = ["one. ", "two. ", "three. ", "four. "]
+
+    def fake_completion(prompt, system_message):
+        chunk = prompt.rsplit("<TRANSLATE_THIS>\n", 1)[1].split("\n", 1)[0]
+        time.sleep(0.01 * len(chunk))
+        return chunk.upper()
+
+    mocker.patch(
+        "translation_agent.utils.get_completion", side_effect=fake_completion
+    )
+
+    with get_executor("thread", max_in_flight=4) as executor:
+        result = multichunk_initial_translation(
+            "English", "Spanish", chunks, executor
+        )
+
+    assert result == ["ONE. ", "TWO. ", "THREE. ", "FOUR. "]
+
+
+def test_multichunk_translation_pipelines_chunks(mocker):
+    chunks = ["a. ", "b. ", "c. ", "d. "]
+    calls = []
+    lock = threading.Lock()
+
+    def fake_completion(prompt, system_message):
+        chunk = prompt.rsplit("<TRANSLATE_THIS>\n", 1)[1].split("\n", 1)[0]
+        if prompt.startswith("Your task is to provide"):
+            stage = "initial"
+        elif prompt.startswith("Your task is to carefully read, then"):
+            stage = "improve"
+        else:
+            stage = "reflect"
+        with lock:
+            calls.append((stage, chunk))
+        time.sleep(0.01)
+        return f"{stage}:{chunk}"
+
+    mocker.patch(
+        "translation_agent.utils.get_completion", side_effect=fake_completion
+    )
+
+    with get_executor("thread", max_in_flight=2) as executor:
+        streamed = list(
+            iter_multichunk_translation(
+                "English", "Spanish", chunks, executor=executor
+            )
+        )
+
+    assert [chunk.index for chunk in streamed] == [0, 1, 2, 3]
+    assert [chunk.source_text for chunk in streamed] == chunks
+    assert streamed[0].translation_2.endswith("a. ")
+    # Chunk 0 is fully improved before the last chunk is even translated
+    assert calls.index(("improve", "a. ")) < calls.index(("initial", "d. "))
+
+
+def test_translate_stream_improves_chunks_concurrently(mocker, word_encoding):
+    chunks = ["a. ", "b. ", "c. "]
+    mocker.patch("translation_agent.utils.warm_up_model")
+    # The default context policy counts the prompt tokens
+    mocker.patch(
+        "translation_agent.utils.get_encoding", return_value=word_encoding
+    )
+    tokenize = mocker.patch("translation_agent.utils.tokenize")
+    tokenize.return_value.__len__.return_value = 3000
+    mocker.patch(
+        "translation_agent.utils.split_source_text", return_value=chunks
+    )
+    mocker.patch(
+        "translation_agent.utils.get_completion",
+        side_effect=lambda prompt, system_message: "draft",
+    )
+    lock = threading.Lock()
+    running = [0]
+    peak = [0]
+
+    def fake_stream(prompt, system_message):
+        chunk = prompt.rsplit("<TRANSLATE_THIS>\n", 1)[1].split("\n", 1)[0]
+        with lock:
+            running[0] += 1
+            peak[0] = max(peak[0], running[0])
+        time.sleep(0.02)
+        yield chunk.upper()
+        with lock:
+            running[0] -= 1
+
+    mocker.patch(
+        "translation_agent.utils.get_completion_stream",
+        side_effect=fake_stream,
+    )
+
+    with get_executor("thread", max_in_flight=3) as executor:
+        pieces = list(
+            translate_stream(
+                "English",
+                "Spanish",
+                "".join(chunks),
+                "",
+                1000,
+                executor=executor,
+            )
+        )
+
+    assert pieces == ["A. ", "B. ", "C. "]
+    assert peak[0] > 1
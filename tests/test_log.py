@@ -0,0 +1,65 @@
+import io
+import logging
+
+import pytest
+
+from translation_agent import utils
+from translation_agent.log import LOGGER_NAME, configure_logging
+
+
+@pytest.fixture
+def stream():
+    stream = io.StringIO()
+    yield stream
+    logger = logging.getLogger(LOGGER_NAME)
+    for handler in list(logger.handlers):
+        if getattr(handler, "_translation_agent", False):
+            logger.removeHandler(handler)
+    logger.setLevel(logging.NOTSET)
+
+
+def test_configure_logging_adds_one_handler(stream):
+    configure_logging("INFO", stream=stream)
+    configure_logging("DEBUG", stream=stream)
+
+    logger = logging.getLogger(LOGGER_NAME)
+    assert sum(
+        getattr(h, "_translation_agent", False) for h in logger.handlers
+    ) == 1
+    assert logger.level == logging.DEBUG
+
+
+def test_chunk_messages_only_at_debug(stream, mocker, word_encoding):
+    mocker.patch("translation_agent.tokens.get_encoding", return_value=word_encoding)
+    tokenized = utils.tokenize("One two three. Four five six.")
+
+    configure_logging("WARNING", stream=stream)
+    utils.split_source_text(tokenized, 3)
+    assert stream.getvalue() == ""
+
+    configure_logging("DEBUG", stream=stream)
+    utils.split_source_text(tokenized, 3)
+    assert "Split text into" in stream.getvalue()
+
+
+def test_translate_logs_prompt_tokens(stream, mocker, word_encoding):
+    for module in ("tokens", "utils"):
+        mocker.patch(
+            f"translation_agent.{module}.get_encoding",
+            return_value=word_encoding,
+        )
+    mocker.patch("translation_agent.utils.warm_up_model")
+    mocker.patch("translation_agent.utils.get_completion", return_value="x")
+    text = " ".join(f"Sentence {n} is here." for n in range(10))
+
+    configure_logging("INFO", stream=stream)
+    utils.translate("English", "Spanish", text, "", max_tokens=10)
+
+    line = next(
+        line
+        for line in stream.getvalue().splitlines()
+        if "Prompt tokens" in line
+    )
+    assert "'initial'" in line and "'improve'" in line
+    total = int(line.split("Prompt tokens: ")[1].split(",")[0])
+    assert total > len(text.split())
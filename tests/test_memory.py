@@ -0,0 +1,244 @@
+import re
+
+import pytest
+
+from translation_agent.config import DEFAULT_OLLAMA_MODEL
+from translation_agent.memory import StoredTranslation, TranslationMemory
+from translation_agent import utils
+from translation_agent.executor import SerialExecutor
+from translation_agent.utils import translate
+from translation_agent.utils import translate_stream
+
+
+PARAGRAPHS = [f"Paragraph {n} says a few words here." for n in range(6)]
+TEXT = "\n\n".join(PARAGRAPHS)
+
+CLAUSE = (
+    "The licensee shall not sublicense, sell, lease or otherwise transfer "
+    "the software to any third party without the prior written consent of "
+    "Acme Corporation."
+)
+
+# Where each prompt shows the text being translated
+PROMPT_SOURCES = [
+    r"<TRANSLATE_THIS>\n(.*?)\n</TRANSLATE_THIS>",
+    r"<SOURCE_TEXT>\n(.*?)\n</SOURCE_TEXT>",
+    r"English: (.*)\n\nSpanish:",
+]
+
+
+@pytest.fixture
+def memory(tmp_path):
+    with TranslationMemory(str(tmp_path / "memory.sqlite3")) as memory:
+        yield memory
+
+
+@pytest.fixture
+def calls(mocker, word_encoding):
+    for module in ("tokens", "utils"):
+        mocker.patch(
+            f"translation_agent.{module}.get_encoding",
+            return_value=word_encoding,
+        )
+    mocker.patch("translation_agent.utils.warm_up_model")
+    calls = []
+
+    def fake_completion(prompt, system_message):
+        for pattern in PROMPT_SOURCES:
+            found = re.findall(pattern, prompt, re.DOTALL)
+            if found:
+                break
+        calls.append(found[-1])
+        return found[-1].upper()
+
+    mocker.patch(
+        "translation_agent.utils.get_completion", side_effect=fake_completion
+    )
+    return calls
+
+
+def test_memory_round_trip_per_scope(memory):
+    scope = memory.make_scope("English", "Spanish", "", "llama3.1:8b")
+    other = memory.make_scope("English", "French", "", "llama3.1:8b")
+    memory.put(scope, "Hello", "Hola", "Fine.", "¡Hola!")
+
+    assert memory.get(scope, "Hello") == StoredTranslation(
+        "Hola", "Fine.", "¡Hola!"
+    )
+    assert memory.get(other, "Hello") is None
+    assert memory.get(scope, "Hello!") is None
+    assert TranslationMemory().get(scope, "Hello") is None
+
+
+def test_split_reuses_stored_chunks_around_an_edit(memory, word_encoding, mocker):
+    mocker.patch(
+        "translation_agent.tokens.get_encoding", return_value=word_encoding
+    )
+    scope = memory.make_scope("English", "Spanish", "", "m")
+    middle = "\n\n".join(PARAGRAPHS[1:3])
+    memory.put(scope, PARAGRAPHS[0], "1", "r", "uno")
+    memory.put(scope, middle, "2", "r", "dos")
+    memory.put(scope, PARAGRAPHS[4], "4", "r", "cuatro")
+
+    edited = TEXT.replace("Paragraph 4", "Item 4")
+    segments = memory.split(edited, scope, 20)
+
+    assert "".join(segment.text for segment in segments) == edited
+    assert segments[:3] == [
+        (PARAGRAPHS[0], StoredTranslation("1", "r", "uno")),
+        ("\n\n", StoredTranslation("\n\n", "", "\n\n")),
+        (middle, StoredTranslation("2", "r", "dos")),
+    ]
+    assert all(segment.stored is None for segment in segments[3:])
+
+
+def test_split_looks_up_only_the_heads_in_the_text(
+    tmp_path, word_encoding, mocker
+):
+    mocker.patch(
+        "translation_agent.tokens.get_encoding", return_value=word_encoding
+    )
+    path = str(tmp_path / "memory.sqlite3")
+    scope = TranslationMemory.make_scope("English", "Spanish", "", "m")
+    text = f"Title\n\n{CLAUSE}\n\nNew words."
+    with TranslationMemory(path) as memory:
+        memory.put(scope, "Title", "t", "r", "Título")
+        memory.put(scope, CLAUSE, "c", "r", "Cláusula")
+        for n in range(50):
+            memory.put(scope, f"Unrelated text number {n}.", "u", "r", "u")
+        # A memory written before head lengths were stored
+        memory._connection().execute("DROP TABLE head_lengths")
+
+    with TranslationMemory(path) as memory:
+        statements = []
+        memory._connection().set_trace_callback(statements.append)
+        segments = memory.split(text, scope, 20)
+
+    assert [segment.text for segment in segments] == [
+        "Title",
+        "\n\n",
+        CLAUSE,
+        "\n\nNew words.",
+    ]
+    assert [segment.stored.translation_2 for segment in segments[:3]] == [
+        "Título",
+        "\n\n",
+        "Cláusula",
+    ]
+    assert segments[3].stored is None
+    # The stored heads are read once, and only those among the text's own
+    heads_read = [sql for sql in statements if "SELECT DISTINCT head" in sql]
+    assert len(heads_read) == 1
+    assert "AND head IN (" in heads_read[0]
+
+
+def test_translate_only_sends_changed_chunks(memory, calls):
+    assert translate("English", "Spanish", TEXT, "", 20, memory=memory) == (
+        TEXT.upper()
+    )
+    assert len(calls) > 3
+
+    edited = TEXT.replace("Paragraph 3 says", "Paragraph 3 now says")
+    calls.clear()
+    assert translate("English", "Spanish", edited, "", 20, memory=memory) == (
+        edited.upper()
+    )
+    assert calls
+    assert all("Paragraph 3 now says" in chunk for chunk in calls)
+
+    calls.clear()
+    translate("English", "Spanish", edited, "", 20, memory=memory)
+    translate("English", "Spanish", "Hello there.", "", 20, memory=memory)
+    translate("English", "Spanish", "Hello there.", "", 20, memory=memory)
+    assert calls == ["Hello there."] * 3
+
+
+def test_similar_finds_near_duplicates(memory):
+    scope = memory.make_scope("English", "Spanish", "", "m")
+    memory.put(scope, CLAUSE, "1", "r", "CLÁUSULA")
+    memory.put(scope, "Click here to reset your password.", "1", "r", "Clic")
+
+    matches = memory.similar(scope, CLAUSE.replace("the software", "it"))
+    assert [match.translation for match in matches] == ["CLÁUSULA"]
+    assert 0.8 < matches[0].similarity < 1
+    assert memory.similar(scope, "Your password was changed.") == []
+    other = memory.make_scope("English", "French", "", "m")
+    assert memory.similar(other, CLAUSE) == []
+
+
+def test_translate_edits_near_duplicates(memory, mocker, word_encoding):
+    mocker.patch(
+        "translation_agent.tokens.get_encoding", return_value=word_encoding
+    )
+    mocker.patch("translation_agent.utils.warm_up_model")
+    completion = mocker.patch(
+        "translation_agent.utils.get_completion", return_value="Traducción"
+    )
+    scope = memory.make_scope("English", "Spanish", "", DEFAULT_OLLAMA_MODEL)
+    memory.put(scope, CLAUSE, "1", "r", "CLÁUSULA")
+
+    # Very similar: one edit call instead of three stages
+    near = CLAUSE.replace("the software", "this software")
+    assert translate("English", "Spanish", near, "", memory=memory) == (
+        "Traducción"
+    )
+    assert completion.call_count == 1
+    assert "<EARLIER_TRANSLATION>\nCLÁUSULA\n" in (
+        completion.call_args.args[0]
+    )
+
+    # Less similar: the stored translation is shown as an example
+    completion.reset_mock()
+    reworded = CLAUSE.replace("prior written", "express")
+    translate("English", "Spanish", reworded, "", memory=memory)
+    assert completion.call_count == 3
+    initial_prompt = completion.call_args_list[0].args[0]
+    assert "<EXAMPLE>\nEnglish: " + CLAUSE + "\nSpanish: CLÁUSULA\n" in (
+        initial_prompt
+    )
+
+
+def test_translate_stream_shares_the_memory_with_translate(
+    memory, calls, mocker
+):
+    def fake_stream(prompt, system_message):
+        # Answered by the fake get_completion of the calls fixture
+        yield utils.get_completion(prompt, system_message)
+
+    mocker.patch(
+        "translation_agent.utils.get_completion_stream",
+        side_effect=fake_stream,
+    )
+
+    def stream(text, max_tokens=20):
+        return "".join(
+            translate_stream(
+                "English",
+                "Spanish",
+                text,
+                "",
+                max_tokens,
+                executor=SerialExecutor(),
+                memory=memory,
+            )
+        )
+
+    streamed = stream(TEXT)
+    assert calls
+    calls.clear()
+    assert translate("English", "Spanish", TEXT, "", 20, memory=memory) == (
+        streamed
+    )
+    assert not calls
+
+    # A near-duplicate of a stored text is edited, and the edit streamed
+    memory.put(
+        memory.make_scope("English", "Spanish", "", DEFAULT_OLLAMA_MODEL),
+        CLAUSE,
+        "1",
+        "r",
+        "CLÁUSULA",
+    )
+    near = CLAUSE.replace("the software", "this software")
+    assert stream(near, 1000) == near.upper()
+    assert len(calls) == 1
@@ -0,0 +1,185 @@
+import pytest
+
+from translation_agent.ollama_client import ModelRegistry
+from translation_agent.ollama_client import OllamaClient
+from translation_agent.ollama_client import chat_messages
+
+
+@pytest.fixture
+def client(mocker):
+    client = OllamaClient(base_url="http://ollama.test")
+    mocker.patch.object(
+        client, "get_model_names", return_value=["llama3.1:8b"]
+    )
+    mocker.patch.object(client, "pull_model", return_value=False)
+    return client
+
+
+def test_registry_checks_server_once_per_ttl(client, mocker):
+    clock = mocker.patch("translation_agent.ollama_client.time.monotonic")
+    clock.return_value = 100.0
+    registry = ModelRegistry(client, ttl=60)
+
+    for _ in range(150):
+        assert registry.ensure("llama3.1:8b")
+    assert client.get_model_names.call_count == 1
+
+    clock.return_value = 161.0
+    assert registry.ensure("llama3.1:8b")
+    assert client.get_model_names.call_count == 2
+
+
+def test_registry_notices_removed_model(client, mocker):
+    clock = mocker.patch("translation_agent.ollama_client.time.monotonic")
+    clock.return_value = 100.0
+    registry = ModelRegistry(client, ttl=60)
+    assert registry.ensure("llama3.1:8b")
+
+    client.get_model_names.return_value = ["mistral:7b"]
+    registry.invalidate()
+    assert not registry.ensure("llama3.1:8b")
+    client.pull_model.assert_called_once_with("llama3.1:8b")
+
+
+def test_registry_does_not_cache_unreachable_server(client):
+    client.get_model_names.return_value = []
+    registry = ModelRegistry(client, ttl=60)
+    assert not registry.is_available("llama3.1:8b")
+    client.get_model_names.return_value = ["llama3.1:8b"]
+    assert registry.is_available("llama3.1:8b")
+
+
+def test_registry_is_cached_never_asks_the_server(client, mocker):
+    clock = mocker.patch("translation_agent.ollama_client.time.monotonic")
+    clock.return_value = 100.0
+    registry = ModelRegistry(client, ttl=60)
+    assert not registry.is_cached("llama3.1:8b")
+    assert client.get_model_names.call_count == 0
+
+    registry.ensure("llama3.1:8b")
+    assert registry.is_cached("llama3.1:8b")
+    assert not registry.is_cached("mistral:7b")
+
+    clock.return_value = 161.0
+    assert not registry.is_cached("llama3.1:8b")
+    assert client.get_model_names.call_count == 1
+
+
+def test_client_reuses_pooled_session(mocker):
+    client = OllamaClient(
+        base_url="http://ollama.test",
+        pool_size=8,
+        connect_timeout=2,
+        read_timeout=90,
+    )
+    adapter = client.session.get_adapter("http://ollama.test")
+    assert adapter._pool_maxsize == 8
+
+    post = mocker.patch.object(client.session, "post")
+    post.return_value.json.return_value = {"response": "Hola"}
+
+    assert client.generate("llama3.1:8b", "Hello") == "Hola"
+    assert client.generate("llama3.1:8b", "Hello again") == "Hola"
+    assert post.call_count == 2
+    assert post.call_args.kwargs["timeout"] == (2, 90)
+
+
+def test_generate_stream_yields_ndjson_tokens(mocker):
+    client = OllamaClient(base_url="http://ollama.test")
+    post = mocker.patch.object(client.session, "post")
+    response = post.return_value.__enter__.return_value
+    response.iter_lines.return_value = [
+        b'{"response": "Ho", "done": false}',
+        b"",
+        b'{"response": "la", "done": false}',
+        b'{"response": "", "done": true}',
+    ]
+
+    assert list(client.generate_stream("llama3.1:8b", "Hello")) == ["Ho", "la"]
+    assert post.call_args.kwargs["stream"] is True
+    assert post.call_args.kwargs["json"]["stream"] is True
+    assert client.generate("llama3.1:8b", "Hello", stream=True) == "Hola"
+
+
+def test_generate_stream_raises_server_error(mocker):
+    client = OllamaClient(base_url="http://ollama.test")
+    post = mocker.patch.object(client.session, "post")
+    response = post.return_value.__enter__.return_value
+    response.iter_lines.return_value = [b'{"error": "model not found"}']
+
+    with pytest.raises(Exception, match="model not found"):
+        list(client.generate_stream("llama3.1:8b", "Hello"))
+
+
+def test_generate_sends_system_message_separately(mocker):
+    client = OllamaClient(base_url="http://ollama.test")
+    post = mocker.patch.object(client.session, "post")
+    post.return_value.json.return_value = {"response": "Hola"}
+
+    client.generate("llama3.1:8b", "Hello", system="Translate.")
+
+    payload = post.call_args.kwargs["json"]
+    assert (payload["system"], payload["prompt"]) == ("Translate.", "Hello")
+
+
+def test_chat_sends_roles_and_reads_message(mocker):
+    client = OllamaClient(base_url="http://ollama.test")
+    post = mocker.patch.object(client.session, "post")
+    post.return_value.json.return_value = {
+        "message": {"role": "assistant", "content": "Hola"},
+        "done": True,
+    }
+    messages = chat_messages("Translate.", "Hello")
+
+    assert client.chat("llama3.1:8b", messages, format="json") == "Hola"
+    assert post.call_args.args[0] == "http://ollama.test/api/chat"
+    payload = post.call_args.kwargs["json"]
+    assert payload["messages"] == [
+        {"role": "system", "content": "Translate."},
+        {"role": "user", "content": "Hello"},
+    ]
+    assert payload["format"] == "json"
+
+
+def test_chat_stream_yields_message_pieces(mocker):
+    client = OllamaClient(base_url="http://ollama.test")
+    post = mocker.patch.object(client.session, "post")
+    response = post.return_value.__enter__.return_value
+    response.iter_lines.return_value = [
+        b'{"message": {"role": "assistant", "content": "Ho"}, "done": false}',
+        b'{"message": {"role": "assistant", "content": "la"}, "done": false}',
+        b'{"message": {"role": "assistant", "content": ""}, "done": true}',
+    ]
+
+    pieces = client.chat_stream("llama3.1:8b", chat_messages(None, "Hello"))
+    assert list(pieces) == ["Ho", "la"]
+    assert post.call_args.kwargs["json"]["messages"] == [
+        {"role": "user", "content": "Hello"}
+    ]
+
+
+def test_requests_keep_model_loaded_with_its_options(mocker):
+    client = OllamaClient(base_url="http://ollama.test", keep_alive="30m")
+    post = mocker.patch.object(client.session, "post")
+    post.return_value.json.return_value = {"response": "Hola"}
+
+    client.chat("llama3.1:8b", chat_messages(None, "Hello"), temperature=0.1)
+    payload = post.call_args.kwargs["json"]
+    assert payload["keep_alive"] == "30m"
+    assert payload["options"] == {
+        "temperature": 0.1,
+        "top_p": 1.0,
+        "num_ctx": 8192,
+        "num_predict": 2048,
+    }
+
+    assert client.load_model("llama3.1:8b")
+    payload = post.call_args.kwargs["json"]
+    assert "prompt" not in payload
+    assert payload["options"]["num_ctx"] == 8192
+
+    assert client.unload_model("llama3.1:8b")
+    assert post.call_args.kwargs["json"] == {
+        "model": "llama3.1:8b",
+        "keep_alive": 0,
+    }
@@ -0,0 +1,157 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+import requests
+
+from translation_agent.async_client import AsyncOllamaClient
+from translation_agent.ollama_client import OllamaClient
+from translation_agent.retry import Hedger, RetryPolicy
+from translation_agent.utils import ChunkTranslationError
+from translation_agent.utils import multichunk_translation
+
+
+def http_error(status):
+    response = requests.Response()
+    response.status_code = status
+    return requests.exceptions.HTTPError(f"{status} error", response=response)
+
+
+@pytest.fixture
+def client(mocker):
+    mocker.patch("translation_agent.ollama_client.time.sleep")
+    return OllamaClient(
+        base_url="http://ollama.test",
+        retry_policy=RetryPolicy(attempts=3, base_delay=0.01),
+    )
+
+
+def test_backoff_is_jittered_and_capped(mocker):
+    mocker.patch("translation_agent.retry.random.uniform", side_effect=max)
+    policy = RetryPolicy(attempts=10, base_delay=0.5, max_delay=3)
+    error = http_error(503)
+    error.retryable = True
+
+    delays = [policy.next_delay(attempt, error) for attempt in range(1, 10)]
+    assert delays[:4] == [0.5, 1.0, 2.0, 3]
+    assert policy.next_delay(10, error) is None
+    assert policy.next_delay(1, ValueError("bad request")) is None
+
+
+def test_client_retries_transient_errors(client, mocker):
+    post = mocker.patch.object(client.session, "post")
+    ok = mocker.Mock()
+    ok.json.return_value = {"message": {"content": "Hola"}}
+    post.side_effect = [requests.exceptions.ConnectTimeout("slow"), ok]
+
+    messages = [{"role": "user", "content": "Hello"}]
+    assert client.chat("llama3.1:8b", messages, use_cache=False) == "Hola"
+    assert post.call_count == 2
+
+
+def test_client_gives_up_on_client_errors_and_after_attempts(client, mocker):
+    post = mocker.patch.object(client.session, "post")
+    post.return_value.raise_for_status.side_effect = http_error(400)
+    with pytest.raises(Exception, match="400 error"):
+        client.generate("llama3.1:8b", "Hello", use_cache=False)
+    assert post.call_count == 1
+
+    post.reset_mock()
+    post.return_value.raise_for_status.side_effect = http_error(503)
+    with pytest.raises(Exception, match="503 error"):
+        client.generate("llama3.1:8b", "Hello", use_cache=False)
+    assert post.call_count == 3
+
+
+def test_stream_is_retried_only_before_the_first_piece(client, mocker):
+    post = mocker.patch.object(client.session, "post")
+    response = post.return_value.__enter__.return_value
+    response.iter_lines.side_effect = [
+        requests.exceptions.ConnectionError("reset"),
+        [b'{"response": "Hola", "done": true}'],
+    ]
+    assert list(client.generate_stream("llama3.1:8b", "Hello")) == ["Hola"]
+
+    def broken_stream():
+        yield b'{"response": "Ho", "done": false}'
+        raise requests.exceptions.ChunkedEncodingError("reset")
+
+    post.reset_mock()
+    response.iter_lines.side_effect = [broken_stream()]
+    with pytest.raises(Exception, match="reset"):
+        list(client.generate_stream("llama3.1:8b", "Hello"))
+    assert post.call_count == 1
+
+
+def test_async_client_retries_server_errors(mocker):
+    mocker.patch("translation_agent.async_client.asyncio.sleep")
+    statuses = [503, 200]
+
+    def handler(request):
+        status = statuses.pop(0)
+        return httpx.Response(status, json={"response": "Hola"})
+
+    async def run():
+        client = AsyncOllamaClient(base_url="http://ollama.test")
+        client._client()
+        client._http = httpx.AsyncClient(
+            base_url=client.base_url, transport=httpx.MockTransport(handler)
+        )
+        async with client:
+            return await client.generate("m", "Hello", use_cache=False)
+
+    assert asyncio.run(run()) == "Hola"
+    assert statuses == []
+
+
+def test_hedger_calls_backup_when_primary_is_slow():
+    hedger = Hedger(quantile=0.95, min_samples=3)
+    calls = []
+
+    def primary():
+        calls.append("primary")
+        time.sleep(0.3)
+        return "primary"
+
+    def backup():
+        calls.append("backup")
+        return "backup"
+
+    # Not enough samples yet: no hedging
+    for _ in range(3):
+        assert hedger.call(lambda: "fast", backup) == "fast"
+    assert calls == []
+
+    assert hedger.call(primary, backup) == "backup"
+    assert calls == ["primary", "backup"]
+
+
+def test_finished_chunks_survive_a_failed_chunk(mocker):
+    chunks = ["one. ", "two. ", "three. "]
+    fail = {"two. "}
+    calls = []
+
+    def fake_completion(prompt, system_message):
+        chunk = prompt.rsplit("<TRANSLATE_THIS>\n", 1)[1].split("\n", 1)[0]
+        calls.append(chunk)
+        if chunk in fail:
+            raise Exception("Ollama went away")
+        return chunk.upper()
+
+    mocker.patch(
+        "translation_agent.utils.get_completion", side_effect=fake_completion
+    )
+
+    with pytest.raises(ChunkTranslationError) as excinfo:
+        multichunk_translation("English", "Spanish", chunks)
+    assert sorted(excinfo.value.completed) == [0, 2]
+    assert list(excinfo.value.errors) == [1]
+
+    fail.clear()
+    calls.clear()
+    result = multichunk_translation(
+        "English", "Spanish", chunks, completed=excinfo.value.completed
+    )
+    assert result == ["ONE. ", "TWO. ", "THREE. "]
+    assert set(calls) == {"two. "}
@@ -0,0 +1,96 @@
+import pytest
+
+from translation_agent.executor import SerialExecutor
+from translation_agent.review_policy import AdaptiveReview
+from translation_agent.review_policy import AlwaysReview
+from translation_agent.review_policy import NO_SUGGESTIONS
+from translation_agent.review_policy import get_review_policy
+from translation_agent.utils import multichunk_translation
+from translation_agent.utils import one_chunk_translation
+
+
+PROSE = "The committee will meet again next week to discuss the budget."
+
+
+@pytest.mark.parametrize(
+    "source, translation",
+    [
+        ("Introduction", "Introducción"),
+        ("3.14 / 2,000", "3,14 / 2.000"),
+        ("if (x == 1) { return y[0]; }", "if (x == 1) { return y[0]; }"),
+        ("```\nprint('hello world from here')\n```", "```\nprint()\n```"),
+    ],
+)
+def test_adaptive_skips_trivial_chunks(source, translation):
+    assert not AdaptiveReview().should_reflect(source, translation)
+
+
+def test_adaptive_reviews_prose_and_suspicious_translations():
+    policy = AdaptiveReview(min_words=4)
+    assert policy.should_reflect(PROSE, "El comité se reunirá de nuevo.")
+    assert policy.should_reflect("Introduction", "")
+    assert policy.should_reflect("Introduction", "Sure! " + PROSE * 2)
+
+
+def test_adaptive_skips_improvement_without_suggestions():
+    policy = AdaptiveReview()
+    assert not policy.should_improve(NO_SUGGESTIONS)
+    assert not policy.should_improve("  No changes needed.\n")
+    assert policy.should_improve("1. Use 'reunirá' instead of 'reune'.")
+    assert AlwaysReview().should_improve(NO_SUGGESTIONS)
+
+
+def test_skipped_stages_are_counted_and_reported(mocker):
+    completion = mocker.patch(
+        "translation_agent.utils.get_completion",
+        side_effect=["Introducción", "Traducción", NO_SUGGESTIONS],
+    )
+    policy = get_review_policy("adaptive")
+
+    heading = one_chunk_translation(
+        "English", "Spanish", "Introduction", review_policy=policy
+    )
+    assert heading.translation_2 == "Introducción"
+    prose = one_chunk_translation(
+        "English", "Spanish", PROSE, review_policy=policy
+    )
+    assert prose.translation_2 == "Traducción"
+    assert prose.reflection == NO_SUGGESTIONS
+    assert completion.call_args_list[2].args[0].endswith(NO_SUGGESTIONS)
+
+    assert completion.call_count == 3
+    assert policy.stats.summary() == {
+        "chunks": 2,
+        "reflections_skipped": 1,
+        "improvements_skipped": 2,
+        "skip_rate": 0.75,
+    }
+    assert "(75% of review calls)" in str(policy.stats)
+
+
+def test_multichunk_translation_applies_policy_per_chunk(mocker):
+    chunks = ["Chapter 1 ", PROSE + " ", "42"]
+    stages = []
+
+    def fake_completion(prompt, system_message):
+        chunk = prompt.rsplit("<TRANSLATE_THIS>\n", 1)[1].split("\n", 1)[0]
+        stages.append(chunk)
+        return chunk.upper()
+
+    mocker.patch(
+        "translation_agent.utils.get_completion", side_effect=fake_completion
+    )
+    policy = AdaptiveReview()
+    result = multichunk_translation(
+        "English",
+        "Spanish",
+        chunks,
+        executor=SerialExecutor(),
+        review_policy=policy,
+    )
+
+    assert "".join(result) == "".join(chunks).upper()
+    # Only the prose chunk is reflected on and improved
+    assert stages.count(PROSE + " ") == 3
+    assert len(stages) == 5
+    assert policy.stats.skip_rate == pytest.approx(4 / 6)
@@ -0,0 +1,37 @@
+from translation_agent import tokens
+from translation_agent.tokens import TokenizedText
+from translation_agent.utils import split_source_text
+
+
+def test_encoding_is_loaded_once(mocker):
+    tokens.get_encoding.cache_clear()
+    load = mocker.patch("translation_agent.tokens.tiktoken.get_encoding")
+    try:
+        for _ in range(3):
+            tokens.get_encoding("cl100k_base")
+        load.assert_called_once_with("cl100k_base")
+    finally:
+        tokens.get_encoding.cache_clear()
+
+
+def test_tokenized_text_counts_from_offsets(word_encoding):
+    tokenized = TokenizedText("one two three four", word_encoding)
+    assert len(tokenized) == 4
+    assert tokenized.offsets == [0, 3, 7, 13]
+    assert tokenized.count(3, 13) == 2
+    assert tokenized.char_offset(4) == len(tokenized.text)
+
+
+def test_split_source_text_reuses_tokens(word_encoding):
+    paragraph = " ".join(f"word{i}" for i in range(40)) + ".\n\n"
+    text = paragraph * 5
+    encoding = word_encoding
+    tokenized = TokenizedText(text, encoding)
+
+    chunks = split_source_text(tokenized, max_tokens=60)
+
+    assert encoding.calls == 1
+    assert "".join(chunks) == text
+    assert all(len(encoding.encode(chunk)) <= 60 for chunk in chunks)
+    # Cuts fall on paragraph breaks when one is close enough
+    assert all(chunk.endswith("\n\n") for chunk in chunks[:-1])
@@ -0,0 +1,109 @@
+import json
+
+import pytest
+
+from translation_agent import utils
+from translation_agent.ollama_client import OllamaClient
+from translation_agent.tracing import Tracer, trace_stage
+
+
+OLLAMA_RESULT = {
+    "response": "Hola",
+    "done": True,
+    "prompt_eval_count": 120,
+    "eval_count": 8,
+    "total_duration": 2_000_000_000,
+    "prompt_eval_duration": 500_000_000,
+    "eval_duration": 1_000_000_000,
+}
+
+
+@pytest.fixture
+def tracer(mocker):
+    tracer = Tracer()
+    mocker.patch("translation_agent.utils.tracer", tracer)
+    return tracer
+
+
+def test_span_is_tagged_with_enclosing_stage():
+    tracer = Tracer()
+    with trace_stage("reflect", 3):
+        with tracer.span("get_completion", "llama3.1:8b"):
+            pass
+    with tracer.span("get_completion"):
+        pass
+
+    tagged, untagged = tracer.spans
+    assert (tagged.stage, tagged.chunk, tagged.model) == ("reflect", 3, "llama3.1:8b")
+    assert tagged.latency >= 0
+    assert (untagged.stage, untagged.chunk) == (None, None)
+
+
+def test_span_records_error_and_calls_listeners():
+    tracer = Tracer()
+    seen = []
+    tracer.add_listener(seen.append)
+
+    with pytest.raises(ValueError):
+        with tracer.span("get_completion"):
+            raise ValueError("boom")
+
+    assert seen == list(tracer.spans)
+    assert seen[0].error == "boom"
+
+
+def test_client_attaches_ollama_timings(mocker):
+    tracer = Tracer()
+    client = OllamaClient(base_url="http://ollama.test")
+    post = mocker.patch.object(client.session, "post")
+    post.return_value.json.return_value = OLLAMA_RESULT
+
+    with tracer.span("get_completion") as span:
+        client.generate("llama3.1:8b", "Hello", use_cache=False)
+
+    assert span.prompt_tokens == 120
+    assert span.response_tokens == 8
+    assert span.prompt_eval_duration == 0.5
+    assert span.eval_duration == 1.0
+    assert span.queue_wait == max(span.latency - 2.0, 0.0)
+
+
+def test_stream_records_first_token_and_final_counts(mocker):
+    tracer = Tracer()
+    client = OllamaClient(base_url="http://ollama.test")
+    post = mocker.patch.object(client.session, "post")
+    response = post.return_value.__enter__.return_value
+    response.iter_lines.return_value = [
+        b'{"response": "Hola", "done": false}',
+        json.dumps(dict(OLLAMA_RESULT, response="")).encode(),
+    ]
+
+    with tracer.span("get_completion_stream") as span:
+        assert list(client.generate_stream("llama3.1:8b", "Hello")) == ["Hola"]
+
+    assert span.first_token is not None
+    assert span.response_tokens == 8
+
+
+def test_multichunk_spans_cover_every_stage_and_chunk(tracer, mocker):
+    mocker.patch("translation_agent.utils.ensure_model_available", return_value=True)
+    chat = mocker.patch("translation_agent.utils.ollama_client.chat")
+
+    def fake_chat(**kwargs):
+        from translation_agent.tracing import active_span
+
+        active_span().record_response(OLLAMA_RESULT)
+        return "Hola"
+
+    chat.side_effect = fake_chat
+
+    utils.multichunk_translation("English", "Spanish", ["One. ", "Two."])
+
+    spans = sorted((s.stage, s.chunk) for s in tracer.spans)
+    assert spans == [
+        (stage, i) for stage in ("improve", "initial", "reflect") for i in (0, 1)
+    ]
+    summary = json.loads(tracer.to_json())["summary"]
+    assert summary["initial"]["calls"] == 2
+    assert summary["improve"]["prompt_tokens"] == 240
+    assert summary["reflect"]["eval_duration"] == 2.0